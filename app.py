@@ -1,12 +1,21 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context, g
 import os
+import hmac
+import json
 import logging
+from time import perf_counter
+from itertools import islice
+import password_analyzer
 from password_analyzer import PasswordAnalyzer
+from recommendation_jobs import RecommendationJobs
+from incremental_analysis import LiveSessions
+import metrics
 
 app = Flask(__name__)
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
+# Set up logging (force: importing password_analyzer may already have configured the root logger).
+# DEBUG logs every analysis result, so keep it for development
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), force=True)
 
 # Load environment variable for Gemini API Key
 GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
@@ -24,10 +33,52 @@ if not GEMINI_API_KEY:
     logging.warning("No Gemini API key found. AI recommendations will be disabled.")
 
 # Initialize password analyzer
-model_path = os.path.join('static', 'models', 'password_model.pkl')
-# Initialize the PasswordAnalyzer with the correct model path
-analyzer = PasswordAnalyzer(model_path=model_path)
+# Prefer the compiled forest, then the versioned artifact, then the legacy pickle
+model_path = os.environ.get('MODEL_PATH')
+if not model_path:
+    for name in ('password_model.npz', 'password_model.joblib', 'password_model.pkl'):
+        model_path = os.path.join('static', 'models', name)
+        if os.path.exists(model_path):
+            break
+# Initialize the PasswordAnalyzer with the correct model path; the model loads on first use
+# and, with MODEL_RELOAD_INTERVAL set, is reloaded when the file changes
+analyzer = PasswordAnalyzer(model_path=model_path,
+                            model_reload_interval=float(os.environ.get('MODEL_RELOAD_INTERVAL', 0)))
+# /metrics reports this analyzer's model versions and common-password store
+metrics.track_analyzer(analyzer)
+
+# Token required by the admin endpoints; they are disabled when unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# AI recommendations run in the background and are polled via /ai-recommendations/<job_id>
+recommendation_jobs = RecommendationJobs(
+    analyzer.get_genai_recommendations,
+    max_workers=int(os.environ.get('AI_WORKERS', 4)),
+    ttl=float(os.environ.get('AI_JOB_TTL', 600))
+)
+# Longest a poll may block waiting for a pending job, in seconds
+MAX_AI_POLL_WAIT = 10
+
+# As-you-type analysis state for /analyze-live
+live_sessions = LiveSessions(analyzer, ttl=float(os.environ.get('LIVE_SESSION_TTL', 300)))
+
+# Number of passwords analyzed per chunk by /analyze-batch
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 256))
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
 
+@app.before_request
+def start_request_timer():
+    g.request_start = perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Time every request by route pattern (not the raw path, which would carry IDs)"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe_request(route, request.method, response.status_code, perf_counter() - start)
+    return response
 
 @app.route('/')
 def index():
@@ -37,19 +88,39 @@ def index():
 def model_accuracy():
     """Retrieve the accuracy of the trained model."""
     try:
-        model_path = os.path.join('static', 'models', 'password_model.pkl')
-        if os.path.exists(model_path):
-            with open(model_path, 'rb') as f:
-                model = pickle.load(f)
-            # Assuming the model has a method to retrieve accuracy
-            accuracy = analyzer.get_model_accuracy()  # Call the method to get accuracy
-            return jsonify({"accuracy": accuracy}), 200
-        else:
+        if analyzer.password_model is None:
             return jsonify({"error": "Model not found."}), 404
+        # Precomputed at training time and held in memory by the analyzer
+        accuracy = analyzer.get_model_accuracy()
+        return jsonify({"accuracy": accuracy, "metrics": analyzer.model_metrics}), 200
     except Exception as e:
         logging.error(f"Error retrieving model accuracy: {e}")
         return jsonify({"error": "An error occurred while retrieving model accuracy."}), 500
 
+@app.route('/admin/reload-model', methods=['POST'])
+def reload_model():
+    """Atomically swap in the current contents of the model file"""
+    if not ADMIN_TOKEN or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        version = analyzer.reload_model()
+        return jsonify({"success": True, "model_version": version})
+    except Exception as e:
+        logging.error(f"Error reloading model: {e}")
+        return jsonify({"error": "Model reload failed; the previous model is still active."}), 500
+
+@app.route('/admin/reload-breach-store', methods=['POST'])
+def reload_breach_store():
+    """Reopen the common-password data; cached analysis results are invalidated"""
+    if not ADMIN_TOKEN or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({"error": "Forbidden"}), 403
+    try:
+        entries = analyzer.reload_breach_store()
+        return jsonify({"success": True, "entries": entries})
+    except Exception as e:
+        logging.error(f"Error reloading common passwords: {e}")
+        return jsonify({"error": "Reload failed; the previous common-password data is still active."}), 500
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     data = request.get_json()
@@ -72,13 +143,145 @@ def analyze():
             return jsonify({"feedback": ["Invalid max_time_to_crack value. It must be a non-negative number."]}), 400
     
     try:
-        result = analyzer.analyze_password(password, max_time_to_crack)  # Updated call
+        result = analyzer.analyze_password(password, max_time_to_crack, include_ai=False)
         logging.debug(f"Analysis result: {result}")  # Log the result
+        
+        # Return the deterministic analysis now; AI recommendations are fetched later
+        if password and password_analyzer.GEMINI_API_KEY:
+            result["ai_job_id"] = recommendation_jobs.submit(result)
         return jsonify(result)
     except Exception as e:
         logging.error(f"Error analyzing password: {e}")
         return jsonify({"feedback": ["An unexpected issue occurred. Please try again."]}), 200
 
+@app.route('/analyze-live', methods=['POST'])
+def analyze_live():
+    """
+    Cheap as-you-type feedback (no ML model, no AI). Send keystroke edits
+    for a session, or the full password to start or resync one.
+    """
+    try:
+        response, status = live_sessions.handle(request.get_json(silent=True))
+        return jsonify(response), status
+    except Exception as e:
+        logging.error(f"Error in live analysis: {e}")
+        return jsonify({"error": "An unexpected issue occurred."}), 500
+
+@app.route('/ai-recommendations/<job_id>', methods=['GET'])
+def ai_recommendations(job_id):
+    """
+    Poll the AI recommendations for an /analyze result. Pass ?wait=<seconds>
+    to block briefly until the job finishes.
+    """
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), MAX_AI_POLL_WAIT)
+    except ValueError:
+        wait = 0
+    
+    job = recommendation_jobs.get(job_id, wait=wait)
+    if job["status"] == "not_found":
+        return jsonify(job), 404
+    return jsonify(job)
+
+def _iter_batch_items():
+    """Yield (password, error) pairs from a JSON array or NDJSON request body"""
+    if request.mimetype in NDJSON_MIMETYPES:
+        # Read line by line so the whole body is never held in memory
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield None, "Invalid JSON line"
+                continue
+            yield _batch_item_password(item)
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('passwords')
+        if not isinstance(data, list):
+            yield None, "Expected a JSON array of passwords"
+            return
+        for item in data:
+            yield _batch_item_password(item)
+
+
+def _batch_item_password(item):
+    """Accept either a bare password string or an object with a 'password' key"""
+    if isinstance(item, dict):
+        item = item.get('password', '')
+    if not isinstance(item, str):
+        return None, "Password must be a string"
+    return item, None
+
+
+def _analyze_batch_stream(items, max_time_to_crack):
+    """Analyze items in chunks and yield one NDJSON line per password"""
+    index = 0
+    while True:
+        chunk = list(islice(items, BATCH_CHUNK_SIZE))
+        if not chunk:
+            break
+        passwords = [password for password, error in chunk if error is None]
+        try:
+            results = iter(analyzer.analyze_many(passwords, max_time_to_crack))
+        except Exception as e:
+            logging.error(f"Error analyzing password batch: {e}")
+            results = None
+        for password, error in chunk:
+            if error is not None:
+                line = {"index": index, "error": error}
+            elif results is None:
+                line = {"index": index, "error": "An unexpected issue occurred. Please try again."}
+            else:
+                line = {"index": index, **next(results)}
+            yield json.dumps(line) + '\n'
+            index += 1
+
+
+@app.route('/analyze-batch', methods=['POST'])
+def analyze_batch():
+    """
+    Analyze many passwords in one request. Accepts a JSON array (or
+    {"passwords": [...]}) or an NDJSON body, and streams NDJSON results.
+    """
+    max_time_to_crack = request.args.get('max_time_to_crack', None)
+    if max_time_to_crack is not None:
+        try:
+            max_time_to_crack = float(max_time_to_crack)
+            if max_time_to_crack < 0:
+                raise ValueError("Max time to crack must be a non-negative number.")
+        except ValueError as e:
+            logging.error(f"Invalid max_time_to_crack: {e}")
+            return jsonify({"feedback": ["Invalid max_time_to_crack value. It must be a non-negative number."]}), 400
+    
+    stream = _analyze_batch_stream(_iter_batch_items(), max_time_to_crack)
+    return Response(stream_with_context(stream), mimetype='application/x-ndjson')
+
+@app.route('/breach-stats', methods=['GET'])
+def breach_stats():
+    """Size of the common-password store and its filter hit/miss counters"""
+    store = analyzer.common_passwords
+    stats = {"entries": len(store)}
+    if hasattr(store, 'stats'):
+        stats.update(store.stats())
+    return jsonify(stats)
+
+@app.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    """Hit/miss counters of the analysis result and AI recommendation caches"""
+    stats = {"ai_recommendations": analyzer.recommendation_cache.stats()}
+    if analyzer.result_cache is not None:
+        stats["analysis"] = analyzer.result_cache.stats()
+    return jsonify(stats)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Stage and request latency histograms, counters and gauges in Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), mimetype=None, content_type=metrics.CONTENT_TYPE)
+
 @app.route('/create-sample-data', methods=['GET'])
 def create_sample_data():
     """Create sample data file if it doesn't exist"""
@@ -105,4 +308,6 @@ def create_sample_data():
     return jsonify({"success": True, "message": "Sample data already exists"})
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development server only; use serve.py in production
+    app.run(host=os.environ.get('HOST', '127.0.0.1'), port=int(os.environ.get('PORT', 5000)),
+            debug=os.environ.get('FLASK_DEBUG', '0') == '1')
@@ -0,0 +1,374 @@
+import os
+import hmac
+import json
+import asyncio
+import logging
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from starlette.applications import Starlette
+from starlette.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.staticfiles import StaticFiles
+
+import password_analyzer
+from password_analyzer import PasswordAnalyzer
+from genai_client import AsyncGeminiClient
+from recommendation_jobs import AsyncRecommendationJobs
+from incremental_analysis import LiveSessions
+import metrics
+
+# ASGI version of app.py with the same routes. Analysis runs in a bounded thread
+# pool so the event loop stays free, and AI recommendations are awaited on an
+# async HTTP client instead of holding a thread for the whole round trip.
+# Run with: uvicorn asgi_app:app --workers 4
+
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(), force=True)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Prefer the compiled forest, then the versioned artifact, then the legacy pickle
+model_path = os.environ.get('MODEL_PATH')
+if not model_path:
+    for name in ('password_model.npz', 'password_model.joblib', 'password_model.pkl'):
+        model_path = os.path.join(BASE_DIR, 'static', 'models', name)
+        if os.path.exists(model_path):
+            break
+analyzer = PasswordAnalyzer(model_path=model_path,
+                            model_reload_interval=float(os.environ.get('MODEL_RELOAD_INTERVAL', 0)))
+metrics.track_analyzer(analyzer)
+
+# Token required by the admin endpoints; they are disabled when unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Threads running the CPU-bound analysis; requests beyond this wait their turn
+ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 4))
+executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='analysis')
+
+# As-you-type analysis state for /analyze-live
+live_sessions = LiveSessions(analyzer, ttl=float(os.environ.get('LIVE_SESSION_TTL', 300)))
+
+# Longest a poll may block waiting for a pending job, in seconds
+MAX_AI_POLL_WAIT = 10
+
+# Number of passwords analyzed per chunk by /analyze-batch
+BATCH_CHUNK_SIZE = int(os.environ.get('BATCH_CHUNK_SIZE', 256))
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/ndjson', 'application/jsonl')
+
+# Created inside the event loop by the lifespan handler
+genai_client = None
+recommendation_jobs = None
+
+
+async def run_in_executor(func, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, func, *args)
+
+
+async def fetch_recommendations(analysis_result):
+    return await analyzer.get_genai_recommendations_async(analysis_result, genai_client)
+
+
+def parse_max_time_to_crack(value):
+    """Validated max_time_to_crack, or raise ValueError"""
+    if value is None:
+        return None
+    value = float(value)
+    if value < 0:
+        raise ValueError("Max time to crack must be a non-negative number.")
+    return value
+
+
+def invalid_max_time_to_crack(e):
+    logging.error(f"Invalid max_time_to_crack: {e}")
+    return JSONResponse({"feedback": ["Invalid max_time_to_crack value. It must be a non-negative number."]},
+                        status_code=400)
+
+
+async def index(request):
+    return FileResponse(os.path.join(BASE_DIR, 'templates', 'index.html'))
+
+
+async def model_accuracy(request):
+    """Retrieve the accuracy of the trained model."""
+    try:
+        model = await run_in_executor(lambda: analyzer.password_model)
+        if model is None:
+            return JSONResponse({"error": "Model not found."}, status_code=404)
+        accuracy = await run_in_executor(analyzer.get_model_accuracy)
+        return JSONResponse({"accuracy": accuracy, "metrics": analyzer.model_metrics})
+    except Exception as e:
+        logging.error(f"Error retrieving model accuracy: {e}")
+        return JSONResponse({"error": "An error occurred while retrieving model accuracy."}, status_code=500)
+
+
+async def reload_model(request):
+    """Atomically swap in the current contents of the model file"""
+    if not ADMIN_TOKEN or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    try:
+        version = await run_in_executor(analyzer.reload_model)
+        return JSONResponse({"success": True, "model_version": version})
+    except Exception as e:
+        logging.error(f"Error reloading model: {e}")
+        return JSONResponse({"error": "Model reload failed; the previous model is still active."}, status_code=500)
+
+
+async def reload_breach_store(request):
+    """Reopen the common-password data; cached analysis results are invalidated"""
+    if not ADMIN_TOKEN or not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return JSONResponse({"error": "Forbidden"}, status_code=403)
+    try:
+        entries = await run_in_executor(analyzer.reload_breach_store)
+        return JSONResponse({"success": True, "entries": entries})
+    except Exception as e:
+        logging.error(f"Error reloading common passwords: {e}")
+        return JSONResponse({"error": "Reload failed; the previous common-password data is still active."},
+                            status_code=500)
+
+
+async def analyze(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JSONResponse({"feedback": ["Invalid JSON request body."]}, status_code=400)
+    password = data.get('password', '')
+
+    try:
+        max_time_to_crack = parse_max_time_to_crack(data.get('max_time_to_crack'))
+    except (TypeError, ValueError) as e:
+        return invalid_max_time_to_crack(e)
+
+    try:
+        result = await run_in_executor(analyzer.analyze_password, password, max_time_to_crack, False)
+
+        # Return the deterministic analysis now; AI recommendations are fetched later
+        if password and password_analyzer.GEMINI_API_KEY:
+            result["ai_job_id"] = recommendation_jobs.submit(result)
+        return JSONResponse(result)
+    except Exception as e:
+        logging.error(f"Error analyzing password: {e}")
+        return JSONResponse({"feedback": ["An unexpected issue occurred. Please try again."]})
+
+
+async def analyze_live(request):
+    """
+    Cheap as-you-type feedback (no ML model, no AI). Keystroke edits take
+    microseconds and run on the event loop. A request with the full password
+    also runs the crack-time estimate and the common-password lookup (which
+    can be a network call), so it goes to the executor.
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    try:
+        if isinstance(data, dict) and data.get('password') is not None:
+            response, status = await run_in_executor(live_sessions.handle, data)
+        else:
+            response, status = live_sessions.handle(data)
+        return JSONResponse(response, status_code=status)
+    except Exception as e:
+        logging.error(f"Error in live analysis: {e}")
+        return JSONResponse({"error": "An unexpected issue occurred."}, status_code=500)
+
+
+async def ai_recommendations(request):
+    """
+    Poll the AI recommendations for an /analyze result. Pass ?wait=<seconds>
+    to wait until the job finishes; waiting costs no thread.
+    """
+    try:
+        wait = min(max(float(request.query_params.get('wait', 0)), 0), MAX_AI_POLL_WAIT)
+    except ValueError:
+        wait = 0
+
+    job = await recommendation_jobs.get(request.path_params['job_id'], wait=wait)
+    return JSONResponse(job, status_code=404 if job["status"] == "not_found" else 200)
+
+
+def _batch_item_password(item):
+    """Accept either a bare password string or an object with a 'password' key"""
+    if isinstance(item, dict):
+        item = item.get('password', '')
+    if not isinstance(item, str):
+        return None, "Password must be a string"
+    return item, None
+
+
+async def _iter_batch_items(request):
+    """Yield (password, error) pairs from a JSON array or NDJSON request body"""
+    if request.headers.get('content-type', '').split(';')[0].strip() in NDJSON_MIMETYPES:
+        # Split the body into lines as it arrives so it is never held in memory
+        buffer = b''
+        async for block in request.stream():
+            buffer += block
+            *lines, buffer = buffer.split(b'\n')
+            for line in lines:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield _batch_item_password(json.loads(line))
+                except ValueError:
+                    yield None, "Invalid JSON line"
+        if buffer.strip():
+            try:
+                yield _batch_item_password(json.loads(buffer))
+            except ValueError:
+                yield None, "Invalid JSON line"
+    else:
+        try:
+            data = await request.json()
+        except ValueError:
+            data = None
+        if isinstance(data, dict):
+            data = data.get('passwords')
+        if not isinstance(data, list):
+            yield None, "Expected a JSON array of passwords"
+            return
+        for item in data:
+            yield _batch_item_password(item)
+
+
+async def _analyze_batch_stream(items, max_time_to_crack):
+    """Analyze items in chunks on the executor and yield one NDJSON line per password"""
+    index = 0
+    chunk = []
+
+    async def flush(chunk, index):
+        passwords = [password for password, error in chunk if error is None]
+        try:
+            results = iter(await run_in_executor(analyzer.analyze_many, passwords, max_time_to_crack))
+        except Exception as e:
+            logging.error(f"Error analyzing password batch: {e}")
+            results = None
+        lines = []
+        for password, error in chunk:
+            if error is not None:
+                line = {"index": index, "error": error}
+            elif results is None:
+                line = {"index": index, "error": "An unexpected issue occurred. Please try again."}
+            else:
+                line = {"index": index, **next(results)}
+            lines.append(json.dumps(line) + '\n')
+            index += 1
+        return ''.join(lines)
+
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) == BATCH_CHUNK_SIZE:
+            yield await flush(chunk, index)
+            index += len(chunk)
+            chunk = []
+    if chunk:
+        yield await flush(chunk, index)
+
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose generator is still reading the request body.
+    The stock class may listen for a disconnect on receive() at the same
+    time, which would swallow the body messages.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+
+
+async def analyze_batch(request):
+    """
+    Analyze many passwords in one request. Accepts a JSON array (or
+    {"passwords": [...]}) or an NDJSON body, and streams NDJSON results.
+    """
+    try:
+        max_time_to_crack = parse_max_time_to_crack(request.query_params.get('max_time_to_crack'))
+    except ValueError as e:
+        return invalid_max_time_to_crack(e)
+
+    stream = _analyze_batch_stream(_iter_batch_items(request), max_time_to_crack)
+    return BodyStreamingResponse(stream, media_type='application/x-ndjson')
+
+
+async def breach_stats(request):
+    """Size of the common-password store and its filter hit/miss counters"""
+    store = analyzer.common_passwords
+    stats = {"entries": len(store)}
+    if hasattr(store, 'stats'):
+        stats.update(store.stats())
+    return JSONResponse(stats)
+
+
+async def cache_stats(request):
+    """Hit/miss counters of the analysis result and AI recommendation caches"""
+    stats = {"ai_recommendations": analyzer.recommendation_cache.stats()}
+    if analyzer.result_cache is not None:
+        stats["analysis"] = analyzer.result_cache.stats()
+    return JSONResponse(stats)
+
+
+async def metrics_endpoint(request):
+    """Analyzer stage histograms, counters and gauges in Prometheus text format"""
+    return Response(metrics.REGISTRY.render(), headers={'Content-Type': metrics.CONTENT_TYPE})
+
+
+def _create_sample_data():
+    data_dir = os.path.join(BASE_DIR, 'static', 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    sample_path = os.path.join(data_dir, 'rockyou_sample.txt')
+    if os.path.exists(sample_path):
+        return False
+
+    common_passwords = [
+        "password", "123456", "qwerty", "admin", "welcome",
+        "password123", "abc123", "letmein", "monkey", "1234567890",
+        "trustno1", "dragon", "baseball", "football", "superman",
+        "princess", "123123", "987654321", "master", "hello",
+        "shadow", "sunshine", "iloveyou", "welcome1", "password1"
+    ]
+    with open(sample_path, 'w') as f:
+        f.write('\n'.join(common_passwords))
+    return True
+
+
+async def create_sample_data(request):
+    """Create sample data file if it doesn't exist"""
+    if await run_in_executor(_create_sample_data):
+        return JSONResponse({"success": True, "message": "Sample data created"})
+    return JSONResponse({"success": True, "message": "Sample data already exists"})
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    global genai_client, recommendation_jobs
+    genai_client = AsyncGeminiClient()
+    recommendation_jobs = AsyncRecommendationJobs(fetch_recommendations,
+                                                  ttl=float(os.environ.get('AI_JOB_TTL', 600)))
+    # Load the model before the first request instead of during it
+    await run_in_executor(lambda: analyzer.password_model)
+    try:
+        yield
+    finally:
+        recommendation_jobs.shutdown()
+        await genai_client.aclose()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/model-accuracy', model_accuracy, methods=['GET']),
+        Route('/admin/reload-model', reload_model, methods=['POST']),
+        Route('/admin/reload-breach-store', reload_breach_store, methods=['POST']),
+        Route('/analyze', analyze, methods=['POST']),
+        Route('/analyze-live', analyze_live, methods=['POST']),
+        Route('/ai-recommendations/{job_id}', ai_recommendations, methods=['GET']),
+        Route('/analyze-batch', analyze_batch, methods=['POST']),
+        Route('/breach-stats', breach_stats, methods=['GET']),
+        Route('/cache-stats', cache_stats, methods=['GET']),
+        Route('/metrics', metrics_endpoint, methods=['GET']),
+        Route('/create-sample-data', create_sample_data, methods=['GET']),
+        Mount('/static', app=StaticFiles(directory=os.path.join(BASE_DIR, 'static')), name='static'),
+    ],
+    lifespan=lifespan
+)
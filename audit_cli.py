@@ -0,0 +1,358 @@
+import os
+import sys
+import csv
+import io
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from multiprocessing import Pool, cpu_count
+
+# Report fields written when --fields is not given; 'line' is the 1-based input
+# line number and 'password' the plaintext, which is only written if selected
+DEFAULT_FIELDS = ['line', 'score', 'strength', 'entropy', 'length', 'is_common',
+                  'time_to_crack_seconds', 'weakness_reasons']
+OUTPUT_FORMATS = ('csv', 'jsonl', 'parquet')
+# Rows per Parquet part file
+PARQUET_PART_ROWS = 1000000
+
+_worker_analyzer = None
+_worker_include_ai = False
+
+
+def _init_worker(model_path, include_ai):
+    """Build one analyzer per worker process"""
+    global _worker_analyzer, _worker_include_ai
+    from password_analyzer import PasswordAnalyzer
+
+    logging.getLogger().setLevel(logging.WARNING)
+    _worker_analyzer = PasswordAnalyzer(model_path=model_path)
+    _worker_include_ai = include_ai
+
+
+def _select(report, fields, line, password):
+    row = {}
+    for field in fields:
+        if field == 'line':
+            row[field] = line
+        elif field == 'password':
+            row[field] = password
+        else:
+            row[field] = report.get(field)
+    return row
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return '; '.join(str(item) for item in value)
+    return value
+
+
+def analyze_chunk(task):
+    """
+    Analyze one chunk of (line number, password) pairs in a worker and return
+    the rendered output (CSV/JSONL text, or column lists for Parquet)
+    """
+    items, fields, output_format, max_time_to_crack = task
+    reports = _worker_analyzer.analyze_many([password for _, password in items], max_time_to_crack)
+    if _worker_include_ai:
+        for report in reports:
+            if report.get("strength") in ("Very Weak", "Weak", "Moderate"):
+                report.update(_worker_analyzer.get_genai_recommendations(report) or {})
+    rows = [_select(report, fields, line, password) for (line, password), report in zip(items, reports)]
+
+    if output_format == 'jsonl':
+        return ''.join(json.dumps(row) + '\n' for row in rows)
+    if output_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([_csv_value(row[field]) for field in fields])
+        return buffer.getvalue()
+    return {field: [row[field] for row in rows] for field in fields}
+
+
+def iter_input_chunks(path, offset, line_number, chunk_size):
+    """
+    Yield (items, end_offset, end_line) from byte offset onward, skipping
+    blank lines. The offsets let a checkpoint resume mid-file.
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        items = []
+        for raw in f:
+            offset += len(raw)
+            line_number += 1
+            password = raw.rstrip(b'\r\n').decode('utf-8', errors='replace')
+            if password:
+                items.append((line_number, password))
+            if len(items) == chunk_size:
+                yield items, offset, line_number
+                items = []
+        if items:
+            yield items, offset, line_number
+
+
+class Checkpoint:
+    """Progress record written atomically next to the output"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    def save(self, state):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class TextSink:
+    """CSV or JSONL output; resuming truncates anything written after the checkpoint"""
+
+    def __init__(self, path, output_format, fields, resume_state=None):
+        self.path = path
+        if resume_state:
+            self.file = open(path, 'r+', encoding='utf-8', newline='')
+            self.file.seek(resume_state['output_position'])
+            self.file.truncate()
+        else:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+            if output_format == 'csv':
+                csv.writer(self.file).writerow(fields)
+
+    @staticmethod
+    def can_resume(path, resume_state):
+        return os.path.exists(path) and os.path.getsize(path) >= resume_state['output_position']
+
+    def write(self, rendered):
+        self.file.write(rendered)
+
+    def commit(self):
+        """Make everything written so far durable; returns the state to checkpoint"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {'output_position': self.file.tell()}
+
+    def can_commit(self):
+        return True
+
+    def full(self):
+        return False
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetSink:
+    """Parquet output as numbered part files in a directory"""
+
+    def __init__(self, path, output_format, fields, resume_state=None, part_rows=None):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet output requires pyarrow (pip install pyarrow)")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        self.fields = fields
+        self.part_rows = part_rows or PARQUET_PART_ROWS
+        os.makedirs(path, exist_ok=True)
+        self.parts = resume_state['parts'] if resume_state else 0
+        # Part files past the checkpoint belong to the interrupted run
+        for name in os.listdir(path):
+            if name.startswith('part-') and name.endswith('.parquet') and int(name[5:10]) >= self.parts:
+                os.remove(os.path.join(path, name))
+        self._columns = {field: [] for field in fields}
+        self._rows = 0
+
+    @staticmethod
+    def can_resume(path, resume_state):
+        return all(os.path.exists(os.path.join(path, f'part-{part:05d}.parquet'))
+                   for part in range(resume_state['parts']))
+
+    def write(self, columns):
+        for field in self.fields:
+            self._columns[field].extend(columns[field])
+        self._rows += len(columns[self.fields[0]]) if self.fields else 0
+
+    def can_commit(self):
+        """Parquet is only checkpointed at part boundaries"""
+        return self._rows >= self.part_rows
+
+    def full(self):
+        return self._rows >= self.part_rows
+
+    def commit(self):
+        if self._rows:
+            table = self._pa.table(self._columns)
+            part_path = os.path.join(self.path, f'part-{self.parts:05d}.parquet')
+            self._pq.write_table(table, part_path + '.tmp')
+            os.replace(part_path + '.tmp', part_path)
+            self.parts += 1
+            self._columns = {field: [] for field in self.fields}
+            self._rows = 0
+        return {'parts': self.parts}
+
+    def close(self):
+        pass
+
+
+def output_format_for(path, output_format=None):
+    if output_format:
+        return output_format
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension in ('parquet', 'pq'):
+        return 'parquet'
+    if extension in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    return 'csv'
+
+
+def audit(input_path, output_path, fields=None, output_format=None, workers=None, chunk_size=10000,
+          max_time_to_crack=None, model_path=None, include_ai=False, checkpoint_path=None,
+          checkpoint_interval=30.0, progress_interval=5.0, resume=True):
+    """
+    Analyze every line of input_path and write the selected report fields to
+    output_path. Progress is checkpointed so a rerun continues where an
+    interrupted run stopped. Returns the number of passwords analyzed.
+    """
+    fields = fields or DEFAULT_FIELDS
+    output_format = output_format_for(output_path, output_format)
+    workers = workers or cpu_count()
+    checkpoint = Checkpoint(checkpoint_path or output_path.rstrip('/') + '.checkpoint')
+
+    # Only resume a checkpoint written for this exact input and output layout
+    input_stat = os.stat(input_path)
+    job = {
+        'input': os.path.abspath(input_path),
+        'input_size': input_stat.st_size,
+        'input_mtime': input_stat.st_mtime,
+        'format': output_format,
+        'fields': fields,
+        'max_time_to_crack': max_time_to_crack
+    }
+    state = checkpoint.load() if resume else None
+    if state is not None and state.get('job') != job:
+        logging.warning("Checkpoint does not match this job; starting over")
+        state = None
+    sink_class = ParquetSink if output_format == 'parquet' else TextSink
+    if state is not None and not sink_class.can_resume(output_path, state['sink']):
+        logging.warning("Output is missing or shorter than the checkpoint; starting over")
+        state = None
+    if state is not None:
+        logging.info(f"Resuming at line {state['line']} ({state['analyzed']} passwords already analyzed)")
+
+    sink = sink_class(output_path, output_format, fields, resume_state=state and state['sink'])
+    offset = state['offset'] if state else 0
+    line_number = state['line'] if state else 0
+    analyzed = state['analyzed'] if state else 0
+
+    start = last_progress = last_checkpoint = time.monotonic()
+    session_lines = 0
+    pending = deque()
+    chunks = iter_input_chunks(input_path, offset, line_number, chunk_size)
+    try:
+        with Pool(workers, initializer=_init_worker, initargs=(model_path, include_ai)) as pool:
+            while True:
+                # Keep a bounded number of chunks in flight and write them in input order
+                while len(pending) < workers * 2:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        break
+                    items, end_offset, end_line = chunk
+                    task = (items, fields, output_format, max_time_to_crack)
+                    pending.append((pool.apply_async(analyze_chunk, (task,)), len(items), end_offset, end_line))
+                if not pending:
+                    break
+
+                result, count, offset, line_number = pending.popleft()
+                sink.write(result.get())
+                analyzed += count
+                session_lines += count
+
+                now = time.monotonic()
+                if sink.can_commit() and (sink.full() or now - last_checkpoint >= checkpoint_interval):
+                    checkpoint.save({'job': job, 'offset': offset, 'line': line_number,
+                                     'analyzed': analyzed, 'sink': sink.commit()})
+                    last_checkpoint = now
+                if now - last_progress >= progress_interval:
+                    rate = session_lines / (now - start)
+                    percent = 100.0 * offset / input_stat.st_size if input_stat.st_size else 100.0
+                    logging.info(f"{analyzed} passwords analyzed ({percent:.1f}% of input, {rate:,.0f} lines/sec)")
+                    last_progress = now
+
+        sink.commit()
+    except BaseException:
+        # Leave the last checkpoint in place so the next run resumes from it
+        sink.close()
+        raise
+    sink.close()
+    checkpoint.remove()
+
+    elapsed = time.monotonic() - start
+    logging.info(f"Finished: {analyzed} passwords analyzed, {session_lines / elapsed if elapsed else 0:,.0f} lines/sec")
+    return analyzed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m password_analyzer',
+                                     description="Offline password analysis tools")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    audit_parser = subparsers.add_parser('audit', help="Analyze every password in a wordlist or credential dump")
+    audit_parser.add_argument('input', help="Text file with one password per line")
+    audit_parser.add_argument('output', help="Output file (.csv, .jsonl) or directory (.parquet)")
+    audit_parser.add_argument('--format', choices=OUTPUT_FORMATS, help="Output format (default: from the extension)")
+    audit_parser.add_argument('--fields', default=','.join(DEFAULT_FIELDS),
+                              help="Comma-separated report fields; 'line' is the input line number, "
+                                   "'password' writes the plaintext")
+    audit_parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    audit_parser.add_argument('--chunk-size', type=int, default=10000, help="Passwords per work unit")
+    audit_parser.add_argument('--max-time-to-crack', type=float, default=None)
+    audit_parser.add_argument('--model-path', default=None, help="Model file (default: the app's model)")
+    audit_parser.add_argument('--ai', action='store_true',
+                              help="Request AI recommendations for weak passwords (slow; off by default)")
+    audit_parser.add_argument('--checkpoint', default=None, help="Checkpoint file (default: <output>.checkpoint)")
+    audit_parser.add_argument('--checkpoint-interval', type=float, default=30.0, help="Seconds between checkpoints")
+    audit_parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s', force=True)
+
+    model_path = args.model_path
+    if model_path is None:
+        models_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'models')
+        for name in ('password_model.npz', 'password_model.joblib', 'password_model.pkl'):
+            model_path = os.path.join(models_dir, name)
+            if os.path.exists(model_path):
+                break
+
+    fields = [field.strip() for field in args.fields.split(',') if field.strip()]
+    try:
+        audit(args.input, args.output, fields=fields, output_format=args.format, workers=args.workers,
+              chunk_size=args.chunk_size, max_time_to_crack=args.max_time_to_crack, model_path=model_path,
+              include_ai=args.ai, checkpoint_path=args.checkpoint, checkpoint_interval=args.checkpoint_interval,
+              resume=not args.restart)
+    except KeyboardInterrupt:
+        logging.info("Interrupted; rerun the same command to resume from the last checkpoint")
+        return 130
+    except RuntimeError as e:
+        logging.error(str(e))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""
+Micro-benchmarks for each PasswordAnalyzer stage, with regression tracking.
+
+Every stage is timed on fixed corpora of short, long, common and random
+passwords (generated from a fixed seed, so they never change between
+runs). analyze_password is timed end to end, with and without a result
+cache hit, and analyze_many at several batch sizes. Each timing is the
+best of --repeat passes, reported in microseconds per password.
+
+    python benchmarks/analyzer_stages.py --save-baseline    # record benchmarks/baseline.json
+    python benchmarks/analyzer_stages.py                    # compare, exit 1 on a regression
+
+A run fails when any timing is more than --threshold (default 25%) slower
+than the baseline, and with status 2 when there is no baseline to compare
+against. Record baselines on the machine that runs the comparison; timings
+from different hardware are not comparable.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import string
+import logging
+import argparse
+import platform
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from password_analyzer import PasswordAnalyzer, COMMON_WORDS, DATA_DIR  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_MODEL = os.path.join(ROOT, 'static', 'models', 'password_model.pkl')
+BASELINE_VERSION = 1
+CORPUS_SEED = 20240601
+BATCH_SIZES = [1, 10, 100, 1000]
+
+PASSPHRASE_WORDS = [
+    "correct", "horse", "battery", "staple", "orange", "river", "mountain", "coffee",
+    "purple", "window", "garden", "silver", "rocket", "pencil", "thunder", "castle",
+    "yellow", "market", "forest", "winter", "planet", "bridge", "candle", "monkey"
+]
+
+
+def build_corpora(size=200, seed=CORPUS_SEED):
+    """Fixed corpora of each password kind, identical on every run"""
+    rng = random.Random(seed)
+    with open(os.path.join(DATA_DIR, 'rockyou_sample.txt'), 'r', encoding='utf-8', errors='ignore') as f:
+        breached = [line.strip() for line in f if line.strip()]
+    bases = breached + COMMON_WORDS
+
+    def common():
+        word = rng.choice(bases)
+        variant = rng.random()
+        if variant < 0.3:
+            return word.capitalize()
+        if variant < 0.6:
+            return word + str(rng.choice([1, 12, 123, 1234, 2020, 1999, 7]))
+        if variant < 0.7:
+            return word + '!'
+        return word
+
+    def short():
+        return ''.join(rng.choice(string.ascii_lowercase + string.digits) for _ in range(rng.randint(4, 8)))
+
+    def long():
+        words = [rng.choice(PASSPHRASE_WORDS) for _ in range(rng.randint(4, 7))]
+        return rng.choice([' ', '-', '', '_']).join(words) + str(rng.randint(0, 99))
+
+    def random_password():
+        alphabet = string.ascii_letters + string.digits + string.punctuation
+        return ''.join(rng.choice(alphabet) for _ in range(rng.randint(12, 24)))
+
+    return {
+        "short": [short() for _ in range(size)],
+        "long": [long() for _ in range(size)],
+        "common": [common() for _ in range(size)],
+        "random": [random_password() for _ in range(size)]
+    }
+
+
+def make_analyzer(model_path):
+    analyzer = PasswordAnalyzer(model_path if model_path and os.path.exists(model_path) else None)
+    # End-to-end timings measure the analysis itself; cache hits are timed separately
+    analyzer.result_cache = None
+    if analyzer.password_model is None:
+        logging.warning("No model loaded; the predict_proba stage is skipped")
+    return analyzer
+
+
+def stages(analyzer):
+    """
+    (name, prepare, run) per stage: prepare maps the corpus to the stage's
+    inputs outside the timed region, run processes one input.
+    """
+    identity = list
+    to_features = lambda passwords: [analyzer._analyze_features(p) for p in passwords]  # noqa: E731
+    result = [
+        ("analyze_features", identity, analyzer._analyze_features),
+        ("calculate_entropy", identity, analyzer._calculate_entropy),
+        ("extract_features", to_features, lambda features: analyzer._extract_features(None, features)),
+        ("common_lookup", lambda passwords: [p.lower() for p in passwords],
+         lambda lowered: lowered in analyzer.common_passwords),
+        ("pattern_kinds", lambda passwords: [p.lower() for p in passwords], analyzer.pattern_matcher.kinds),
+        ("time_to_crack", lambda passwords: list(zip(passwords, to_features(passwords))),
+         lambda pair: analyzer._estimate_time_to_crack_improved(*pair))
+    ]
+    model = analyzer.password_model
+    if model is not None:
+        result.append(("predict_proba",
+                       lambda passwords: [[analyzer._extract_features(None, f)] for f in to_features(passwords)],
+                       model.predict_proba))
+    if analyzer.markov_model is not None:
+        result.append(("markov_log10_prob", identity, analyzer.markov_model.log10_prob))
+    result.append(("analyze_password", identity, lambda p: analyzer.analyze_password(p, include_ai=False)))
+    return result
+
+
+def best_time(run, inputs, repeat):
+    """Best of repeat passes over inputs, in microseconds per input"""
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in inputs:
+            run(item)
+        best = min(best, time.perf_counter() - start)
+    return best / len(inputs) * 1e6
+
+
+def run_benchmarks(analyzer, corpora, repeat, only=None):
+    """Timings keyed 'stage/corpus', in microseconds per password"""
+    results = {}
+
+    def wanted(key):
+        return not only or any(pattern in key for pattern in only)
+
+    def record(key, value):
+        results[key] = value
+        print(f"  {key:<36} {value:10.2f} us")
+
+    for name, prepare, run in stages(analyzer):
+        for corpus_name, passwords in corpora.items():
+            if not wanted(f"{name}/{corpus_name}"):
+                continue
+            inputs = prepare(passwords)
+            # One untimed pass fills lazily built tables and caches
+            for item in inputs:
+                run(item)
+            record(f"{name}/{corpus_name}", best_time(run, inputs, repeat))
+
+    # Cache hits: the same passwords again through an in-process LRU
+    if wanted("analyze_password_cached/all"):
+        from caching import TTLCache
+        analyzer.result_cache = TTLCache(max_size=100000, ttl=3600)
+        mixed = [p for passwords in corpora.values() for p in passwords]
+        for p in mixed:
+            analyzer.analyze_password(p, include_ai=False)
+        record("analyze_password_cached/all",
+               best_time(lambda p: analyzer.analyze_password(p, include_ai=False), mixed, repeat))
+        analyzer.result_cache = None
+
+    # Batches mix every corpus, cycling until the batch is full
+    mixed = [p for group in zip(*corpora.values()) for p in group]
+    for size in BATCH_SIZES:
+        key = f"analyze_many/batch_{size}"
+        if not wanted(key):
+            continue
+        batch = [mixed[i % len(mixed)] for i in range(size)]
+        # Small batches are repeated so every timing covers a comparable amount of work
+        rounds = max(1, 1000 // size)
+        analyzer.analyze_many(batch)
+        per_batch = best_time(lambda _: analyzer.analyze_many(batch), range(rounds), repeat)
+        record(key, per_batch / size)
+    return results
+
+
+def environment():
+    """Where the timings came from; baselines only compare on the same setup"""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count()
+    }
+
+
+def compare(results, baseline, threshold, min_delta_us):
+    """Return the regressions as (key, baseline us, current us) and print a comparison table"""
+    regressions = []
+    print(f"\n{'benchmark':<38} {'baseline':>10} {'current':>10} {'change':>8}")
+    for key, current in results.items():
+        previous = baseline["results"].get(key)
+        if previous is None:
+            print(f"{key:<38} {'-':>10} {current:10.2f}      new")
+            continue
+        change = (current - previous) / previous if previous else 0.0
+        regressed = change > threshold and current - previous > min_delta_us
+        marker = '  REGRESSION' if regressed else ''
+        print(f"{key:<38} {previous:10.2f} {current:10.2f} {change:+7.1%}{marker}")
+        if regressed:
+            regressions.append((key, previous, current))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time PasswordAnalyzer stages and compare against a baseline")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument('--save-baseline', action='store_true', help="Write this run's timings as the baseline")
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help="Allowed slowdown as a fraction of the baseline (default: 0.25)")
+    parser.add_argument('--min-delta-us', type=float, default=0.5,
+                        help="Ignore slowdowns smaller than this many microseconds per password")
+    parser.add_argument('--repeat', type=int, default=5, help="Passes per timing; the best is kept")
+    parser.add_argument('--corpus-size', type=int, default=200, help="Passwords per corpus")
+    parser.add_argument('--model-path', default=os.environ.get('MODEL_PATH', DEFAULT_MODEL))
+    parser.add_argument('--only', nargs='+', help="Run only benchmarks whose name contains one of these")
+    parser.add_argument('--json', action='store_true', help="Print the timings as JSON")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+    logging.basicConfig(level=logging.WARNING)
+    analyzer = make_analyzer(args.model_path)
+    corpora = build_corpora(args.corpus_size)
+
+    print(f"Timing {len(corpora)} corpora of {args.corpus_size} passwords, best of {args.repeat}")
+    results = run_benchmarks(analyzer, corpora, args.repeat, only=args.only)
+    if args.json:
+        print(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.save_baseline:
+        baseline = {
+            "version": BASELINE_VERSION,
+            "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            "environment": environment(),
+            "corpus_size": args.corpus_size,
+            "results": results
+        }
+        with open(args.baseline + '.tmp', 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        os.replace(args.baseline + '.tmp', args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        # A missing baseline must not pass silently, or a regression check would never fail
+        print(f"\nFAILED: no baseline at {args.baseline}; run with --save-baseline to record one")
+        return 2
+    with open(args.baseline, 'r') as f:
+        baseline = json.load(f)
+    if baseline.get("version") != BASELINE_VERSION:
+        print(f"\nBaseline {args.baseline} has an unsupported version; record a new one")
+        return 2
+    if baseline.get("environment") != environment():
+        print(f"\nWarning: baseline recorded on {baseline.get('environment')}, running on {environment()}")
+    if baseline.get("corpus_size") != args.corpus_size:
+        print(f"\nWarning: baseline used {baseline.get('corpus_size')} passwords per corpus")
+
+    regressions = compare(results, baseline, args.threshold, args.min_delta_us)
+    if regressions:
+        print(f"\nFAILED: {len(regressions)} benchmark(s) more than {args.threshold:.0%} slower than the baseline:")
+        for key, previous, current in regressions:
+            print(f"  {key}: {previous:.2f} us -> {current:.2f} us")
+        return 1
+    print(f"\nOK: no benchmark more than {args.threshold:.0%} slower than the baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""
+Local stand-in for the Gemini generateContent endpoint, for load tests.
+
+Answers POST requests to any path ending in ':generateContent' with a
+canned response in the format parse_genai_response expects, after a
+configurable delay. A fraction of requests can fail with a given status
+or hang past the client's read timeout. Listens on 127.0.0.1 only and
+never makes outbound requests. GET /stats returns request counters.
+
+    python benchmarks/gemini_stub.py --port 8090 --latency 0.8 --jitter 0.3 --error-rate 0.05
+    GEMINI_API_URL=http://127.0.0.1:8090/v1beta/models/stub:generateContent python app.py
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPONSE_TEXT = """Security Risks:
+- Short passwords built from dictionary words fall to wordlist attacks within minutes.
+- Predictable substitutions such as 0 for o are tried by every cracking tool.
+
+Why this password is weak:
+- It follows a common pattern that attackers try first.
+- Its character variety is low for its length.
+
+Suggestions:
+- Use at least 14 characters.
+- Combine several unrelated words.
+- Add digits and symbols in unpredictable positions.
+
+Example:
+Lantern!Orbit7Maple^Crisp"""
+
+
+class StubStats:
+    """Thread-safe request counters, reported by GET /stats"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"requests": 0, "ok": 0, "errors": 0, "hangs": 0}
+
+    def add(self, key):
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts[key] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+
+class GeminiStubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        server = self.server
+        # Drain the body so the keep-alive connection stays usable
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.split('?', 1)[0].endswith(':generateContent'):
+            self._send(404, {"error": {"code": 404, "message": "Not found"}})
+            return
+
+        roll = server.rng.random()
+        if roll < server.hang_rate:
+            server.stats.add("hangs")
+            time.sleep(server.hang_seconds)
+            self._send(504, {"error": {"code": 504, "message": "Deadline exceeded"}})
+            return
+        time.sleep(max(0.0, server.latency + server.rng.uniform(-server.jitter, server.jitter)))
+        if roll < server.hang_rate + server.error_rate:
+            server.stats.add("errors")
+            self._send(server.error_status, {"error": {"code": server.error_status, "message": "Stub error"}})
+            return
+        server.stats.add("ok")
+        self._send(200, {
+            "candidates": [{"content": {"parts": [{"text": RESPONSE_TEXT}], "role": "model"}, "finishReason": "STOP"}]
+        })
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self._send(200, self.server.stats.snapshot())
+        else:
+            self._send(404, {"error": {"code": 404, "message": "Not found"}})
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up (e.g. its read timeout fired during a hang)
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(port=0, latency=0.5, jitter=0.0, error_rate=0.0, error_status=503,
+                hang_rate=0.0, hang_seconds=60.0, seed=None):
+    """A ThreadingHTTPServer on 127.0.0.1; call serve_forever() to start it"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), GeminiStubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.jitter = jitter
+    server.error_rate = error_rate
+    server.error_status = error_status
+    server.hang_rate = hang_rate
+    server.hang_seconds = hang_seconds
+    server.stats = StubStats()
+    # Draws from handler threads interleave, so a seed fixes the mix of outcomes, not their order
+    server.rng = random.Random(seed)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a local stub of the Gemini generateContent API")
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0.5, help="Mean response delay in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Uniform +/- spread of the delay in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with --error-status")
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--hang-rate', type=float, default=0.0,
+                        help="Fraction of requests held for --hang-seconds (longer than the client's timeout)")
+    parser.add_argument('--hang-seconds', type=float, default=60.0)
+    parser.add_argument('--seed', type=int, default=None, help="Seed for the latency and error draws")
+    args = parser.parse_args(argv)
+
+    server = make_server(args.port, args.latency, args.jitter, args.error_rate, args.error_status,
+                         args.hang_rate, args.hang_seconds, args.seed)
+    print(f"Gemini stub listening on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""
+End-to-end load test of the Flask app against a local Gemini stub.
+
+Starts benchmarks/gemini_stub.py and app.py (or serve.py with --server
+serve) on free local ports, then sends a weighted mix of requests at a
+fixed rate for a fixed time. Arrivals are open loop: request i is due at
+start + i / rate whether or not earlier ones have finished, and latency is
+measured from when it was due, so time spent queued behind a slow server
+counts. With AI enabled, every /analyze that returns an ai_job_id is
+followed by polling /ai-recommendations/<id> until the job settles; that
+wait is reported as the 'ai-recommendations' row.
+
+    python benchmarks/load_harness.py --rates 5 20 50 --duration 30
+    python benchmarks/load_harness.py --mix analyze=1 --ai on --stub-latency 2 --stub-error-rate 0.1
+
+Nothing leaves the machine: the app is pointed at the stub through
+GEMINI_API_URL, and with --ai off GEMINI_API_KEY is set empty so no
+recommendation jobs are submitted at all.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+
+from server_scaling import ROOT, PASSWORDS, free_port, wait_until_ready, percentile
+
+# name -> (method, path, JSON body or None)
+ENDPOINTS = {
+    "analyze": ('POST', '/analyze', lambda i: {"password": PASSWORDS[i % len(PASSWORDS)]}),
+    "model-accuracy": ('GET', '/model-accuracy', None),
+    "create-sample-data": ('GET', '/create-sample-data', None),
+    "breach-stats": ('GET', '/breach-stats', None),
+    "analyze-live": ('POST', '/analyze-live', lambda i: {"password": PASSWORDS[i % len(PASSWORDS)]})
+}
+DEFAULT_MIX = "analyze=8,model-accuracy=1,create-sample-data=1"
+# Seconds per /ai-recommendations poll; the app caps this at MAX_AI_POLL_WAIT
+AI_POLL_WAIT = 10
+
+
+def parse_mix(text):
+    """'analyze=8,model-accuracy=1' -> [('analyze', 8.0), ('model-accuracy', 1.0)]"""
+    mix = []
+    for part in text.split(','):
+        name, _, weight = part.strip().partition('=')
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint '{name}'; choose from {', '.join(ENDPOINTS)}")
+        try:
+            weight = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Invalid weight for '{name}': {weight}")
+        if weight > 0:
+            mix.append((name, weight))
+    if not mix:
+        raise argparse.ArgumentTypeError("The request mix is empty")
+    return mix
+
+
+def start_stub(args):
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'benchmarks', 'gemini_stub.py'), '--port', str(port),
+         '--latency', str(args.stub_latency), '--jitter', str(args.stub_jitter),
+         '--error-rate', str(args.stub_error_rate), '--error-status', str(args.stub_error_status),
+         '--hang-rate', str(args.stub_hang_rate), '--seed', str(args.seed)],
+        cwd=ROOT, stdout=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            stub_stats(port)
+            return process, port
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"Gemini stub on port {port} did not start")
+
+
+def stub_stats(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        conn.request('GET', '/stats')
+        return json.loads(conn.getresponse().read())
+    finally:
+        conn.close()
+
+
+def start_app(args, ai, stub_port):
+    """Start the app under test with AI pointed at the stub, or disabled"""
+    port = free_port()
+    env = dict(os.environ, LOG_LEVEL='warning',
+               GEMINI_API_KEY='stub-key' if ai else '',
+               GEMINI_API_URL=f'http://127.0.0.1:{stub_port}/v1beta/models/stub:generateContent')
+    if args.cold:
+        env.update(ANALYSIS_CACHE_SIZE='0', AI_CACHE_SIZE='0')
+    # Caches shared through files would carry results over between runs
+    for name in ('ANALYSIS_CACHE_PATH', 'AI_CACHE_PATH'):
+        env.pop(name, None)
+    if args.server == 'serve':
+        command = [os.path.join(ROOT, 'serve.py'), '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(args.workers), '--threads', str(args.threads), '--log-level', 'warning']
+    else:
+        env.update(HOST='127.0.0.1', PORT=str(port), FLASK_DEBUG='0')
+        command = [os.path.join(ROOT, 'app.py')]
+    process = subprocess.Popen([sys.executable] + command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port)
+    except RuntimeError:
+        process.terminate()
+        process.wait()
+        raise
+    return process, port
+
+
+class LoadRecorder:
+    """Latencies and outcomes per endpoint, shared by the worker threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.ai_statuses = {}
+        # When the last response to a scheduled request arrived; AI polling can run on past it
+        self.last_response = None
+
+    def record(self, name, latency, ok):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(latency)
+            self.errors[name] = self.errors.get(name, 0) + (not ok)
+            if name != 'ai-recommendations':
+                self.last_response = time.perf_counter()
+
+    def record_ai_status(self, status):
+        with self._lock:
+            self.ai_statuses[status] = self.ai_statuses.get(status, 0) + 1
+
+
+def _request(local, port, method, path, body, timeout):
+    """One request over this thread's keep-alive connection; returns (status, parsed JSON or None)"""
+    conn = getattr(local, 'conn', None)
+    if conn is None:
+        conn = local.conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        if body is None:
+            conn.request(method, path)
+        else:
+            conn.request(method, path, json.dumps(body), {'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        data = response.read()
+    except (OSError, http.client.HTTPException):
+        conn.close()
+        local.conn = None
+        raise
+    try:
+        return response.status, json.loads(data)
+    except ValueError:
+        return response.status, None
+
+
+def _send(local, port, recorder, name, i, due, timeout, ai_timeout):
+    method, path, body = ENDPOINTS[name]
+    try:
+        status, data = _request(local, port, method, path, body(i) if body else None, timeout)
+        # /analyze reports internal failures as a 200 with only a feedback message
+        ok = status == 200 and not (name == 'analyze' and data is not None and 'strength' not in data)
+    except (OSError, http.client.HTTPException):
+        data, ok = None, False
+    recorder.record(name, time.perf_counter() - due, ok)
+
+    job_id = data.get('ai_job_id') if ok and isinstance(data, dict) else None
+    if job_id:
+        _wait_for_ai(local, port, recorder, job_id, timeout, ai_timeout)
+
+
+def _wait_for_ai(local, port, recorder, job_id, timeout, ai_timeout):
+    """Poll a recommendation job until it settles; records the time from the /analyze response"""
+    start = time.perf_counter()
+    status = 'timeout'
+    while time.perf_counter() - start < ai_timeout:
+        wait = min(AI_POLL_WAIT, max(0.1, ai_timeout - (time.perf_counter() - start)))
+        try:
+            code, data = _request(local, port, 'GET', f'/ai-recommendations/{job_id}?wait={wait:.1f}',
+                                  None, timeout + wait)
+        except (OSError, http.client.HTTPException):
+            status = 'error'
+            break
+        status = data.get('status', 'error') if isinstance(data, dict) else f'http_{code}'
+        if status != 'pending':
+            break
+    recorder.record('ai-recommendations', time.perf_counter() - start, status == 'done')
+    recorder.record_ai_status(status)
+
+
+def warm_up(port, mix, timeout):
+    """One untimed request per endpoint in the mix, so lazy loading stays out of the numbers"""
+    local = threading.local()
+    for name, _ in mix:
+        method, path, body = ENDPOINTS[name]
+        try:
+            _, data = _request(local, port, method, path, body(0) if body else None, timeout)
+            # Let the warm-up's AI job finish before the stub counters are read
+            if isinstance(data, dict) and data.get('ai_job_id'):
+                _request(local, port, 'GET', f"/ai-recommendations/{data['ai_job_id']}?wait={AI_POLL_WAIT}",
+                         None, timeout + AI_POLL_WAIT)
+        except (OSError, http.client.HTTPException):
+            pass
+
+
+def run_load(port, mix, rate, duration, concurrency, timeout, ai_timeout, seed):
+    """
+    Drive the server open loop at rate requests per second. Returns the
+    LoadRecorder and the seconds from the first request being due to the
+    last response to a scheduled request.
+    """
+    rng = random.Random(seed)
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    recorder = LoadRecorder()
+    local = threading.local()
+    total = max(1, int(rate * duration))
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        for i in range(total):
+            due = start + i / rate
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_send, local, port, recorder, rng.choices(names, weights)[0], i, due, timeout, ai_timeout)
+    # Leaving the pool waited for the stragglers and any AI polling
+    return recorder, (recorder.last_response or time.perf_counter()) - start
+
+
+def summarize(recorder, elapsed):
+    rows = {}
+    everything = []
+    for name in sorted(recorder.latencies):
+        latencies = recorder.latencies[name]
+        errors = recorder.errors[name]
+        rows[name] = {
+            "requests": len(latencies),
+            "throughput_rps": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+            "errors": errors,
+            "error_rate": errors / len(latencies)
+        }
+        # AI waits are follow-ups of /analyze requests, not requests of their own
+        if name != 'ai-recommendations':
+            everything.extend(latencies)
+    errors = sum(count for name, count in recorder.errors.items() if name != 'ai-recommendations')
+    rows["all"] = {
+        "requests": len(everything),
+        "throughput_rps": len(everything) / elapsed,
+        "p50_ms": percentile(everything, 0.50) * 1000,
+        "p95_ms": percentile(everything, 0.95) * 1000,
+        "p99_ms": percentile(everything, 0.99) * 1000,
+        "errors": errors,
+        "error_rate": errors / len(everything) if everything else 0.0
+    }
+    return rows
+
+
+def print_run(run):
+    print(f"\nai={'on' if run['ai'] else 'off'}  target={run['target_rps']:g} rps  "
+          f"elapsed={run['elapsed_s']:.1f}s  server={run['server']}")
+    print(f"  {'endpoint':<20} {'requests':>8} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for name, row in run["endpoints"].items():
+        print(f"  {name:<20} {row['requests']:8d} {row['throughput_rps']:8.1f} {row['p50_ms']:9.1f} "
+              f"{row['p95_ms']:9.1f} {row['p99_ms']:9.1f} {row['error_rate']:7.1%}")
+    if run["ai"]:
+        print(f"  AI job outcomes: {run['ai_statuses']}  stub: {run['stub']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the Flask app at fixed request rates against a Gemini stub")
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"Weighted endpoints, e.g. '{DEFAULT_MIX}' (choices: {', '.join(ENDPOINTS)})")
+    parser.add_argument('--rates', type=float, nargs='+', default=[5.0, 20.0], help="Requests per second, one run each")
+    parser.add_argument('--duration', type=float, default=20.0, help="Seconds of load per run")
+    parser.add_argument('--ai', choices=['off', 'on', 'both'], default='both')
+    parser.add_argument('--server', choices=['app', 'serve'], default='app',
+                        help="app.py's development server or the serve.py production server")
+    parser.add_argument('--workers', type=int, default=2, help="serve.py worker processes")
+    parser.add_argument('--threads', type=int, default=4, help="serve.py threads per worker")
+    parser.add_argument('--cold', action='store_true', help="Disable the analysis and AI result caches")
+    parser.add_argument('--concurrency', type=int, default=64, help="Most requests in flight at once")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Client timeout per request in seconds")
+    parser.add_argument('--ai-timeout', type=float, default=60.0,
+                        help="Longest wait for a recommendation job before counting it as an error")
+    parser.add_argument('--stub-latency', type=float, default=0.5, help="Mean Gemini stub delay in seconds")
+    parser.add_argument('--stub-jitter', type=float, default=0.2)
+    parser.add_argument('--stub-error-rate', type=float, default=0.0)
+    parser.add_argument('--stub-error-status', type=int, default=503)
+    parser.add_argument('--stub-hang-rate', type=float, default=0.0,
+                        help="Fraction of stub requests that outlast the app's Gemini timeout")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the request mix and the stub")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    modes = {'off': [False], 'on': [True], 'both': [False, True]}[args.ai]
+    stub, stub_port = start_stub(args)
+    runs = []
+    try:
+        for ai in modes:
+            for rate in args.rates:
+                # A fresh server per run, so caches and queues start empty
+                server, port = start_app(args, ai, stub_port)
+                try:
+                    warm_up(port, args.mix, args.timeout)
+                    before = stub_stats(stub_port)
+                    recorder, elapsed = run_load(port, args.mix, rate, args.duration, args.concurrency,
+                                                 args.timeout, args.ai_timeout, args.seed)
+                    after = stub_stats(stub_port)
+                finally:
+                    server.terminate()
+                    server.wait()
+                runs.append({
+                    "ai": ai,
+                    "server": args.server,
+                    "target_rps": rate,
+                    "elapsed_s": elapsed,
+                    "endpoints": summarize(recorder, elapsed),
+                    "ai_statuses": recorder.ai_statuses,
+                    "stub": {key: after[key] - before[key] for key in after}
+                })
+                if not args.json:
+                    print_run(runs[-1])
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    if args.json:
+        print(json.dumps({"mix": dict(args.mix), "duration_s": args.duration, "cold": args.cold, "runs": runs},
+                         indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
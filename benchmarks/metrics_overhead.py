@@ -0,0 +1,156 @@
+"""
+Cost of the /metrics instrumentation per analyzed password and per request.
+
+Times the primitives (perf_counter, a histogram observe, a counter inc and
+the per-request route recording), counts how many of each one
+analyze_password makes, and multiplies the two. It also times
+analyze_password on the fixed benchmark corpora with recording enabled and
+with observe/inc replaced by no-ops; that difference is noisy at this
+scale, so the estimate is what the budget is checked against.
+
+    python benchmarks/metrics_overhead.py                 # exit 1 if over --budget-us
+    python benchmarks/metrics_overhead.py --budget-us 3 --json
+"""
+import sys
+import json
+import time
+import timeit
+import logging
+import argparse
+import warnings
+from collections import Counter
+
+from analyzer_stages import DEFAULT_MODEL, build_corpora, make_analyzer, best_time
+
+import metrics
+import password_analyzer
+
+
+def primitive_costs(number=200000, repeat=5):
+    """Best-of-repeat cost of each instrumentation primitive, in microseconds"""
+    histogram = metrics.Histogram('overhead_histogram_seconds', 'Benchmark only').labels()
+    counter = metrics.Counter('overhead_counter', 'Benchmark only').labels()
+    request_seconds = metrics.Histogram('overhead_request_seconds', 'Benchmark only', ['route', 'method'])
+    requests = metrics.Counter('overhead_requests', 'Benchmark only', ['route', 'method', 'status'])
+
+    def observe_request():
+        # Same lookups as metrics.observe_request, without touching the process registry
+        request_seconds.labels('/analyze', 'POST').observe(0.002)
+        requests.labels('/analyze', 'POST', 200).inc()
+
+    def cost(function):
+        return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+    baseline = cost(lambda: None)
+    return {
+        "perf_counter": cost(time.perf_counter) - baseline,
+        "observe": cost(lambda: histogram.observe(0.00002)) - baseline,
+        "inc": cost(counter.inc) - baseline,
+        "observe_request": cost(observe_request) - baseline
+    }
+
+
+def count_calls(analyzer, passwords):
+    """Instrumentation calls per analyze_password, averaged over the passwords"""
+    calls = Counter()
+    real_perf_counter = password_analyzer.perf_counter
+    observe, inc = metrics._HistogramChild.observe, metrics._CounterChild.inc
+
+    def counting_perf_counter():
+        calls["perf_counter"] += 1
+        return real_perf_counter()
+
+    def counting_observe(self, value):
+        calls["observe"] += 1
+
+    def counting_inc(self, amount=1):
+        calls["inc"] += 1
+
+    password_analyzer.perf_counter = counting_perf_counter
+    metrics._HistogramChild.observe, metrics._CounterChild.inc = counting_observe, counting_inc
+    try:
+        for password in passwords:
+            analyzer.analyze_password(password, include_ai=False)
+    finally:
+        password_analyzer.perf_counter = real_perf_counter
+        metrics._HistogramChild.observe, metrics._CounterChild.inc = observe, inc
+    return {name: count / len(passwords) for name, count in calls.items()}
+
+
+def measured_overhead(analyzer, passwords, repeat):
+    """
+    analyze_password time with recording enabled and with observe/inc as
+    no-ops, us per password. Passes alternate so drift affects both alike.
+    """
+    run = lambda p: analyzer.analyze_password(p, include_ai=False)  # noqa: E731
+    for password in passwords:
+        run(password)
+    observe, inc = metrics._HistogramChild.observe, metrics._CounterChild.inc
+    enabled = disabled = float('inf')
+    try:
+        for _ in range(repeat):
+            enabled = min(enabled, best_time(run, passwords, 1))
+            metrics._HistogramChild.observe = lambda self, value: None
+            metrics._CounterChild.inc = lambda self, amount=1: None
+            disabled = min(disabled, best_time(run, passwords, 1))
+            metrics._HistogramChild.observe, metrics._CounterChild.inc = observe, inc
+    finally:
+        metrics._HistogramChild.observe, metrics._CounterChild.inc = observe, inc
+    return enabled, disabled
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure the per-request cost of the metrics instrumentation")
+    parser.add_argument('--budget-us', type=float, default=5.0,
+                        help="Most estimated overhead allowed per /analyze request, in microseconds")
+    parser.add_argument('--repeat', type=int, default=5, help="Passes per timing; the best is kept")
+    parser.add_argument('--corpus-size', type=int, default=200, help="Passwords per corpus")
+    parser.add_argument('--model-path', default=DEFAULT_MODEL)
+    parser.add_argument('--json', action='store_true', help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+    logging.basicConfig(level=logging.WARNING)
+    analyzer = make_analyzer(args.model_path)
+    passwords = [p for group in zip(*build_corpora(args.corpus_size).values()) for p in group]
+
+    costs = primitive_costs()
+    calls = count_calls(analyzer, passwords)
+    analyzer_us = sum(calls.get(name, 0) * costs[name] for name in ('perf_counter', 'observe', 'inc'))
+    # The Flask hooks take two timestamps and record the route once
+    request_us = 2 * costs["perf_counter"] + costs["observe_request"]
+    estimate = analyzer_us + request_us
+    enabled, disabled = measured_overhead(analyzer, passwords, args.repeat)
+
+    results = {
+        "primitives_us": costs,
+        "calls_per_password": calls,
+        "estimated_analyzer_us": analyzer_us,
+        "estimated_request_hooks_us": request_us,
+        "estimated_total_us": estimate,
+        "analyze_password_us": enabled,
+        "analyze_password_without_recording_us": disabled,
+        "budget_us": args.budget_us
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("Primitive costs:")
+        for name, value in costs.items():
+            print(f"  {name:<16} {value:8.3f} us")
+        print("Calls per analyze_password (result cache off): "
+              + ", ".join(f"{name} {count:.1f}" for name, count in sorted(calls.items())))
+        print(f"Estimated overhead: {analyzer_us:.2f} us in the analyzer + {request_us:.2f} us in the "
+              f"request hooks = {estimate:.2f} us per /analyze request")
+        print(f"analyze_password: {enabled:.2f} us recording, {disabled:.2f} us with recording disabled "
+              f"({enabled - disabled:+.2f} us, {(enabled - disabled) / disabled:+.1%})")
+
+    if estimate > args.budget_us:
+        print(f"FAILED: estimated overhead {estimate:.2f} us exceeds the {args.budget_us:.2f} us budget")
+        return 1
+    print(f"OK: estimated overhead within the {args.budget_us:.2f} us budget")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
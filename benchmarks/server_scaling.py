@@ -0,0 +1,158 @@
+"""
+Throughput of the prefork server (serve.py) as the worker count grows.
+
+For each worker count a server is started, warmed up, and driven by client
+processes holding keep-alive connections that POST /analyze in a closed
+loop. Requests per second and latency percentiles are printed per run.
+
+Passwords come from the fixed benchmark corpora (short, long, common and
+random), each client starting at its own offset, and the server runs with
+the result cache off, so every request is a full analysis. Pass --cache to
+measure with the cache on. Worker scaling can only show up on a host with
+more cores than the largest worker count plus the clients.
+
+    python benchmarks/server_scaling.py --workers 1 2 4 8 --duration 15
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import http.client
+import multiprocessing
+
+from analyzer_stages import build_corpora
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# A few fixed passwords for smoke runs (the load harness); the scaling runs use build_corpora
+PASSWORDS = ['password', 'Tr0ub4dor&3', 'correct horse battery staple', 'qwerty2019!',
+             'MyDragon#7', 'zxcvbnm', 'Xy9!kLm#2pQ', 'Summer2020!', '12/05/1999x', 'abc123']
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/breach-stats')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def client(port, duration, connections, passwords, offset, results):
+    """Closed-loop load from one process over several keep-alive connections, round robin"""
+    conns = [http.client.HTTPConnection('127.0.0.1', port, timeout=30) for _ in range(connections)]
+    latencies = []
+    errors = 0
+    i = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        conn = conns[i % connections]
+        body = json.dumps({"password": passwords[(offset + i) % len(passwords)]})
+        start = time.perf_counter()
+        try:
+            conn.request('POST', '/analyze', body, {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                errors += 1
+        except OSError:
+            errors += 1
+            conns[i % connections] = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    results.put((latencies, errors))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def run(workers, threads, clients, connections, duration, passwords, cache=False):
+    port = free_port()
+    env = dict(os.environ, LOG_LEVEL='warning', GEMINI_API_KEY='')
+    if not cache:
+        env['ANALYSIS_CACHE_SIZE'] = '0'
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, 'serve.py'), '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning'],
+        cwd=ROOT, env=env
+    )
+    try:
+        wait_until_ready(port)
+        results = multiprocessing.Queue()
+        stride = len(passwords) // clients
+        procs = [multiprocessing.Process(target=client,
+                                         args=(port, duration, connections, passwords, n * stride, results))
+                 for n in range(clients)]
+        for p in procs:
+            p.start()
+        latencies, errors = [], 0
+        for _ in procs:
+            lat, err = results.get()
+            latencies.extend(lat)
+            errors += err
+        for p in procs:
+            p.join()
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {
+        "workers": workers,
+        "threads": threads,
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "errors": errors
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure serve.py throughput by worker count")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=max(2, multiprocessing.cpu_count()),
+                        help="Load generator processes")
+    parser.add_argument('--connections', type=int, default=4, help="Keep-alive connections per client")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds per run")
+    parser.add_argument('--corpus-size', type=int, default=5000,
+                        help="Passwords per corpus kind (four kinds, interleaved)")
+    parser.add_argument('--cache', action='store_true', help="Keep the server's result cache on")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    passwords = [p for group in zip(*build_corpora(args.corpus_size).values()) for p in group]
+    cpus = multiprocessing.cpu_count()
+    if max(args.workers) + args.clients > cpus:
+        print(f"Warning: {cpus} CPUs for up to {max(args.workers)} workers and {args.clients} clients; "
+              f"runs beyond the core count measure contention, not scaling", file=sys.stderr)
+
+    rows = []
+    for workers in args.workers:
+        rows.append(run(workers, args.threads, args.clients, args.connections, args.duration, passwords,
+                        cache=args.cache))
+        if not args.json:
+            row = rows[-1]
+            print(f"workers={row['workers']:<3} rps={row['rps']:8.1f}  p50={row['p50_ms']:6.1f}ms  "
+                  f"p99={row['p99_ms']:6.1f}ms  errors={row['errors']}")
+    if args.json:
+        print(json.dumps({"cpus": cpus, "cache": args.cache, "passwords": len(passwords), "runs": rows}, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
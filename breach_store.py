@@ -0,0 +1,568 @@
+import os
+import sys
+import math
+import mmap
+import struct
+import hashlib
+import logging
+import argparse
+from array import array
+from collections import Counter
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import requests
+from genai_client import CircuitBreaker
+
+# On-disk index: a fixed header followed by sorted, unique 64-bit password keys
+INDEX_MAGIC = b'PWBS'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<4sHHQ')  # magic, version, reserved, entry count
+
+# Bloom filter sidecar: a fixed header followed by the raw bit array
+BLOOM_MAGIC = b'PWBF'
+BLOOM_VERSION = 1
+BLOOM_HEADER = struct.Struct('<4sHHQQ')  # magic, version, hash count, bit count, entry count
+BLOOM_SUFFIX = '.bloom'
+
+# k-anonymity range queries: only this many leading hex chars of a hash leave the process
+RANGE_PREFIX_LENGTH = 5
+
+# Stores opened in this process, shared by every PasswordAnalyzer instance
+_open_stores = {}
+
+
+def password_key(password):
+    """64-bit lookup key for a password: the first 8 bytes of its SHA-1 digest"""
+    digest = hashlib.sha1(password.encode('utf-8', 'surrogatepass')).digest()
+    return int.from_bytes(digest[:8], 'big')
+
+
+def file_identity(path):
+    """Path, size and modification time of a file, identifying its contents across processes"""
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def store_identity(store):
+    """
+    String identifying what a store contains, for cache keys shared between
+    processes: its source file or service when it has one, otherwise a hash
+    of its contents
+    """
+    identity = getattr(store, 'identity', None)
+    if identity is not None:
+        return identity
+    digest = hashlib.sha256()
+    for password in sorted(store):
+        digest.update(password.encode('utf-8', 'surrogatepass') + b'\n')
+    return f"set:{digest.hexdigest()}"
+
+
+class SetBreachStore:
+    """In-memory store backed by a Python set, suitable for small wordlists"""
+
+    def __init__(self, passwords=(), identity=None):
+        self.passwords = set(passwords)
+        self._identity = identity
+
+    @classmethod
+    def from_file(cls, path):
+        """Load a plain-text wordlist with one password per line"""
+        identity = f"wordlist:{file_identity(path)}"
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            return cls((line.strip() for line in f), identity=identity)
+
+    @property
+    def identity(self):
+        if self._identity is None:
+            self._identity = store_identity(self.passwords)
+        return self._identity
+
+    def __contains__(self, password):
+        return password in self.passwords
+
+    def __len__(self):
+        return len(self.passwords)
+
+
+class SortedIndexBreachStore:
+    """
+    Store backed by a memory-mapped index of sorted password keys.
+    Lookups are a binary search (O(log n)) over pages shared by every
+    process that maps the same file, so no worker holds its own copy.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.identity = f"index:{file_identity(path)}"
+        with open(path, 'rb') as f:
+            magic, version, _, count = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+        if magic != INDEX_MAGIC:
+            raise ValueError(f"{path} is not a breached-password index")
+        if version != INDEX_VERSION:
+            raise ValueError(f"Unsupported breached-password index version: {version}")
+
+        self.count = count
+        if count:
+            self.keys = np.memmap(path, dtype='<u8', mode='r', offset=INDEX_HEADER.size, shape=(count,))
+        else:
+            self.keys = np.zeros(0, dtype='<u8')
+
+    def contains_key(self, key):
+        """Check whether a precomputed password key is in the index"""
+        key = np.uint64(key)
+        i = int(np.searchsorted(self.keys, key))
+        return i < self.count and self.keys[i] == key
+
+    def __contains__(self, password):
+        return self.contains_key(password_key(password))
+
+    def __len__(self):
+        return self.count
+
+
+class BloomFilter:
+    """
+    Bloom filter over 64-bit password keys. A negative answer is definite,
+    a positive one is wrong with roughly the configured false-positive rate.
+    Probe positions use double hashing on the two halves of the key.
+    """
+
+    def __init__(self, num_bits, num_hashes, bits=None, count=0):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.count = count
+        self.bits = bits if bits is not None else np.zeros((num_bits + 7) // 8, dtype=np.uint8)
+
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate=0.01):
+        """Size a filter for the given number of entries and false-positive rate"""
+        if not 0 < false_positive_rate < 1:
+            raise ValueError("False-positive rate must be between 0 and 1")
+        capacity = max(capacity, 1)
+        num_bits = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, keys):
+        """Bit positions probed for an array of keys, one row per hash"""
+        keys = np.asarray(keys, dtype=np.uint64)
+        h1 = keys & np.uint64(0xFFFFFFFF)
+        h2 = (keys >> np.uint64(32)) | np.uint64(1)
+        probes = np.arange(self.num_hashes, dtype=np.uint64)[:, None]
+        return (h1 + probes * h2) % np.uint64(self.num_bits)
+
+    def add_keys(self, keys):
+        """Add an array of password keys"""
+        positions = self._positions(keys).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self.count += len(keys)
+
+    def might_contain_key(self, key):
+        """False if the key is definitely absent, True if it may be present"""
+        h1 = key & 0xFFFFFFFF
+        h2 = (key >> 32) | 1
+        bits = self.bits
+        for i in range(self.num_hashes):
+            position = (h1 + i * h2) % self.num_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __contains__(self, password):
+        return self.might_contain_key(password_key(password))
+
+    def __len__(self):
+        return self.count
+
+    def save(self, path):
+        """Write the filter atomically to path"""
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(BLOOM_HEADER.pack(BLOOM_MAGIC, BLOOM_VERSION, self.num_hashes, self.num_bits, self.count))
+            f.write(np.asarray(self.bits, dtype=np.uint8).tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a saved filter so its pages are shared across processes"""
+        with open(path, 'rb') as f:
+            magic, version, num_hashes, num_bits, count = BLOOM_HEADER.unpack(f.read(BLOOM_HEADER.size))
+            if magic != BLOOM_MAGIC:
+                raise ValueError(f"{path} is not a Bloom filter")
+            if version != BLOOM_VERSION:
+                raise ValueError(f"Unsupported Bloom filter version: {version}")
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Indexing the mmap directly is cheaper per probe than a NumPy view
+        bits = memoryview(mapped)[BLOOM_HEADER.size:]
+        return cls(num_bits, num_hashes, bits=bits, count=count)
+
+
+class FilteredBreachStore:
+    """
+    Breached-password store with a Bloom filter fast path. Passwords the
+    filter rejects skip the exact lookup entirely; counters record how often
+    that happens and how often the filter was wrong.
+    """
+
+    def __init__(self, store, bloom):
+        self.store = store
+        self.bloom = bloom
+        # The exact lookup decides every answer, so the filter does not change what the store contains
+        self.identity = store_identity(store)
+        self.filter_negatives = 0
+        self.filter_positives = 0
+        self.hits = 0
+        self.false_positives = 0
+
+    def __contains__(self, password):
+        key = password_key(password)
+        if not self.bloom.might_contain_key(key):
+            self.filter_negatives += 1
+            return False
+
+        self.filter_positives += 1
+        if self.store.contains_key(key):
+            self.hits += 1
+            return True
+        self.false_positives += 1
+        return False
+
+    def __len__(self):
+        return len(self.store)
+
+    def stats(self):
+        """Hit/miss counters for the filter and the exact lookup"""
+        lookups = self.filter_negatives + self.filter_positives
+        return {
+            "lookups": lookups,
+            "filter_negatives": self.filter_negatives,
+            "filter_positives": self.filter_positives,
+            "hits": self.hits,
+            "misses": lookups - self.hits,
+            "false_positives": self.false_positives,
+            "bloom_bytes": len(self.bloom.bits),
+            "bloom_hashes": self.bloom.num_hashes
+        }
+
+
+def password_digest(password, hash_name='sha1'):
+    """Uppercase hex digest of a password, as used by range indexes"""
+    return hashlib.new(hash_name, password.encode('utf-8', 'surrogatepass')).hexdigest().upper()
+
+
+def parse_range_lines(lines):
+    """Parse 'SUFFIX:COUNT' (or bare 'SUFFIX') lines into a set of suffixes"""
+    suffixes = set()
+    for line in lines:
+        line = line.strip()
+        if line:
+            suffixes.add(line.split(':', 1)[0].upper())
+    return suffixes
+
+
+class FileRangeSource:
+    """
+    Range source over a local file of full hashes sorted ascending, one
+    'HASH:COUNT' line each (the Have I Been Pwned download format). A range
+    query is a binary search for the first line with the prefix.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.identity = f"file:{file_identity(path)}"
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+
+    def _lower_bound(self, prefix):
+        """Offset of the first line whose hash is >= prefix"""
+        data = self._map
+        lo, hi = 0, len(data)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = data.rfind(b'\n', 0, mid) + 1
+            end = data.find(b'\n', start)
+            if end == -1:
+                end = len(data)
+            if data[start:start + len(prefix)] < prefix:
+                lo = end + 1
+            else:
+                hi = start
+        return lo
+
+    def get_range(self, prefix):
+        """Return the hash suffixes stored under a hex prefix"""
+        prefix_bytes = prefix.encode('ascii')
+        data = self._map
+        offset = self._lower_bound(prefix_bytes)
+        lines = []
+        while offset < len(data):
+            end = data.find(b'\n', offset)
+            if end == -1:
+                end = len(data)
+            line = data[offset:end]
+            if not line.startswith(prefix_bytes):
+                break
+            lines.append(line[len(prefix_bytes):].decode('ascii'))
+            offset = end + 1
+        return parse_range_lines(lines)
+
+
+class HttpRangeSource:
+    """Range source that queries GET {base_url}/range/{prefix}, in the style of the Pwned Passwords API"""
+
+    def __init__(self, base_url, timeout=5):
+        self.base_url = base_url.rstrip('/')
+        self.identity = f"url:{self.base_url}"
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def get_range(self, prefix):
+        """Return the hash suffixes the service holds under a hex prefix"""
+        response = self.session.get(f"{self.base_url}/range/{prefix}", timeout=self.timeout)
+        response.raise_for_status()
+        return parse_range_lines(response.text.splitlines())
+
+
+class BreachCheckUnavailable(Exception):
+    """The range source could not be asked (its circuit breaker is open)"""
+
+
+class RangeBreachStore:
+    """
+    Breached-password store using k-anonymity range queries. Only the first
+    RANGE_PREFIX_LENGTH hex characters of the password hash are sent to the
+    source; the suffix is compared locally. Range responses are kept in an
+    LRU cache so hot prefixes never repeat the I/O. After failure_threshold
+    consecutive source errors a circuit breaker skips the source for
+    reset_timeout seconds, so an outage does not cost every lookup a timeout.
+    """
+
+    def __init__(self, source, hash_name='sha1', cache_size=4096, failure_threshold=3, reset_timeout=30):
+        self.source = source
+        self.hash_name = hash_name
+        self.identity = f"range:{hash_name}:{getattr(source, 'identity', None) or repr(source)}"
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        # Errors are not cached, so a failed prefix is retried once the breaker allows it
+        self._get_range = lru_cache(maxsize=cache_size)(self._fetch_range)
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.unavailable = 0
+
+    def _fetch_range(self, prefix):
+        permit = self.breaker.allow_request()
+        if not permit:
+            raise BreachCheckUnavailable("Breached-password range source is failing; lookups are skipped")
+        try:
+            suffixes = self.source.get_range(prefix)
+        except Exception:
+            self.breaker.record_failure()
+            raise
+        else:
+            self.breaker.record_success()
+        finally:
+            if permit == CircuitBreaker.TRIAL:
+                self.breaker.end_trial()
+        return suffixes
+
+    def lookup(self, password):
+        """True if the password is breached, False if not, None if the source could not be asked"""
+        digest = password_digest(password, self.hash_name)
+        try:
+            suffixes = self._get_range(digest[:RANGE_PREFIX_LENGTH])
+        except BreachCheckUnavailable:
+            self.unavailable += 1
+            return None
+        except Exception as e:
+            logging.error(f"Error querying breached-password range: {e}")
+            self.errors += 1
+            return None
+
+        if digest[RANGE_PREFIX_LENGTH:] in suffixes:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def __contains__(self, password):
+        # A failed lookup counts as not breached; use lookup() to tell the two apart
+        return self.lookup(password) is True
+
+    def __len__(self):
+        # The full corpus size is unknown to a range client
+        return 0
+
+    def stats(self):
+        """Lookup counters and range cache usage"""
+        cache = self._get_range.cache_info()
+        return {
+            "lookups": self.hits + self.misses + self.errors + self.unavailable,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "unavailable": self.unavailable,
+            "breaker_state": self.breaker.state,
+            "range_cache_hits": cache.hits,
+            "range_cache_misses": cache.misses,
+            "range_cache_size": cache.currsize
+        }
+
+
+def open_range_store(location, hash_name='sha1', cache_size=4096):
+    """Open a range store over an http(s) range service or a local sorted hash file"""
+    cache_key = ('range', location, hash_name)
+    if cache_key in _open_stores:
+        return _open_stores[cache_key]
+
+    if location.startswith(('http://', 'https://')):
+        source = HttpRangeSource(location)
+    else:
+        source = FileRangeSource(location)
+    store = RangeBreachStore(source, hash_name=hash_name, cache_size=cache_size)
+    _open_stores[cache_key] = store
+    return store
+
+
+def is_index_file(path):
+    """Check whether a file starts with the breached-password index header"""
+    with open(path, 'rb') as f:
+        return f.read(len(INDEX_MAGIC)) == INDEX_MAGIC
+
+
+def open_breach_store(path):
+    """
+    Open a breached-password store from an index or plain-text wordlist.
+    Stores are cached per path, so repeated analyzers share one instance.
+    """
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    cached = _open_stores.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+
+    if is_index_file(path):
+        store = SortedIndexBreachStore(path)
+        # Put the Bloom filter sidecar, if one was built, in front of the index
+        bloom_path = path + BLOOM_SUFFIX
+        if os.path.exists(bloom_path):
+            store = FilteredBreachStore(store, BloomFilter.load(bloom_path))
+    else:
+        store = SetBreachStore.from_file(path)
+    _open_stores[path] = (mtime, store)
+    return store
+
+
+def iter_wordlist(path):
+    """Yield stripped, non-empty passwords from a plain-text wordlist"""
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            password = line.strip()
+            if password:
+                yield password
+
+
+def build_index(wordlist_path, index_path, false_positive_rate=None):
+    """
+    Build a sorted on-disk index from a plain-text wordlist and return its size.
+    If a false-positive rate is given, also build a Bloom filter sidecar.
+    """
+    keys = array('Q')
+    for password in iter_wordlist(wordlist_path):
+        keys.append(password_key(password))
+    keys = np.unique(np.frombuffer(keys, dtype=np.uint64)).astype('<u8')
+
+    if false_positive_rate is not None:
+        bloom = BloomFilter.for_capacity(len(keys), false_positive_rate)
+        bloom.add_keys(keys)
+        bloom.save(index_path + BLOOM_SUFFIX)
+
+    # Write to a temporary file and rename so readers never see a partial index
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, 0, len(keys)))
+        keys.tofile(f)
+    os.replace(tmp_path, index_path)
+    return len(keys)
+
+
+def build_range_file(wordlist_path, range_path, hash_name='sha1'):
+    """Build a sorted 'HASH:COUNT' file from a plain-text wordlist and return its size"""
+    counts = Counter(password_digest(password, hash_name) for password in iter_wordlist(wordlist_path))
+
+    tmp_path = range_path + '.tmp'
+    with open(tmp_path, 'w', encoding='ascii') as f:
+        for digest in sorted(counts):
+            f.write(f"{digest}:{counts[digest]}\n")
+    os.replace(tmp_path, range_path)
+    return len(counts)
+
+
+def make_range_handler(source):
+    """Request handler class serving GET /range/<prefix> from a range source"""
+
+    class RangeHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            parts = self.path.strip('/').split('/')
+            prefix = parts[1].upper() if len(parts) == 2 and parts[0] == 'range' else ''
+            if len(prefix) != RANGE_PREFIX_LENGTH or any(c not in '0123456789ABCDEF' for c in prefix):
+                self.send_error(400, "Expected /range/<5 hex characters>")
+                return
+
+            body = ''.join(f"{suffix}\r\n" for suffix in sorted(source.get_range(prefix))).encode('ascii')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logging.debug(format % args)
+
+    return RangeHandler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build breached-password indexes")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build = subparsers.add_parser('build', help="Build a sorted index from a wordlist")
+    build.add_argument('wordlist', help="Plain-text wordlist, one password per line")
+    build.add_argument('index', help="Output index path")
+    build.add_argument('--bloom-fpr', type=float, default=None,
+                       help="Also build a Bloom filter sidecar with this false-positive rate (e.g. 0.01)")
+
+    build_range = subparsers.add_parser('build-range', help="Build a sorted hash file for range queries")
+    build_range.add_argument('wordlist', help="Plain-text wordlist, one password per line")
+    build_range.add_argument('output', help="Output 'HASH:COUNT' file")
+    build_range.add_argument('--hash', default='sha1', help="Hash algorithm (default: sha1)")
+
+    serve = subparsers.add_parser('serve', help="Serve range queries from a sorted hash file")
+    serve.add_argument('range_file', help="File built with build-range")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8787)
+
+    args = parser.parse_args(argv)
+    if args.command == 'build-range':
+        count = build_range_file(args.wordlist, args.output, args.hash)
+        print(f"Wrote {count} hashes to {args.output}")
+    elif args.command == 'serve':
+        server = ThreadingHTTPServer((args.host, args.port), make_range_handler(FileRangeSource(args.range_file)))
+        print(f"Serving range queries on http://{args.host}:{args.port}/range/<prefix>")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'build':
+        count = build_index(args.wordlist, args.index, args.bloom_fpr)
+        print(f"Indexed {count} passwords into {args.index}")
+        if args.bloom_fpr is not None:
+            print(f"Bloom filter written to {args.index}{BLOOM_SUFFIX}")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,139 @@
+import hmac
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def fingerprint(fields):
+    """Stable hash of a dict of JSON-serializable fields"""
+    canonical = json.dumps(fields, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+def keyed_fingerprint(key, fields):
+    """
+    HMAC-SHA256 of a dict of JSON-serializable fields. Unlike fingerprint(),
+    entries cannot be matched against guessed inputs without the key.
+    """
+    canonical = json.dumps(fields, sort_keys=True, separators=(',', ':'))
+    return hmac.new(key, canonical.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+class TTLCache:
+    """In-process LRU cache with a size bound and per-entry time-to-live"""
+
+    def __init__(self, max_size=1024, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return the cached value, or None if it is missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries)
+        }
+
+
+class SQLiteCache:
+    """
+    On-disk cache with the same interface as TTLCache. Entries survive
+    restarts and can be shared by processes on the same host; values must
+    be JSON-serializable. Least recently used rows are pruned past max_size.
+    """
+
+    def __init__(self, path, max_size=100000, ttl=86400):
+        self.path = path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or row[1] <= now:
+                if row is not None:
+                    self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now)
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_size,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self)
+        }
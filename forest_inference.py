@@ -0,0 +1,139 @@
+import struct
+import numpy as np
+
+# Version of the exported .npz layout
+FOREST_FORMAT_VERSION = 1
+FOREST_SUFFIX = '.npz'
+
+
+def _to_float32(value):
+    """Round a Python float to float32 precision, as sklearn does with its inputs"""
+    return struct.unpack('f', struct.pack('f', value))[0]
+
+
+class CompiledForest:
+    """
+    Tree-ensemble classifier compiled to flat arrays: one node table for all
+    trees (feature index, threshold, left/right child, class probabilities)
+    plus each tree's root. Batches are evaluated by vectorized traversal and
+    single rows by a pure-Python walk, reproducing sklearn's
+    RandomForestClassifier.predict_proba without importing sklearn.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, classes, max_depth):
+        self.feature = np.asarray(feature, dtype=np.int64)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int64)
+        self.right = np.asarray(right, dtype=np.int64)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.classes_ = np.asarray(classes)
+        self.max_depth = int(max_depth)
+
+        # Plain lists for the single-row path, where NumPy indexing costs more than it saves
+        self._feature_list = self.feature.tolist()
+        self._threshold_list = self.threshold.tolist()
+        self._left_list = self.left.tolist()
+        self._right_list = self.right.tolist()
+        self._value_list = self.value.tolist()
+        self._root_list = self.roots.tolist()
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """Compile a fitted sklearn forest of decision tree classifiers"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            is_leaf = tree.children_left == -1
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            lefts.append(np.where(is_leaf, -1, tree.children_left + offset))
+            rights.append(np.where(is_leaf, -1, tree.children_right + offset))
+            # Per-leaf class probabilities, normalized as DecisionTreeClassifier.predict_proba does
+            value = tree.value[:, 0, :].astype(np.float64)
+            normalizer = value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            values.append(value / normalizer)
+            roots.append(offset)
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+                   np.concatenate(rights), np.concatenate(values), roots, model.classes_, max_depth)
+
+    def predict_proba(self, X):
+        """Class probabilities averaged over the trees, like RandomForestClassifier.predict_proba"""
+        if len(X) == 1:
+            return np.array([self.predict_proba_one(X[0])])
+
+        # Column-major float32 inputs, widened for the comparison against float64 thresholds
+        X_columns = np.ascontiguousarray(np.asarray(X, dtype=np.float32).T, dtype=np.float64)
+        n_samples = X_columns.shape[1]
+        rows = np.arange(n_samples)
+        proba = np.zeros((n_samples, self.value.shape[1]))
+        # One tree at a time keeps temporaries small and sums the trees in sklearn's order
+        for root in self._root_list:
+            nodes = np.full(n_samples, root)
+            for _ in range(self.max_depth):
+                left = self.left[nodes]
+                internal = left != -1
+                if not internal.any():
+                    break
+                go_left = X_columns[self.feature[nodes], rows] <= self.threshold[nodes]
+                nodes = np.where(internal, np.where(go_left, left, self.right[nodes]), nodes)
+            proba += self.value[nodes]
+        proba /= len(self._root_list)
+        return proba
+
+    def predict_proba_one(self, x):
+        """Pure-Python class probabilities for a single feature row"""
+        x = [_to_float32(float(v)) for v in x]
+        feature = self._feature_list
+        threshold = self._threshold_list
+        left = self._left_list
+        right = self._right_list
+        value = self._value_list
+
+        proba = [0.0] * len(value[0])
+        for node in self._root_list:
+            while left[node] != -1:
+                node = left[node] if x[feature[node]] <= threshold[node] else right[node]
+            leaf = value[node]
+            for i in range(len(proba)):
+                proba[i] += leaf[i]
+        n_trees = len(self._root_list)
+        return [p / n_trees for p in proba]
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def score(self, X, y):
+        """Mean accuracy, like sklearn's ClassifierMixin.score"""
+        return float(np.mean(self.predict(X) == np.asarray(y)))
+
+    def __len__(self):
+        return len(self.roots)
+
+    def save(self, path):
+        """Export the compiled arrays to an uncompressed .npz"""
+        np.savez(path, format_version=FOREST_FORMAT_VERSION, feature=self.feature, threshold=self.threshold,
+                 left=self.left, right=self.right, value=self.value, roots=self.roots,
+                 classes=self.classes_, max_depth=self.max_depth)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            if int(data['format_version']) != FOREST_FORMAT_VERSION:
+                raise ValueError(f"Unsupported compiled forest version: {int(data['format_version'])}")
+            return cls(data['feature'], data['threshold'], data['left'], data['right'], data['value'],
+                       data['roots'], data['classes'], int(data['max_depth']))
+
+
+def compile_model(model):
+    """Compile sklearn tree forests; any other model is returned unchanged"""
+    estimators = getattr(model, 'estimators_', None)
+    if estimators is not None and hasattr(model, 'classes_') and all(hasattr(e, 'tree_') for e in estimators):
+        return CompiledForest.from_sklearn(model)
+    return model
@@ -0,0 +1,294 @@
+import os
+import time
+import asyncio
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+# Gemini generateContent endpoint; override to point at a local stub server
+GEMINI_API_URL = os.environ.get(
+    'GEMINI_API_URL',
+    "https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent"
+)
+
+# Upstream responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+def build_payload(prompt):
+    """Gemini generateContent request body for a single text prompt"""
+    return {
+        "contents": [{
+            "parts": [{
+                "text": prompt
+            }]
+        }]
+    }
+
+
+def extract_text(response_json):
+    """Text of the first candidate in a generateContent response, or None"""
+    try:
+        return response_json['candidates'][0]['content']['parts'][0]['text']
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+class CircuitBreaker:
+    """
+    Stop calling an upstream that keeps failing. After failure_threshold
+    consecutive failures the circuit opens and requests are skipped for
+    reset_timeout seconds; then a single trial request decides whether it
+    closes again.
+    """
+    # Truthy value allow_request returns for the half-open trial request
+    TRIAL = 'trial'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half-open'
+            return 'open'
+
+    def allow_request(self):
+        """
+        Whether a request may be sent now: False, True, or TRIAL for the one
+        half-open trial, whose caller must call end_trial when it finishes.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return self.TRIAL
+
+    def end_trial(self):
+        """
+        Release a trial that ended without recording an outcome (e.g. it was
+        cancelled), so the next request may try again instead of the circuit
+        staying shut for good. No-op after record_success or record_failure.
+        """
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class GeminiClient:
+    """
+    Shared HTTP client for the Gemini API: a pooled keep-alive session,
+    connect/read timeouts, bounded retries with jittered exponential
+    backoff, a circuit breaker and a cap on concurrent upstream calls.
+    Every failure path returns None so callers can skip the AI step.
+    """
+
+    def __init__(self, api_url=None, connect_timeout=None, read_timeout=None, max_retries=None,
+                 backoff=0.5, max_backoff=8.0, max_concurrency=None, breaker=None, session=None):
+        self.api_url = api_url or GEMINI_API_URL
+        self.timeout = (
+            connect_timeout if connect_timeout is not None else float(os.environ.get('GEMINI_CONNECT_TIMEOUT', 3.05)),
+            read_timeout if read_timeout is not None else float(os.environ.get('GEMINI_TIMEOUT', 30))
+        )
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('GEMINI_MAX_RETRIES', 2))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        max_concurrency = max_concurrency or int(os.environ.get('GEMINI_MAX_CONCURRENCY', 8))
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.environ.get('GEMINI_BREAKER_FAILURES', 5)),
+            reset_timeout=float(os.environ.get('GEMINI_BREAKER_RESET', 30))
+        )
+
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+        self.session = session
+
+    def _sleep_before_retry(self, attempt):
+        """Full-jitter exponential backoff"""
+        time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+
+    def generate_content(self, prompt, api_key):
+        """Call generateContent and return the response JSON, or None on any failure"""
+        if not api_key:
+            logging.error("API key is missing.")
+            return None
+        # Don't queue behind a saturated upstream; wait at most one connect timeout
+        if not self._slots.acquire(timeout=self.timeout[0]):
+            logging.warning("Gemini concurrency limit reached; skipping AI recommendations")
+            return None
+
+        permit = False
+        try:
+            permit = self.breaker.allow_request()
+            if not permit:
+                logging.warning("Gemini circuit breaker is open; skipping AI recommendations")
+                return None
+
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    self._sleep_before_retry(attempt - 1)
+                try:
+                    response = self.session.post(
+                        self.api_url,
+                        params={"key": api_key},
+                        json=build_payload(prompt),
+                        timeout=self.timeout
+                    )
+                except requests.RequestException as e:
+                    logging.warning(f"Gemini API request failed (attempt {attempt + 1}): {e.__class__.__name__}")
+                    continue
+
+                logging.debug(f"Gemini API response code: {response.status_code}")
+                if response.status_code in RETRY_STATUSES:
+                    continue
+
+                # The upstream answered, so it is healthy even if it rejected the request
+                self.breaker.record_success()
+                if response.status_code != 200:
+                    logging.error(f"API Error: {response.status_code}")
+                    return None
+                try:
+                    return response.json()
+                except ValueError:
+                    logging.error("Gemini API returned invalid JSON")
+                    return None
+
+            logging.error(f"Gemini API unavailable after {self.max_retries + 1} attempts")
+            self.breaker.record_failure()
+            return None
+        finally:
+            # A trial that raised or was cancelled recorded nothing; don't leave the breaker waiting on it
+            if permit == CircuitBreaker.TRIAL:
+                self.breaker.end_trial()
+            self._slots.release()
+
+
+class AsyncGeminiClient:
+    """
+    asyncio counterpart of GeminiClient for the ASGI app, built on
+    httpx.AsyncClient. Same timeouts, retries, breaker and failure
+    semantics, but waiting on the API does not hold a thread.
+    """
+
+    def __init__(self, api_url=None, connect_timeout=None, read_timeout=None, max_retries=None,
+                 backoff=0.5, max_backoff=8.0, max_concurrency=None, breaker=None):
+        import httpx
+
+        self.api_url = api_url or GEMINI_API_URL
+        connect_timeout = connect_timeout if connect_timeout is not None else float(os.environ.get('GEMINI_CONNECT_TIMEOUT', 3.05))
+        read_timeout = read_timeout if read_timeout is not None else float(os.environ.get('GEMINI_TIMEOUT', 30))
+        self.connect_timeout = connect_timeout
+        self.max_retries = max_retries if max_retries is not None else int(os.environ.get('GEMINI_MAX_RETRIES', 2))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # Coroutines are cheap, so the default cap is far higher than the threaded client's
+        max_concurrency = max_concurrency or int(os.environ.get('GEMINI_ASYNC_MAX_CONCURRENCY', 1024))
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.environ.get('GEMINI_BREAKER_FAILURES', 5)),
+            reset_timeout=float(os.environ.get('GEMINI_BREAKER_RESET', 30))
+        )
+        self._httpx = httpx
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+        )
+
+    async def generate_content(self, prompt, api_key):
+        """Call generateContent and return the response JSON, or None on any failure"""
+        if not api_key:
+            logging.error("API key is missing.")
+            return None
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.connect_timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Gemini concurrency limit reached; skipping AI recommendations")
+            return None
+
+        permit = False
+        try:
+            permit = self.breaker.allow_request()
+            if not permit:
+                logging.warning("Gemini circuit breaker is open; skipping AI recommendations")
+                return None
+
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    await asyncio.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1))))
+                try:
+                    response = await self.client.post(
+                        self.api_url,
+                        params={"key": api_key},
+                        json=build_payload(prompt)
+                    )
+                except self._httpx.HTTPError as e:
+                    logging.warning(f"Gemini API request failed (attempt {attempt + 1}): {e.__class__.__name__}")
+                    continue
+
+                logging.debug(f"Gemini API response code: {response.status_code}")
+                if response.status_code in RETRY_STATUSES:
+                    continue
+
+                self.breaker.record_success()
+                if response.status_code != 200:
+                    logging.error(f"API Error: {response.status_code}")
+                    return None
+                try:
+                    return response.json()
+                except ValueError:
+                    logging.error("Gemini API returned invalid JSON")
+                    return None
+
+            logging.error(f"Gemini API unavailable after {self.max_retries + 1} attempts")
+            self.breaker.record_failure()
+            return None
+        finally:
+            # A trial that raised or was cancelled recorded nothing; don't leave the breaker waiting on it
+            if permit == CircuitBreaker.TRIAL:
+                self.breaker.end_trial()
+            self._slots.release()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide GeminiClient shared by every caller"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = GeminiClient()
+    return _client
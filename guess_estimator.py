@@ -0,0 +1,416 @@
+import re
+import math
+import datetime
+from collections import namedtuple
+from functools import lru_cache
+
+from pattern_matcher import PatternMatcher
+
+# One piece of the cheapest decomposition found for a password
+GuessSegment = namedtuple('GuessSegment', ['kind', 'token', 'start', 'end', 'log10_guesses'])
+GuessEstimate = namedtuple('GuessEstimate', ['log10_guesses', 'segments'])
+
+# Characters examined per password, so the cost of an estimate does not grow with
+# the input; the rest continues the last repeat, repeats on its own or is brute force
+MAX_ESTIMATE_LENGTH = 256
+# Longest repeated block, as in _REPEAT_RE
+MAX_REPEAT_BLOCK = 8
+# Segment counts above this share one DP state
+MAX_SEGMENTS = 12
+# zxcvbn's additive term for multi-segment guesses and minimum guesses for partial matches
+MIN_GUESSES_BEFORE_GROWING_SEQUENCE = 10000
+MIN_SUBMATCH_GUESSES_SINGLE_CHAR = 10
+MIN_SUBMATCH_GUESSES_MULTI_CHAR = 50
+
+# Keyboard layout for spatial patterns (rows of an unshifted QWERTY keyboard)
+KEYBOARD_LAYOUT_ROWS = ["`1234567890-=", "qwertyuiop[]\\", "asdfghjkl;'", "zxcvbnm,./"]
+KEYBOARD_STARTING_POSITIONS = 47
+KEYBOARD_AVERAGE_DEGREE = 4.6
+
+REFERENCE_YEAR = datetime.date.today().year
+MIN_YEAR_SPACE = 20
+DATE_MIN_YEAR = 1000
+DATE_MAX_YEAR = 2050
+# Ways to split a run of 4-8 digits into day, month and year
+DATE_SPLITS = {
+    4: [(1, 2), (2, 3)],
+    5: [(1, 3), (2, 3)],
+    6: [(1, 2), (2, 4), (4, 5)],
+    7: [(1, 3), (2, 3), (4, 5), (4, 6)],
+    8: [(2, 4), (4, 6)]
+}
+
+_REPEAT_RE = re.compile(r'(.{1,%d}?)\1+' % MAX_REPEAT_BLOCK, re.DOTALL)
+_SEPARATED_DATE_RE = re.compile(r'(\d{1,4})([\s/\\_.-])(\d{1,2})\2(\d{1,4})')
+_YEAR_RE = re.compile(r'19\d\d|20\d\d')
+_DIGIT_RUN_RE = re.compile(r'\d{4,}')
+
+_KEY_POSITIONS = {char: (row, col) for row, keys in enumerate(KEYBOARD_LAYOUT_ROWS) for col, char in enumerate(keys)}
+# Neighbouring keys on the same row, in both directions
+_ROW_PAIRS = {keys[i:i + 2] for row in KEYBOARD_LAYOUT_ROWS for keys in (row, row[::-1]) for i in range(len(keys) - 1)}
+
+
+def _log10_sum(a, b):
+    """log10(10**a + 10**b) without leaving log space"""
+    if a < b:
+        a, b = b, a
+    return a + math.log10(1 + 10 ** (b - a))
+
+
+def charset_size(text):
+    """Brute-force alphabet for the character classes in text, as in PasswordAnalyzer's crack-time estimate"""
+    size = 0
+    if any('a' <= c <= 'z' for c in text):
+        size += 26
+    if any('A' <= c <= 'Z' for c in text):
+        size += 26
+    if any('0' <= c <= '9' for c in text):
+        size += 10
+    if any(not ('a' <= c <= 'z' or 'A' <= c <= 'Z' or '0' <= c <= '9') for c in text):
+        size += 33  # Common special characters
+    return size or 26
+
+
+def uppercase_variations(token):
+    """Capitalization variants an attacker tries for a dictionary word"""
+    upper = sum(1 for c in token if c.isupper())
+    lower = sum(1 for c in token if c.islower())
+    if upper == 0 or lower == 0:
+        return 1
+    if upper == 1 and (token[0].isupper() or token[-1].isupper()):
+        return 2
+    return sum(math.comb(upper + lower, i) for i in range(1, min(upper, lower) + 1))
+
+
+@lru_cache(maxsize=1024)
+def spatial_guesses(length, turns):
+    """zxcvbn's count of keyboard walks of a given length and number of direction changes"""
+    guesses = 0.0
+    for i in range(2, length + 1):
+        # comb(i - 1, j - 1) updated in floats; the terms stay far below the float range for 256 keys
+        combinations = 1.0
+        for j in range(1, min(turns, i - 1) + 1):
+            guesses += combinations * KEYBOARD_STARTING_POSITIONS * KEYBOARD_AVERAGE_DEGREE ** j
+            combinations = combinations * (i - j) / j
+    return max(guesses, 1.0)
+
+
+def _keyboard_turns(token):
+    """Direction changes along a keyboard walk; jumps between keys count as turns"""
+    turns = 1
+    direction = None
+    for a, b in zip(token, token[1:]):
+        pa, pb = _KEY_POSITIONS.get(a), _KEY_POSITIONS.get(b)
+        step = (pb[0] - pa[0], pb[1] - pa[1]) if pa and pb else None
+        if direction is not None and step != direction:
+            turns += 1
+        direction = step
+    return turns
+
+
+def _lower_same_length(text):
+    """Lowercase text, leaving characters whose lowercase form is longer (e.g. U+0130) unchanged"""
+    lower = text.lower()
+    if len(lower) == len(text):
+        return lower
+    return ''.join(c.lower() if len(c.lower()) == 1 else c for c in text)
+
+
+def _year_space(year):
+    return max(abs(year - REFERENCE_YEAR), MIN_YEAR_SPACE)
+
+
+def _expand_year(year):
+    if year > 99:
+        return year
+    return year + (1900 if year > 50 else 2000)
+
+
+def _parse_date(numbers):
+    """Year of a day/month/year triple in any common order, or None if it is not a date"""
+    for year, rest in ((numbers[2], numbers[:2]), (numbers[0], numbers[1:])):
+        if not (DATE_MIN_YEAR <= year <= DATE_MAX_YEAR or year <= 99):
+            continue
+        a, b = rest
+        if (1 <= a <= 31 and 1 <= b <= 12) or (1 <= a <= 12 and 1 <= b <= 31):
+            return _expand_year(year)
+    return None
+
+
+def _combine(cost, count):
+    """zxcvbn: count! orderings of the segments, plus a floor that grows with their number"""
+    return _log10_sum(cost + math.lgamma(count + 1) / math.log(10),
+                      (count - 1) * math.log10(MIN_GUESSES_BEFORE_GROWING_SEQUENCE))
+
+
+def _period(text, start, end):
+    """Shortest block of up to MAX_REPEAT_BLOCK characters that text[start:end] repeats, or 0"""
+    for size in range(1, min(MAX_REPEAT_BLOCK, (end - start) // 2) + 1):
+        if text[start + size:end] == text[start:end - size]:
+            return size
+    return 0
+
+
+def _repeat_end(text, start, size):
+    """
+    End of the run from start in which every character equals the one size
+    before it. A binary search over slice comparisons, so it runs at C speed
+    for any length.
+    """
+    low, high = start + size, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if text[start + size:middle] == text[start:middle - size]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _keep_cheapest(states, count, cost, back):
+    """Record a DP state unless one with no more segments is at least as cheap"""
+    for other, (other_cost, _) in states.items():
+        if other <= count and other_cost <= cost:
+            return
+    states[count] = (cost, back)
+
+
+class GuessEstimator:
+    """
+    zxcvbn-style guess estimation in log10 space. The password is matched
+    against dictionary words, keyboard walks, character sequences, repeats
+    and dates; dynamic programming then picks the decomposition into those
+    matches and brute-force gaps with the fewest total guesses. Everything
+    stays in logarithms, so no intermediate value can overflow. Input past
+    MAX_ESTIMATE_LENGTH is not matched: it extends a repeat that runs to
+    the end of the scanned text, is priced as a repeat if it is periodic
+    itself, and is brute force otherwise.
+    """
+
+    def __init__(self, words=(), keyboard_patterns=()):
+        # Dictionary rank is the word's position in its list
+        self.matcher = PatternMatcher()
+        self.ranks = {}
+        for rank, word in enumerate(words, 1):
+            word = word.lower()
+            if word not in self.ranks:
+                self.ranks[word] = rank
+                self.matcher.add(word, 'dictionary')
+        self.turns = {}
+        for pattern in keyboard_patterns:
+            pattern = pattern.lower()
+            self.turns[pattern] = _keyboard_turns(pattern)
+            self.matcher.add(pattern, 'keyboard')
+        self.matcher.build()
+
+    def estimate(self, password, char_set_size=None):
+        """
+        GuessEstimate with the log10 guess count and the segments that
+        produce it. Brute-force characters cost log10(char_set_size) each;
+        by default the alphabet follows the password's character classes.
+        """
+        if not password:
+            return GuessEstimate(0.0, [])
+        text = password[:MAX_ESTIMATE_LENGTH]
+        per_char = math.log10(char_set_size or charset_size(password))
+
+        matches = self._matches(text, per_char)
+        log10_guesses, segments = self._minimum_guesses(text, matches, per_char)
+
+        if len(password) > len(text):
+            segments = self._price_tail(password, segments, per_char)
+            log10_guesses = _combine(sum(segment.log10_guesses for segment in segments),
+                                     min(len(segments), MAX_SEGMENTS))
+        return GuessEstimate(log10_guesses, segments)
+
+    def _price_tail(self, password, segments, per_char):
+        """Segments covering the whole password, given those of its scanned prefix"""
+        last = segments[-1]
+        scanned = last.end
+        if last.kind == 'repeat':
+            # The repeat carries on as long as its block does
+            size = _period(password, last.start, last.end)
+            end = last.start + (_repeat_end(password, last.start, size) - last.start) // size * size
+            if end > scanned:
+                segments[-1] = last._replace(token=password[last.start:end], end=end,
+                                             log10_guesses=size * per_char + math.log10((end - last.start) // size))
+                scanned = end
+
+        # A block repeated from where the priced part ends, as _repeats prices it
+        for size in range(1, MAX_REPEAT_BLOCK + 1):
+            if password[scanned + size:scanned + 2 * size] == password[scanned:scanned + size] \
+                    and scanned + 2 * size <= len(password):
+                blocks = (_repeat_end(password, scanned, size) - scanned) // size
+                segments.append(GuessSegment('repeat', password[scanned:scanned + blocks * size], scanned,
+                                             scanned + blocks * size, size * per_char + math.log10(blocks)))
+                scanned += blocks * size
+                break
+        if scanned == len(password):
+            return segments
+
+        # The rest extends (or becomes) the last brute-force run
+        overflow = len(password) - scanned
+        if segments[-1].kind == 'bruteforce':
+            last = segments.pop()
+            segments.append(last._replace(token=last.token + password[scanned:], end=len(password),
+                                          log10_guesses=last.log10_guesses + overflow * per_char))
+        else:
+            segments.append(GuessSegment('bruteforce', password[scanned:], scanned, len(password),
+                                         overflow * per_char))
+        return segments
+
+    def _matches(self, text, per_char):
+        """Candidate (start, end, log10 guesses, kind) matches, end exclusive; the cheapest per span"""
+        lower = _lower_same_length(text)
+        best = {}
+
+        def add(start, end, guesses, kind):
+            # Matches that are only part of the password get a guess floor
+            if end - start < len(text):
+                floor = MIN_SUBMATCH_GUESSES_SINGLE_CHAR if end - start == 1 else MIN_SUBMATCH_GUESSES_MULTI_CHAR
+                guesses = max(guesses, floor)
+            if (start, end) not in best or guesses < best[start, end][0]:
+                best[start, end] = (guesses, kind)
+
+        for match in self.matcher.find_all(lower):
+            start, end = match.start, match.start + match.length
+            token = text[start:end]
+            if match.kind == 'dictionary':
+                add(start, end, self.ranks[match.pattern] * uppercase_variations(token), 'dictionary')
+            else:
+                add(start, end, spatial_guesses(match.length, self.turns[match.pattern]), 'keyboard')
+
+        self._keyboard_rows(lower, add)
+        self._sequences(text, add)
+        self._repeats(text, per_char, add)
+        self._dates(text, add)
+        return [(start, end, math.log10(max(guesses, 1)), kind) for (start, end), (guesses, kind) in best.items()]
+
+    def _keyboard_rows(self, lower, add):
+        """Runs of 3+ keys where each key neighbours the previous one on the same row"""
+        start = 0
+        for i in range(1, len(lower) + 1):
+            if i == len(lower) or lower[i - 1:i + 1] not in _ROW_PAIRS:
+                if i - start >= 3:
+                    add(start, i, spatial_guesses(i - start, _keyboard_turns(lower[start:i])), 'keyboard')
+                start = i
+
+    def _sequences(self, text, add):
+        """Runs of 3+ characters with a constant code point step of 1 to 5 (abc, 2468, zyx)"""
+        start = 0
+        delta = None
+        for i in range(1, len(text) + 1):
+            step = ord(text[i]) - ord(text[i - 1]) if i < len(text) else None
+            if step is not None and step == delta:
+                continue
+            if i - start >= 3 and delta is not None and 0 < abs(delta) <= 5:
+                token = text[start:i]
+                first = token[0]
+                if first in 'aAzZ019':
+                    base = 4
+                elif first.isdigit():
+                    base = 10
+                else:
+                    base = 26
+                add(start, i, base * len(token) * (1 if delta > 0 else 2), 'sequence')
+            # A sequence can start on the character that broke the previous one
+            start = i - 1
+            delta = step
+
+    def _repeats(self, text, per_char, add):
+        """A short block repeated back to back (aaa, abcabc); the block is priced as brute force"""
+        for match in _REPEAT_RE.finditer(text):
+            base = match.group(1)
+            count = len(match.group(0)) // len(base)
+            base_guesses = 10 ** (per_char * len(base))
+            add(match.start(), match.end(), base_guesses * count, 'repeat')
+
+    def _dates(self, text, add):
+        """Dates with or without separators, and recent years"""
+        for match in _YEAR_RE.finditer(text):
+            add(match.start(), match.end(), _year_space(int(match.group(0))), 'date')
+
+        for match in _SEPARATED_DATE_RE.finditer(text):
+            numbers = (int(match.group(1)), int(match.group(3)), int(match.group(4)))
+            year = _parse_date(numbers)
+            if year is not None:
+                add(match.start(), match.end(), 365 * _year_space(year) * 4, 'date')
+
+        # Digit-only dates: every 4-8 digit window inside each digit run
+        for run in _DIGIT_RUN_RE.finditer(text):
+            digits = run.group(0)
+            for length in range(4, 9):
+                for offset in range(len(digits) - length + 1):
+                    token = digits[offset:offset + length]
+                    years = [_parse_date((int(token[:i]), int(token[i:j]), int(token[j:])))
+                             for i, j in DATE_SPLITS[length]]
+                    years = [year for year in years if year is not None]
+                    if years:
+                        start = run.start() + offset
+                        add(start, start + length, 365 * min(_year_space(year) for year in years), 'date')
+
+    def _minimum_guesses(self, text, matches, per_char):
+        """
+        Cheapest cover of text by matches and brute-force runs. Only match
+        boundaries are visited: a brute-force run from p to q costs
+        (q - p) * per_char, so the best place to open a run ending at q is a
+        running minimum. States are kept per segment count, split by whether
+        the last segment is a run or a match, and a state with more segments
+        and no lower cost than another is dropped, as in zxcvbn.
+        """
+        n = len(text)
+        by_start = {}
+        for match in matches:
+            by_start.setdefault(match[0], []).append(match)
+        positions = sorted({0, n}.union(*((match[0], match[1]) for match in matches)))
+
+        # position -> {segment count: (cost, back pointer)} for prefixes ending in a match;
+        # back pointer is (position, count, from run, match)
+        matched = {0: {0: (0.0, None)}}
+        # position -> {segment count: (cost, (start, count))} for prefixes ending in a run
+        runs = {}
+        # {segment count: (cost - start * per_char, (start, count))} of the runs opened so far
+        open_runs = {}
+
+        for q in positions:
+            run_states = {count: (value + q * per_char, origin) for count, (value, origin) in open_runs.items()}
+            runs[q] = run_states
+            match_states = matched.get(q, {})
+            if q == n:
+                break
+
+            # A run can open after a match (or at the start), never right after another run
+            for count, (cost, _) in match_states.items():
+                _keep_cheapest(open_runs, min(count + 1, MAX_SEGMENTS), cost - q * per_char, (q, count))
+
+            for match in by_start.get(q, ()):
+                end_states = matched.setdefault(match[1], {})
+                for from_run, states in ((True, run_states), (False, match_states)):
+                    for count, (cost, _) in states.items():
+                        _keep_cheapest(end_states, min(count + 1, MAX_SEGMENTS), cost + match[2],
+                                       (q, count, from_run, match))
+
+        best = None
+        for from_run, states in ((True, runs[n]), (False, matched.get(n, {}))):
+            for count, (cost, _) in states.items():
+                if not count:
+                    continue
+                total = _combine(cost, count)
+                if best is None or total < best[0]:
+                    best = (total, count, from_run)
+
+        total, count, from_run = best
+        segments = []
+        position = n
+        while position > 0:
+            if from_run:
+                start, previous_count = runs[position][count][1]
+                segments.append(GuessSegment('bruteforce', text[start:position], start, position,
+                                             (position - start) * per_char))
+                position, count, from_run = start, previous_count, False
+            else:
+                start, previous_count, from_run, match = matched[position][count][1]
+                segments.append(GuessSegment(match[3], text[match[0]:match[1]], match[0], match[1], match[2]))
+                position, count = start, previous_count
+        segments.reverse()
+        return total, segments
@@ -0,0 +1,269 @@
+import os
+import math
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+
+from password_analyzer import PasswordFeatures
+
+# Character shapes for the MM/DD/YY date tail; a 4+ digit run covers the other
+# patterns in password_analyzer._DATE_RES (years included)
+_OTHER, _DECIMAL, _SEPARATOR = 0, 1, 2
+_DATE_TAIL = (_DECIMAL, _DECIMAL, _SEPARATOR, _DECIMAL, _DECIMAL, _SEPARATOR, _DECIMAL, _DECIMAL)
+
+# Undo record pushed for each character; none of the fields is the character itself
+_Step = namedtuple('_Step', [
+    'state',  # Pattern matcher state after the character
+    'kinds',  # Pattern kinds matched ending at the character
+    'key',  # Keyed digest of the character, its key in the counts
+    'char_class',  # Class index, as _char_class
+    'extra_digit',  # Non-ASCII decimal digit
+    'shape',  # _DECIMAL, _SEPARATOR or _OTHER
+    'run',  # Length of the run of this character
+    'decimal_run',  # Length of the run of decimal digits
+    'repeat',  # Completed a repeat of 3+
+    'date'  # Completed a date pattern
+])
+
+
+def _char_class(char):
+    """Character class index (0 upper, 1 lower, 2 digit, 3 special), as in _analyze_features"""
+    if 'a' <= char <= 'z':
+        return 1
+    if 'A' <= char <= 'Z':
+        return 0
+    if '0' <= char <= '9':
+        return 2
+    return 3
+
+
+def _xlog2x(count):
+    return count * math.log2(count) if count else 0.0
+
+
+class IncrementalAnalysis:
+    """
+    Password analysis state that is updated one character at a time.
+    Appending a character adjusts the character counts, the entropy sum,
+    the class counts, the repeat run, the pattern automaton state and the
+    date checks in constant time. Each step pushes an undo record, so a
+    backspace pops it instead of rescanning the password.
+    
+    The text itself is not kept: characters are counted by a digest keyed
+    per session, and the checks that need the whole string (common
+    passwords, crack time, Markov score) run only on a full text passed
+    to features().
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.matcher = analyzer.pattern_matcher
+        self._key = os.urandom(16)
+        self.counts = {}
+        # Sum of c*log2(c) over character counts; entropy follows from it and the length
+        self._xlogx = 0.0
+        self.class_counts = [0, 0, 0, 0]
+        # Non-ASCII decimal digits count as digits too
+        self.extra_digits = 0
+        self.kind_counts = {}
+        self.repeated = 0
+        self.dates = 0
+        self._steps = []
+
+    @property
+    def length(self):
+        return len(self._steps)
+
+    def append(self, text):
+        for char in text:
+            self._push(char)
+
+    def backspace(self, count=1):
+        for _ in range(min(count, len(self._steps))):
+            self._pop()
+
+    def reset(self):
+        self.__init__(self.analyzer)
+
+    def _digest(self, char):
+        # surrogatepass: JSON bodies can carry lone surrogates
+        return hashlib.blake2b(char.encode('utf-8', 'surrogatepass'), digest_size=8, key=self._key).digest()
+
+    def _push(self, char):
+        previous = self._steps[-1] if self._steps else None
+
+        key = self._digest(char)
+        count = self.counts.get(key, 0)
+        self._xlogx += _xlog2x(count + 1) - _xlog2x(count)
+        self.counts[key] = count + 1
+        char_class = _char_class(char)
+        self.class_counts[char_class] += 1
+        extra_digit = char.isdecimal() and char_class == 3
+        self.extra_digits += extra_digit
+
+        # The matcher scans the lowercased text, which can be longer than one character
+        state = previous.state if previous else 0
+        kinds = []
+        for lower_char in char.lower():
+            state = self.matcher.step(state, lower_char)
+            kinds.extend(kind for _, kind in self.matcher.outputs(state))
+        for kind in kinds:
+            self.kind_counts[kind] = self.kind_counts.get(kind, 0) + 1
+
+        run = previous.run + 1 if previous and previous.key == key else 1
+        # '.' in _REPEATED_RE does not match a newline
+        repeat = run >= 3 and char != '\n'
+        self.repeated += repeat
+
+        decimal = char.isdecimal()
+        shape = _DECIMAL if decimal else _SEPARATOR if char in '/-_.' else _OTHER
+        decimal_run = previous.decimal_run + 1 if decimal and previous else int(decimal)
+        date = decimal_run >= 4 or (
+            len(self._steps) >= len(_DATE_TAIL) - 1
+            and tuple(step.shape for step in self._steps[1 - len(_DATE_TAIL):]) + (shape,) == _DATE_TAIL
+        )
+        self.dates += date
+        self._steps.append(_Step(state, tuple(kinds), key, char_class, extra_digit, shape, run, decimal_run,
+                                 repeat, date))
+
+    def _pop(self):
+        step = self._steps.pop()
+
+        count = self.counts[step.key]
+        self._xlogx += _xlog2x(count - 1) - _xlog2x(count)
+        if count == 1:
+            del self.counts[step.key]
+        else:
+            self.counts[step.key] = count - 1
+        self.class_counts[step.char_class] -= 1
+        self.extra_digits -= step.extra_digit
+
+        for kind in step.kinds:
+            self.kind_counts[kind] -= 1
+        self.repeated -= step.repeat
+        self.dates -= step.date
+
+    def entropy(self):
+        """Scaled Shannon entropy, as PasswordAnalyzer._calculate_entropy"""
+        length = len(self._steps)
+        if not length:
+            return 0
+        # H = log2(n) - sum(c*log2(c))/n, scaled by n/3
+        return max(0.0, length * math.log2(length) - self._xlogx) / 3
+
+    def features(self, password=None):
+        """
+        PasswordFeatures for the current text. is_common is None unless the
+        full text is passed; it is used for that lookup and not kept.
+        """
+        has_upper, has_lower, has_digit, has_special = (count > 0 for count in self.class_counts)
+        has_digit = has_digit or self.extra_digits > 0
+        is_common, breach_checked = (None, True) if password is None else self.analyzer._lookup_common(password)
+        return PasswordFeatures(
+            length=len(self._steps),
+            has_upper=has_upper,
+            has_lower=has_lower,
+            has_digit=has_digit,
+            has_special=has_special,
+            char_classes=has_upper + has_lower + has_digit + has_special,
+            entropy=self.entropy(),
+            has_repeated=self.repeated > 0,
+            has_sequential=self.kind_counts.get('sequence', 0) > 0,
+            has_keyboard=self.kind_counts.get('keyboard', 0) > 0,
+            has_date=self.dates > 0,
+            has_common_words=self.kind_counts.get('dictionary', 0) > 0,
+            is_common=is_common,
+            breach_checked=breach_checked
+        )
+
+
+class LiveSessions:
+    """
+    Per-process store of IncrementalAnalysis states for /analyze-live.
+    Sessions keep counters and undo records, never the typed text; they
+    expire quickly and are bounded in number, and a client whose session
+    is gone resends the full text.
+    """
+
+    def __init__(self, analyzer, ttl=300, max_sessions=10000, max_length=256):
+        self.analyzer = analyzer
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_length = max_length
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, text=''):
+        session_id = uuid.uuid4().hex
+        state = IncrementalAnalysis(self.analyzer)
+        state.append(text[:self.max_length])
+        with self._lock:
+            self._expire(time.monotonic())
+            self._sessions[session_id] = (time.monotonic(), state, threading.Lock())
+        return session_id, state
+
+    def update(self, session_id, append='', backspace=0, reset=False):
+        """Apply edits to a session and return its state, or None if it does not exist"""
+        with self._lock:
+            self._expire(time.monotonic())
+            entry = self._sessions.pop(session_id, None)
+            if entry is None:
+                return None
+            # Refresh the expiry and move to the most recently used end
+            self._sessions[session_id] = (time.monotonic(), entry[1], entry[2])
+        state, state_lock = entry[1], entry[2]
+        with state_lock:
+            if reset:
+                state.reset()
+            state.backspace(backspace)
+            state.append(append[:max(0, self.max_length - state.length)])
+        return state
+
+    def handle(self, data):
+        """
+        Process an /analyze-live request body and return (response, status).
+        Fields: session_id, append (text typed), backspace (characters
+        deleted), reset, or password (full text, to start or resync a session).
+        Only a request with the full text gets the checks that need it.
+        """
+        if not isinstance(data, dict):
+            return {"error": "Expected a JSON object"}, 400
+        session_id = data.get('session_id')
+        password = data.get('password')
+        append = data.get('append', '')
+        backspace = data.get('backspace', 0)
+        if (password is not None and not isinstance(password, str)) or not isinstance(append, str) \
+                or not isinstance(backspace, int) or isinstance(backspace, bool) or backspace < 0:
+            return {"error": "Invalid live analysis update"}, 400
+
+        if password is not None:
+            password = password[:self.max_length]
+            state = self.update(session_id, append=password, reset=True) if session_id else None
+            if state is None:
+                session_id, state = self.create(password)
+        elif session_id:
+            state = self.update(session_id, append=append, backspace=backspace, reset=bool(data.get('reset')))
+            if state is None:
+                # Expired, evicted or held by another worker process; the client resends the full text
+                return {"error": "Session not found", "resync": True}, 404
+        else:
+            session_id, state = self.create(append)
+
+        return {"session_id": session_id, **self.analyzer.analyze_live(state, password)}, 200
+
+    def discard(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _expire(self, now):
+        """Drop idle sessions and the least recently used beyond max_sessions (lock held)"""
+        while self._sessions:
+            session_id, (touched, _, _) = next(iter(self._sessions.items()))
+            if now - touched < self.ttl and len(self._sessions) < self.max_sessions:
+                break
+            self._sessions.popitem(last=False)
+
+    def __len__(self):
+        return len(self._sessions)
@@ -0,0 +1,218 @@
+import os
+import json
+import time
+import logging
+from itertools import chain
+import numpy as np
+
+from model_store import file_version
+
+# Version of the count table layout described by the JSON sidecar
+MARKOV_FORMAT_VERSION = 1
+
+# Symbols: 0 marks the start and end of a password, 1-95 are printable ASCII, 96 is anything else
+ALPHABET_SIZE = 97
+BOUNDARY = 0
+OTHER_SYMBOL = 96
+DEFAULT_ORDER = 3
+DEFAULT_SMOOTHING = 0.01
+
+# Longest password scored column-wise; longer ones take the per-character path
+MAX_VECTORIZED_LENGTH = 64
+# Contexts converted to log-probabilities at a time
+LOG_PROB_BLOCK = 65536
+
+
+def markov_metadata_path(path):
+    """JSON sidecar describing a count table written by train_model markov"""
+    return os.path.splitext(path)[0] + '.json'
+
+
+def markov_log_prob_path(path):
+    """Precomputed float32 log-probability table written next to a count table"""
+    return os.path.splitext(path)[0] + '.logprob.npy'
+
+
+def _symbol(char):
+    code = ord(char)
+    return code - 31 if 32 <= code <= 126 else OTHER_SYMBOL
+
+
+def iter_grams(password, order):
+    """Flat n-gram indices of a password, one per character plus the end boundary"""
+    context_size = ALPHABET_SIZE ** (order - 1)
+    context = 0
+    for char in password:
+        symbol = _symbol(char)
+        yield context * ALPHABET_SIZE + symbol
+        context = (context * ALPHABET_SIZE + symbol) % context_size
+    yield context * ALPHABET_SIZE + BOUNDARY
+
+
+def gram_matrix(passwords, order):
+    """
+    N-gram indices for a batch of passwords as a (rows, width + 1) matrix and
+    a mask of the valid entries, where width is the longest password. Row i
+    holds the same indices as iter_grams(passwords[i], order).
+    """
+    lengths = np.fromiter(map(len, passwords), dtype=np.int64, count=len(passwords))
+    width = max(int(lengths.max()) if len(passwords) else 0, 1)
+    codes = np.array(passwords, dtype=f'U{width}').view(np.uint32).reshape(len(passwords), width).astype(np.int64)
+    symbols = np.where((codes >= 32) & (codes <= 126), codes - 31, OTHER_SYMBOL)
+    # Positions past the end read as the boundary, which also supplies each row's end symbol
+    symbols[np.arange(width) >= lengths[:, None]] = BOUNDARY
+
+    # Every n-gram is preceded by order - 1 start boundaries
+    padded = np.concatenate([np.zeros((len(passwords), order - 1), dtype=np.int64), symbols,
+                             np.zeros((len(passwords), 1), dtype=np.int64)], axis=1)
+    grams = np.zeros((len(passwords), width + 1), dtype=np.int64)
+    for k in range(order):
+        grams = grams * ALPHABET_SIZE + padded[:, k:k + width + 1]
+    mask = np.arange(width + 1) <= lengths[:, None]
+    return grams, mask
+
+
+def count_grams(passwords, order):
+    """Distinct n-gram indices in a batch of passwords and how often each occurs"""
+    short = [password for password in passwords if len(password) <= MAX_VECTORIZED_LENGTH]
+    long = [password for password in passwords if len(password) > MAX_VECTORIZED_LENGTH]
+    grams, mask = gram_matrix(short, order)
+    indices = grams[mask]
+    if long:
+        indices = np.concatenate([indices, np.fromiter(chain.from_iterable(iter_grams(p, order) for p in long),
+                                                       dtype=np.int64)])
+    return np.unique(indices, return_counts=True)
+
+
+def fill_log_probs(counts, smoothing, out):
+    """
+    Additively smoothed log10 P(symbol | context) for a flat count table,
+    converted one block of contexts at a time so the float64 temporaries stay small
+    """
+    context_size = counts.shape[0] // ALPHABET_SIZE
+    for start in range(0, context_size, LOG_PROB_BLOCK):
+        end = min(start + LOG_PROB_BLOCK, context_size)
+        block = counts[start * ALPHABET_SIZE:end * ALPHABET_SIZE].reshape(-1, ALPHABET_SIZE).astype(np.float64)
+        totals = block.sum(axis=1, keepdims=True)
+        out[start * ALPHABET_SIZE:end * ALPHABET_SIZE] = np.log10(
+            (block + smoothing) / (totals + smoothing * ALPHABET_SIZE)).ravel()
+    return out
+
+
+def save_markov_counts(counts, path, metadata):
+    """
+    Write a flat count table as .npy (uncompressed, so it can be memory-mapped),
+    its precomputed log-probability table, and its JSON sidecar. Counts are
+    narrowed to uint32 when they fit.
+    """
+    if counts.size and counts.max() < 2 ** 32:
+        counts = counts.astype(np.uint32)
+    metadata = dict(metadata, format_version=MARKOV_FORMAT_VERSION, alphabet_size=ALPHABET_SIZE,
+                    created_at=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+    # Write then rename so a loading server never sees a partial file
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, counts)
+    os.replace(tmp_path, path)
+
+    # Filled straight into the output file, so training never holds a second table in memory
+    log_prob_path = markov_log_prob_path(path)
+    log_probs = np.lib.format.open_memmap(log_prob_path + '.tmp', mode='w+', dtype=np.float32, shape=counts.shape)
+    fill_log_probs(counts, metadata.get("smoothing", DEFAULT_SMOOTHING), log_probs)
+    log_probs.flush()
+    del log_probs
+    os.replace(log_prob_path + '.tmp', log_prob_path)
+    # The sidecar goes last and names the counts it was computed from
+    metadata["log_probs"] = os.path.basename(log_prob_path)
+    metadata["counts_version"] = file_version(path)
+    metadata_path = markov_metadata_path(path)
+    with open(metadata_path + '.tmp', 'w') as f:
+        json.dump(metadata, f, indent=2)
+    os.replace(metadata_path + '.tmp', metadata_path)
+
+
+def load_markov_model(path):
+    """
+    Open a count table written by save_markov_counts and its log-probability
+    table, both memory-mapped so forked workers share the same pages
+    """
+    with open(markov_metadata_path(path), 'r') as f:
+        metadata = json.load(f)
+    if metadata.get("format_version") != MARKOV_FORMAT_VERSION:
+        raise ValueError(f"Unsupported Markov model version: {metadata.get('format_version')}")
+    order = metadata["order"]
+    counts = np.load(path, mmap_mode='r')
+    if counts.shape != (ALPHABET_SIZE ** order,):
+        raise ValueError(f"Markov count table has shape {counts.shape}, expected order {order}")
+    version = file_version(path)
+    log_probs = None
+    log_prob_path = markov_log_prob_path(path)
+    if metadata.get("counts_version") == version and os.path.exists(log_prob_path):
+        log_probs = np.load(log_prob_path, mmap_mode='r')
+        if log_probs.shape != counts.shape or log_probs.dtype != np.float32:
+            logging.warning(f"Ignoring Markov log-probability table {log_prob_path} with shape {log_probs.shape}")
+            log_probs = None
+    if log_probs is None:
+        logging.warning(f"No precomputed log-probabilities for {path}; computing them in memory. "
+                        f"Retrain with train_model markov to share them between workers.")
+    return MarkovModel(counts, order, smoothing=metadata.get("smoothing", DEFAULT_SMOOTHING),
+                       metadata=metadata, version=version, log_probs=log_probs)
+
+
+class MarkovModel:
+    """
+    Character n-gram model of how likely a password is under a breach corpus.
+    Counts live in one flat array indexed by the n-gram's symbols in base
+    ALPHABET_SIZE, with a matching table of additively smoothed log10
+    probabilities. The table is read from disk when one was saved with the
+    counts and computed from them otherwise. Scoring is one table lookup per character, and batches
+    look up every password column by column with the same table and in the
+    same order, so both paths return identical values.
+    """
+
+    def __init__(self, counts, order=DEFAULT_ORDER, smoothing=DEFAULT_SMOOTHING, metadata=None, version=None,
+                 log_probs=None):
+        self.counts = counts
+        self.order = order
+        self.smoothing = smoothing
+        self.metadata = metadata or {}
+        self.version = version
+        self._context_size = ALPHABET_SIZE ** (order - 1)
+
+        if log_probs is None:
+            log_probs = fill_log_probs(counts, smoothing, np.empty(counts.shape, dtype=np.float32))
+        self.log_probs = log_probs
+        # Indexing a memoryview returns a Python float without NumPy scalar overhead
+        self._log_prob_view = memoryview(self.log_probs)
+
+    def log10_prob(self, password):
+        """log10 probability of the password, including its end"""
+        log_probs = self._log_prob_view
+        context_size = self._context_size
+        total = 0.0
+        context = 0
+        for char in password:
+            code = ord(char)
+            symbol = code - 31 if 32 <= code <= 126 else OTHER_SYMBOL
+            total += log_probs[context * ALPHABET_SIZE + symbol]
+            context = (context * ALPHABET_SIZE + symbol) % context_size
+        return total + log_probs[context * ALPHABET_SIZE + BOUNDARY]
+
+    def log10_prob_many(self, passwords):
+        """log10_prob for each password, as a float64 array"""
+        passwords = list(passwords)
+        result = np.zeros(len(passwords))
+        short = [i for i, password in enumerate(passwords) if len(password) <= MAX_VECTORIZED_LENGTH]
+        if short:
+            grams, mask = gram_matrix([passwords[i] for i in short], self.order)
+            # Position-major, so each column add reads contiguous memory
+            values = np.where(mask, self.log_probs[grams], np.float32(0.0)).T.astype(np.float64, order='C')
+            totals = np.zeros(len(short))
+            # Column by column, so each row is summed in the same order as log10_prob
+            for column in values:
+                totals += column
+            result[short] = totals
+        for i, password in enumerate(passwords):
+            if len(password) > MAX_VECTORIZED_LENGTH:
+                result[i] = self.log10_prob(password)
+        return result
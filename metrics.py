@@ -0,0 +1,283 @@
+import math
+import threading
+from bisect import bisect_left
+
+# Prometheus text exposition format served by /metrics
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Upper bounds in seconds, from a fast in-process stage (~10us) to a slow Gemini call
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric:
+    """
+    Base for a named metric with optional labels. Each label combination is
+    a child created on first use by labels(); hot paths bind their children
+    once at import so recording is a single method call. A metric can
+    instead be computed at scrape time with set_function, at no cost per
+    request.
+    """
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        # Children by the label values as passed (e.g. an int status), to skip the str() conversions
+        self._lookup = {}
+        self._lock = threading.Lock()
+        self._function = None
+        # An unlabelled metric is exported as 0 before its first update
+        if not self.labelnames:
+            self.labels()
+        if registry is not None:
+            registry.register(self)
+
+    def labels(self, *values):
+        child = self._lookup.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(tuple(str(value) for value in values), self._new_child())
+                self._lookup[values] = child
+        return child
+
+    def set_function(self, function):
+        """
+        Compute the value when scraped. function returns a number, or for a
+        labelled metric a dict of label-value tuples to numbers.
+        """
+        self._function = function
+
+    def samples(self):
+        """(suffix, label values, extra label, value) for every child"""
+        if self._function is not None:
+            values = self._function()
+            if not isinstance(values, dict):
+                values = {(): values}
+            return [('', tuple(labels), '', value) for labels, value in values.items()]
+        return [sample for labels, child in sorted(self._children.items())
+                for sample in child.samples(labels)]
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for suffix, labels, extra, value in self.samples():
+            lines.append(f'{self.name}{suffix}{_label_text(self.labelnames, labels, extra)} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        # acquire/release rather than 'with': noticeably cheaper, and the body cannot raise
+        lock = self._lock
+        lock.acquire()
+        self.value += amount
+        lock.release()
+
+    def samples(self, labels):
+        return [('_total', labels, '', self.value)]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count; exposed with a _total suffix"""
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        if self._function is None:
+            return super().samples()
+        return [('_total', labels, extra, value) for _, labels, extra, value in super().samples()]
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, labels):
+        return [('', labels, '', self.value)]
+
+
+class Gauge(_Metric):
+    """Current value that can go up or down"""
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # One count per bucket plus +Inf, not cumulative; summed when scraped
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        lock = self._lock
+        lock.acquire()
+        self.counts[index] += 1
+        self.sum += value
+        lock.release()
+
+    def samples(self, labels):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+        result = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            result.append(('_bucket', labels, f'le="{_format_value(bound)}"', cumulative))
+        result.append(('_sum', labels, '', total))
+        result.append(('_count', labels, '', cumulative))
+        return result
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (seconds) over fixed buckets"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), registry=None, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+
+class MetricsRegistry:
+    """The metrics of this process, rendered together for /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = Histogram('password_analyzer_stage_seconds',
+                          'Time spent in each stage of analyze_password', ['stage'], REGISTRY)
+# Bound once so the analyzer records each stage with one call
+STAGE_PATTERNS = STAGE_SECONDS.labels('patterns')
+STAGE_ENTROPY = STAGE_SECONDS.labels('entropy')
+STAGE_COMMON_LOOKUP = STAGE_SECONDS.labels('common_lookup')
+STAGE_ML_INFERENCE = STAGE_SECONDS.labels('ml_inference')
+STAGE_TIME_TO_CRACK = STAGE_SECONDS.labels('time_to_crack')
+STAGE_MARKOV = STAGE_SECONDS.labels('markov')
+STAGE_SUGGESTION = STAGE_SECONDS.labels('suggestion')
+STAGE_AI = STAGE_SECONDS.labels('ai')
+
+RESULT_CACHE = Counter('password_analyzer_result_cache',
+                       'analyze_password result cache lookups', ['result'], REGISTRY)
+RESULT_CACHE_HITS = RESULT_CACHE.labels('hit')
+RESULT_CACHE_MISSES = RESULT_CACHE.labels('miss')
+
+AI_CACHE = Counter('password_analyzer_ai_cache',
+                   'AI recommendation cache lookups', ['result'], REGISTRY)
+AI_CACHE_HITS = AI_CACHE.labels('hit')
+AI_CACHE_MISSES = AI_CACHE.labels('miss')
+
+AI_CALLS = Counter('password_analyzer_ai_calls',
+                   'Gemini recommendation requests by outcome', ['outcome'], REGISTRY)
+AI_CALLS_OK = AI_CALLS.labels('ok')
+AI_CALLS_FAILED = AI_CALLS.labels('failed')
+
+MODEL_ERRORS = Counter('password_analyzer_model_errors', 'ML predictions that raised an error', (), REGISTRY)
+
+MODEL_INFO = Gauge('password_analyzer_model_info',
+                   'Loaded model versions (1 per loaded model)', ['model', 'version'], REGISTRY)
+COMMON_PASSWORDS = Gauge('password_analyzer_common_passwords',
+                         'Entries in the common-password store', (), REGISTRY)
+BREACH_LOOKUPS = Counter('password_analyzer_breach_lookups',
+                         'Common-password store lookups by result', ['result'], REGISTRY)
+
+REQUEST_SECONDS = Histogram('http_request_duration_seconds',
+                            'Time to handle each HTTP request, until the response is returned',
+                            ['route', 'method'], REGISTRY)
+REQUESTS = Counter('http_requests', 'HTTP requests by route, method and status', ['route', 'method', 'status'],
+                   REGISTRY)
+
+
+def observe_request(route, method, status, seconds):
+    """Record one handled HTTP request"""
+    REQUEST_SECONDS.labels(route, method).observe(seconds)
+    REQUESTS.labels(route, method, status).inc()
+
+
+def track_analyzer(analyzer):
+    """Report the model versions and common-password store of the analyzer serving requests"""
+
+    def model_info():
+        info = {("strength", analyzer.model_version or "none"): 1}
+        if analyzer.markov_model is not None:
+            info[("markov", analyzer.markov_model.version or "none")] = 1
+        return info
+
+    def breach_lookups():
+        store = analyzer.common_passwords
+        stats = store.stats() if hasattr(store, 'stats') else {}
+        if "hits" not in stats:
+            return {}
+        lookups = {("hit",): stats["hits"], ("miss",): stats["misses"]}
+        if "unavailable" in stats:
+            lookups[("error",)] = stats["errors"]
+            lookups[("unavailable",)] = stats["unavailable"]
+        return lookups
+
+    MODEL_INFO.set_function(model_info)
+    COMMON_PASSWORDS.set_function(lambda: len(analyzer.common_passwords))
+    BREACH_LOOKUPS.set_function(breach_lookups)
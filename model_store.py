@@ -0,0 +1,254 @@
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import logging
+import argparse
+import threading
+from forest_inference import FOREST_SUFFIX, CompiledForest, compile_model
+
+# Versioned model artifact: a joblib-dumped dict holding the model and its metadata
+ARTIFACT_FORMAT_VERSION = 1
+ARTIFACT_SUFFIX = '.joblib'
+FEATURE_NAMES = ['length', 'has_upper', 'has_lower', 'has_digit', 'has_special', 'entropy', 'char_classes']
+
+
+def model_metrics_path(model_path):
+    """Evaluation metrics sidecar written next to a model file by train_model"""
+    return os.path.splitext(model_path)[0] + '.metrics.json'
+
+
+def file_version(path):
+    """Short content hash identifying a model file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def save_model_metrics(metrics, model_path):
+    """
+    Atomically write the metrics sidecar of a model file that is already in
+    place, tagged with its version so a reader can tell whether they match
+    """
+    metrics = dict(metrics, model_version=file_version(model_path))
+    metrics_path = model_metrics_path(model_path)
+    tmp_path = metrics_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(metrics, f, indent=2)
+    os.replace(tmp_path, metrics_path)
+
+
+def save_model_artifact(model, path, metadata=None):
+    """
+    Write a model as a versioned artifact. Arrays are stored uncompressed so
+    the artifact can be loaded with mmap_mode and its pages shared.
+    """
+    import joblib
+
+    artifact = {
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "created_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        "features": FEATURE_NAMES,
+        "metadata": metadata or {},
+        "model": model
+    }
+    # Write then rename so a watching server never loads a partial file
+    tmp_path = path + '.tmp'
+    joblib.dump(artifact, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def save_compiled_model(model, path):
+    """Compile a tree forest and write it as a .npz that loads without sklearn"""
+    compiled = compile_model(model)
+    if not isinstance(compiled, CompiledForest):
+        raise ValueError(f"Only tree forests can be compiled, not {type(model).__name__}")
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        compiled.save(f)
+    os.replace(tmp_path, path)
+
+
+def load_model_file(path):
+    """Load a model from a compiled forest, a versioned artifact or a legacy pickle"""
+    if path.endswith(FOREST_SUFFIX):
+        return CompiledForest.load(path)
+    if path.endswith(ARTIFACT_SUFFIX):
+        import joblib
+
+        artifact = joblib.load(path, mmap_mode='r')
+        if artifact.get("format_version") != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported model artifact version: {artifact.get('format_version')}")
+        if artifact.get("features") != FEATURE_NAMES:
+            raise ValueError("Model artifact was trained on different features")
+        return artifact["model"]
+
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+class ModelHandle:
+    """
+    Lazily loaded, atomically swappable reference to the strength model.
+    The model is read on first use rather than at import, and reload() swaps
+    in a new one with a single assignment so in-flight predictions keep the
+    model they started with. With a check interval, the file's mtime is
+    polled on access and a changed file is reloaded automatically. Tree
+    forests are compiled on load unless compile is False.
+    """
+
+    def __init__(self, path, check_interval=0, compile=True):
+        self.path = path
+        self.check_interval = check_interval
+        self.compile = compile
+        self._lock = threading.Lock()
+        # (model, version, mtime, metrics) replaced as a whole on every load
+        self._state = None
+        self._last_check = 0.0
+        # mtime of a file that failed to reload; it is not retried until it changes again
+        self._failed_mtime = None
+
+    def _load(self):
+        """Read the model file and its metrics sidecar into a new state tuple"""
+        mtime = os.path.getmtime(self.path)
+        model = load_model_file(self.path)
+        if self.compile:
+            model = compile_model(model)
+        version = file_version(self.path)
+        logging.info(f"Password model {version} loaded from {self.path}")
+        return (model, version, mtime, self._load_metrics(version))
+    
+    def _load_metrics(self, version):
+        """
+        Metrics sidecar for a model version, or None if it is missing or was
+        written for another version (train_model writes it after the model)
+        """
+        metrics_path = model_metrics_path(self.path)
+        if not os.path.exists(metrics_path):
+            return None
+        try:
+            with open(metrics_path, 'r') as f:
+                metrics = json.load(f)
+        except Exception as e:
+            logging.error(f"Error loading model metrics: {e}")
+            return None
+        # Sidecars from before versions were recorded are taken as they are
+        if metrics.get("model_version", version) != version:
+            return None
+        return metrics
+
+    def _ensure_loaded(self):
+        if self._state is None:
+            with self._lock:
+                if self._state is None:
+                    if not self.path or not os.path.exists(self.path):
+                        self._state = (None, None, None, None)
+                        return
+                    try:
+                        self._state = self._load()
+                    except Exception as e:
+                        logging.error(f"Error loading model: {e}")
+                        self._state = (None, None, None, None)
+        elif self.check_interval and time.monotonic() - self._last_check >= self.check_interval:
+            self._last_check = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                return
+            if mtime == self._state[2]:
+                if self._state[0] is not None and self._state[3] is None:
+                    # The metrics of a freshly written model may land after it
+                    metrics = self._load_metrics(self._state[1])
+                    if metrics is not None:
+                        self._state = self._state[:3] + (metrics,)
+                return
+            if mtime == self._failed_mtime:
+                return
+            try:
+                self.reload()
+            except Exception as e:
+                # A corrupt or half-copied file must not fail requests; keep serving the current model
+                logging.error(f"Error reloading model, keeping version {self._state[1]}: {e}")
+                self._failed_mtime = mtime
+
+    def get(self):
+        """The current model, loading it on first use (None if unavailable)"""
+        self._ensure_loaded()
+        return self._state[0]
+
+    @property
+    def version(self):
+        self._ensure_loaded()
+        return self._state[1]
+
+    @property
+    def metrics(self):
+        self._ensure_loaded()
+        return self._state[3]
+
+    @metrics.setter
+    def metrics(self, metrics):
+        self._ensure_loaded()
+        self._state = self._state[:3] + (metrics,)
+
+    @property
+    def loaded(self):
+        return self._state is not None and self._state[0] is not None
+
+    def reload(self):
+        """
+        Load the model file again and swap it in atomically. On failure the
+        current model stays in place and the error is raised.
+        """
+        with self._lock:
+            self._state = self._load()
+        return self._state[1]
+
+
+class StaticModelHandle(ModelHandle):
+    """Handle around an in-memory model that has no backing file"""
+
+    def __init__(self, model):
+        super().__init__(None)
+        self._state = (model, 'in-memory' if model is not None else None, None, None)
+
+    def reload(self):
+        return self._state[1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage password model artifacts")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    convert = subparsers.add_parser('convert', help="Convert a pickled model into a versioned artifact")
+    convert.add_argument('source', help="Pickled model (.pkl)")
+    convert.add_argument('artifact', help=f"Output artifact ({ARTIFACT_SUFFIX})")
+
+    compile_parser = subparsers.add_parser('compile', help="Compile a random forest for sklearn-free inference")
+    compile_parser.add_argument('source', help=f"Pickled model or artifact (.pkl, {ARTIFACT_SUFFIX})")
+    compile_parser.add_argument('output', help=f"Compiled forest ({FOREST_SUFFIX})")
+
+    args = parser.parse_args(argv)
+    if args.command == 'convert':
+        with open(args.source, 'rb') as f:
+            model = pickle.load(f)
+        save_model_artifact(model, args.artifact, metadata={"source": os.path.basename(args.source)})
+        print(f"Wrote {args.artifact} (version {file_version(args.artifact)})")
+    elif args.command == 'compile':
+        save_compiled_model(load_model_file(args.source), args.output)
+        # Copy the metrics sidecar so /model-accuracy keeps working with the compiled file
+        metrics_path = model_metrics_path(args.source)
+        if os.path.exists(metrics_path):
+            with open(metrics_path, 'r') as f:
+                metrics = json.load(f)
+            save_model_metrics(metrics, args.output)
+        print(f"Wrote {args.output} (version {file_version(args.output)})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,22 @@
 import re
 import math
-import pickle
 import os
-import logging
-from collections import Counter
-import requests
+import sys
+import copy
 import json
+import logging
+from time import perf_counter
+from collections import Counter, namedtuple
+import numpy as np
 from dotenv import load_dotenv
+from pattern_matcher import PatternMatcher
+from guess_estimator import GuessEstimator
+from breach_store import open_breach_store, open_range_store, store_identity
+from caching import TTLCache, SQLiteCache, fingerprint, keyed_fingerprint
+from genai_client import get_client, extract_text
+from model_store import ModelHandle, StaticModelHandle, model_metrics_path
+from markov_model import load_markov_model
+import metrics
 
 # Load environment variables from the .env file
 load_dotenv()
@@ -19,54 +29,290 @@ if GEMINI_API_KEY:
 else:
     logging.warning("Gemini API key not found!")
 
+# Analysis fields the Gemini prompt is built from; identical values give identical prompts
+RECOMMENDATION_FIELDS = [
+    'strength', 'length', 'has_uppercase', 'has_lowercase', 'has_digits', 'has_special',
+    'is_common', 'has_repeated', 'has_sequential', 'has_keyboard_pattern', 'has_date_pattern',
+    'has_common_words', 'entropy', 'time_to_crack', 'weakness_reasons'
+]
+
+
+def make_recommendation_cache():
+    """AI recommendation cache: SQLite at AI_CACHE_PATH if set, in-process LRU otherwise"""
+    ttl = float(os.environ.get('AI_CACHE_TTL', 86400))
+    max_size = int(os.environ.get('AI_CACHE_SIZE', 1024))
+    cache_path = os.environ.get('AI_CACHE_PATH')
+    if cache_path:
+        return SQLiteCache(cache_path, max_size=max_size, ttl=ttl)
+    return TTLCache(max_size=max_size, ttl=ttl)
+
+# Secret for analysis cache keys. Set ANALYSIS_CACHE_KEY to share a SQLite cache
+# between processes; otherwise a random per-process key is used
+ANALYSIS_CACHE_KEY = os.environ.get('ANALYSIS_CACHE_KEY', '').encode('utf-8') or os.urandom(32)
+
+# Report fields derived from the plaintext; recomputed on a cache hit instead of stored
+UNCACHED_REPORT_FIELDS = ('improved_suggestion',)
+
+def make_result_cache():
+    """
+    analyze_password result cache: SQLite at ANALYSIS_CACHE_PATH if set,
+    in-process LRU otherwise, or None when ANALYSIS_CACHE_SIZE is 0
+    """
+    max_size = int(os.environ.get('ANALYSIS_CACHE_SIZE', 4096))
+    if max_size <= 0:
+        return None
+    ttl = float(os.environ.get('ANALYSIS_CACHE_TTL', 600))
+    cache_path = os.environ.get('ANALYSIS_CACHE_PATH')
+    if cache_path:
+        if 'ANALYSIS_CACHE_KEY' not in os.environ:
+            logging.warning("ANALYSIS_CACHE_PATH is set without ANALYSIS_CACHE_KEY; entries will not be shared")
+        return SQLiteCache(cache_path, max_size=max_size, ttl=ttl)
+    return TTLCache(max_size=max_size, ttl=ttl)
+
+# Per-password feature record filled by a single analysis pass and shared by
+# scoring, time-to-crack estimation and ML feature extraction
+PasswordFeatures = namedtuple('PasswordFeatures', [
+    'length', 'has_upper', 'has_lower', 'has_digit', 'has_special', 'char_classes',
+    'entropy', 'has_repeated', 'has_sequential', 'has_keyboard', 'has_date',
+    'has_common_words', 'is_common', 'breach_checked'
+], defaults=(True,))  # breach_checked is False when the common-password store could not be asked
+
+_REPEATED_RE = re.compile(r'(.)\1{2,}')  # 3+ repeated chars
+_DATE_RES = [
+    re.compile(r'\d{2}[/\-_.]\d{2}[/\-_.]\d{2,4}'),  # MM/DD/YYYY
+    re.compile(r'\d{4,8}'),  # YYYYMMDD or MMDDYYYY without separators
+    re.compile(r'19\d{2}|20\d{2}')  # Years (1900-2099)
+]
+
+# Pattern lists compiled into the per-analyzer PatternMatcher automaton
+COMMON_WORDS = [
+    "password", "admin", "user", "login", "welcome",
+    "secret", "qwerty", "letmein", "monkey", "dragon",
+    "baseball", "football", "superman", "batman", "trustno",
+    "summer", "winter", "spring", "autumn", "apple"
+]
+KEYBOARD_PATTERNS = [
+    "qwerty", "qwertz", "azerty", "asdfgh", "zxcvbn", "qweasdzxc",
+    "1qaz2wsx", "qazwsx", "zxcvbnm", "poiuyt", "lkjhgf"
+]
+KEYBOARD_ROWS = ["qwertyuiop", "asdfghjkl", "zxcvbnm"]
+COMMON_SEQUENCES = [
+    "abcdefghijklmnopqrstuvwxyz",
+    "qwertyuiop", "asdfghjkl", "zxcvbnm",
+    "0123456789"
+]
+
+
+def _ngrams(sequence, n=3):
+    """All n-character substrings of a sequence"""
+    return [sequence[i:i+n] for i in range(len(sequence) - n + 1)]
+
+
+def build_pattern_matcher(common_words=COMMON_WORDS, keyboard_patterns=KEYBOARD_PATTERNS,
+                          keyboard_rows=KEYBOARD_ROWS, sequences=COMMON_SEQUENCES):
+    """Build the automaton used for common-word, keyboard and sequence detection"""
+    matcher = PatternMatcher()
+    for word in common_words:
+        matcher.add(word, 'dictionary')
+    for pattern in keyboard_patterns:
+        matcher.add(pattern, 'keyboard')
+    # Any 3-character run along a keyboard row
+    for row in keyboard_rows:
+        for segment in _ngrams(row):
+            matcher.add(segment, 'keyboard')
+    for seq in sequences:
+        for segment in _ngrams(seq):
+            matcher.add(segment, 'sequence')
+    matcher.build()
+    return matcher
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'data')
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'models')
+
+
+def default_breach_store_path():
+    """Breached-password store to load: BREACH_INDEX_PATH, a built index, or the sample wordlist"""
+    env_path = os.environ.get('BREACH_INDEX_PATH')
+    if env_path:
+        return env_path
+    index_path = os.path.join(DATA_DIR, 'rockyou_sample.idx')
+    if os.path.exists(index_path):
+        return index_path
+    return os.path.join(DATA_DIR, 'rockyou_sample.txt')
+
+
+def load_default_breach_store():
+    """
+    Open the configured breached-password store. BREACH_RANGE_URL or
+    BREACH_RANGE_FILE selects k-anonymity range lookups; otherwise the
+    index or wordlist from default_breach_store_path is used.
+    """
+    range_location = os.environ.get('BREACH_RANGE_URL') or os.environ.get('BREACH_RANGE_FILE')
+    if range_location:
+        return open_range_store(range_location, hash_name=os.environ.get('BREACH_RANGE_HASH', 'sha1'),
+                                cache_size=int(os.environ.get('BREACH_RANGE_CACHE_SIZE', 4096)))
+    
+    data_path = default_breach_store_path()
+    if os.path.exists(data_path):
+        return open_breach_store(data_path)
+    return None
+
+
+def default_markov_model_path():
+    """Character n-gram model to load: MARKOV_MODEL_PATH or the one train_model markov writes by default"""
+    return os.environ.get('MARKOV_MODEL_PATH') or os.path.join(MODELS_DIR, 'markov.npy')
+
+
+def load_default_markov_model():
+    """Open the configured Markov model, or None if it hasn't been trained"""
+    path = default_markov_model_path()
+    if os.path.exists(path):
+        return load_markov_model(path)
+    return None
+
+
+# Assume average of 10 billion guesses per second (modern password cracker)
+GUESSES_PER_SECOND = 10_000_000_000
+
+
+def _guesses_to_seconds(log10_guesses):
+    """Average seconds to find a password that takes 10**log10_guesses guesses"""
+    # On average, an attacker finds the password after trying half of the guesses
+    exponent = log10_guesses - math.log10(2 * GUESSES_PER_SECOND)
+    if exponent >= sys.float_info.max_10_exp:
+        # Keep the value finite so it serializes to JSON
+        return sys.float_info.max
+    return 10 ** exponent
+
+
 class PasswordAnalyzer:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, breach_store=None, recommendation_cache=None, model_reload_interval=0,
+                 result_cache=None, markov_model=None):
         self.model_path = model_path
-        self.common_passwords = set()
-        self.password_model = None
+        self.result_cache = result_cache if result_cache is not None else make_result_cache()
+        self.pattern_matcher = build_pattern_matcher()
+        self.guess_estimator = GuessEstimator(COMMON_WORDS, KEYBOARD_PATTERNS)
+        self.recommendation_cache = recommendation_cache if recommendation_cache is not None else make_recommendation_cache()
         
-        # Load model if provided
-        if model_path and os.path.exists(model_path):
+        # Model (and its metrics sidecar) is loaded lazily on first prediction
+        self.model_handle = ModelHandle(model_path, check_interval=model_reload_interval) if model_path else StaticModelHandle(None)
+        
+        # Character n-gram model (optional, built by train_model.py markov)
+        self.markov_model = markov_model
+        if markov_model is None:
             try:
-                with open(model_path, 'rb') as f:
-                    self.password_model = pickle.load(f)
-                    logging.info("Password model loaded successfully")
+                self.markov_model = load_default_markov_model()
+                if self.markov_model is not None:
+                    logging.info(f"Loaded order-{self.markov_model.order} Markov model {self.markov_model.version}")
             except Exception as e:
-                logging.error(f"Error loading model: {e}")
+                logging.error(f"Error loading Markov model: {e}")
         
-        # Load common passwords
-        data_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                               'static', 'data', 'rockyou_sample.txt')
-        if os.path.exists(data_path):
+        # Load common passwords (shared with other analyzers in this process)
+        store = breach_store
+        if store is None:
             try:
-                with open(data_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    self.common_passwords = set(line.strip() for line in f)
-                    logging.info(f"Loaded {len(self.common_passwords)} common passwords")
+                store = load_default_breach_store()
+                if store is not None:
+                    logging.info(f"Loaded {len(store)} common passwords")
             except Exception as e:
                 logging.error(f"Error loading common passwords: {e}")
+        # Set directly: a new analyzer must not clear a result cache other processes may share
+        self._set_common_passwords(store if store is not None else set())
+    
+    @property
+    def common_passwords(self):
+        return self._common_passwords
+    
+    @common_passwords.setter
+    def common_passwords(self, store):
+        self._set_common_passwords(store)
+        self.clear_result_cache()
+    
+    def _set_common_passwords(self, store):
+        self._common_passwords = store
+        # Part of every result cache key; the same data gives the same identity in every process
+        self.common_passwords_identity = store_identity(store)
+    
+    @property
+    def password_model(self):
+        """The current strength model, loaded on first use"""
+        return self.model_handle.get()
+    
+    @password_model.setter
+    def password_model(self, model):
+        self.model_handle = StaticModelHandle(model)
+        self.clear_result_cache()
+    
+    @property
+    def model_metrics(self):
+        return self.model_handle.metrics
+    
+    @model_metrics.setter
+    def model_metrics(self, metrics):
+        self.model_handle.metrics = metrics
+    
+    @property
+    def model_version(self):
+        return self.model_handle.version
+    
+    def reload_model(self):
+        """Atomically swap in the model file's current contents and return its version"""
+        version = self.model_handle.reload()
+        self.clear_result_cache()
+        return version
+    
+    def reload_breach_store(self):
+        """Reopen the default common-password store, picking up a rebuilt index or wordlist"""
+        store = load_default_breach_store()
+        if store is None:
+            raise FileNotFoundError("No common-password data found")
+        self.common_passwords = store
+        logging.info(f"Reloaded {len(store)} common passwords")
+        return len(store)
+    
+    def clear_result_cache(self):
+        """
+        Drop cached analysis results. Keys already include the model version and
+        the common-password store's identity, so this only frees the entries
+        that became unreachable.
+        """
+        if self.result_cache is not None:
+            self.result_cache.clear()
     
     def get_model_accuracy(self):
         """Retrieve the accuracy of the trained model."""
+        password_model = self.password_model
+        if not password_model:
+            logging.warning("No model loaded to evaluate")
+            return None
+        
+        # Served from the metrics saved at training time when available
+        if self.model_metrics is None:
+            self.model_metrics = self._evaluate_model()
+            if self.model_metrics is None:
+                return None
+        return round(self.model_metrics["accuracy"] * 100, 2)  # Return as percentage rounded to 2 decimal places
+    
+    def _evaluate_model(self):
+        """Evaluate the model on a freshly generated dataset (models trained without a metrics sidecar)"""
         try:
             # Load test data for evaluation
             from train_model import generate_dataset
             X, y = generate_dataset(size=1000)  # Create a small test set
             
             # Evaluate model on this data
-            if self.password_model:
-                accuracy = self.password_model.score(X, y)
-                logging.info(f"Model accuracy: {accuracy:.4f}")
-                return round(accuracy * 100, 2)  # Return as percentage rounded to 2 decimal places
-            else:
-                logging.warning("No model loaded to evaluate")
-                return None
+            accuracy = self.password_model.score(X, y)
+            logging.info(f"Model accuracy: {accuracy:.4f}")
+            return {"accuracy": accuracy}
         except Exception as e:
             logging.error(f"Error calculating model accuracy: {e}")
             return None
 
-    def analyze_password(self, password, max_time_to_crack=None):
+    def analyze_password(self, password, max_time_to_crack=None, include_ai=True):
         """
-        Analyze password strength and return a detailed report
+        Analyze password strength and return a detailed report.
+        Pass include_ai=False to skip the blocking Gemini call (for example
+        when recommendations are fetched in the background instead).
         """
         logging.debug(f"Analyzing password length: {len(password)}")  # Log only length for security
         if not password:
@@ -76,63 +322,69 @@ class PasswordAnalyzer:
                 "feedback": ["Password is empty"]
             }
         
-        # Basic checks
-        length = len(password)
-        has_upper = bool(re.search(r'[A-Z]', password))
-        has_lower = bool(re.search(r'[a-z]', password))
-        has_digit = bool(re.search(r'\d', password))
-        has_special = bool(re.search(r'[^A-Za-z0-9]', password))
-        
-        # Calculate character diversity
-        char_set_size = sum([has_upper, has_lower, has_digit, has_special])
-        
-        # Pattern checks
-        has_repeated_chars = bool(re.search(r'(.)\1{2,}', password))  # 3+ repeated chars
-        has_sequential_chars = self._has_sequential_pattern(password)
-        
-        # Check for common words or patterns
-        has_common_words = self._contains_common_words(password)
-        has_keyboard_pattern = self._has_keyboard_pattern(password)
-        has_date_pattern = self._has_date_pattern(password)
-        
-        # Check if password is common
-        is_common = password.lower() in self.common_passwords
+        if self.result_cache is not None:
+            cache_key = self._result_cache_key(password, max_time_to_crack)
+            result = self.result_cache.get(cache_key)
+            if result is not None:
+                metrics.RESULT_CACHE_HITS.inc()
+                result = copy.deepcopy(result)
+                start = perf_counter()
+                result["improved_suggestion"] = self._generate_improved_password(password, result["weakness_reasons"])
+                metrics.STAGE_SUGGESTION.observe(perf_counter() - start)
+            else:
+                metrics.RESULT_CACHE_MISSES.inc()
+                result = self._analyze_report(password, max_time_to_crack)
+                # Reports without a breach check are not cached, so the check runs again once the store recovers
+                if "breach_check" not in result:
+                    self.result_cache.set(cache_key, {
+                        field: None if field in UNCACHED_REPORT_FIELDS else copy.deepcopy(value)
+                        for field, value in result.items()
+                    })
+        else:
+            result = self._analyze_report(password, max_time_to_crack)
         
-        # Calculate entropy
-        entropy = self._calculate_entropy(password)
+        # Get AI-powered recommendations if API key is available
+        if include_ai and GEMINI_API_KEY:
+            try:
+                ai_recommendations = self.get_genai_recommendations(result)
+                if ai_recommendations:
+                    result.update(ai_recommendations)
+            except Exception as e:
+                logging.error(f"Error retrieving AI recommendations: {e}")
+    
+        return result
+    
+    def _result_cache_key(self, password, max_time_to_crack):
+        """Keyed hash of everything a report depends on, so the plaintext is never stored"""
+        return keyed_fingerprint(ANALYSIS_CACHE_KEY, {
+            "password": password,
+            "max_time_to_crack": max_time_to_crack,
+            "model_version": self.model_version,
+            "markov_version": self.markov_model.version if self.markov_model is not None else None,
+            "common_passwords": self.common_passwords_identity
+        })
+    
+    def _analyze_report(self, password, max_time_to_crack=None):
+        """The deterministic analysis report for a non-empty password, timing each stage"""
+        # Single analysis pass shared by scoring, time-to-crack and ML features
+        features = self._analyze_features(password, observe_stages=True)
         
         # Use ML model prediction if available
         ml_prediction = None
-        if self.password_model:
-            features = self._extract_features(password)
+        password_model = self.password_model
+        if password_model:
+            start = perf_counter()
+            ml_features = self._extract_features(password, features)
             try:
-                ml_prediction = self.password_model.predict_proba([features])[0][1]
+                ml_prediction = password_model.predict_proba([ml_features])[0][1]
                 logging.debug(f"ML prediction: {ml_prediction:.4f}")
             except Exception as e:
+                metrics.MODEL_ERRORS.inc()
                 logging.error(f"Error in ML prediction: {e}")
+            metrics.STAGE_ML_INFERENCE.observe(perf_counter() - start)
         
         # Calculate base score
-        score = 0
-        score += min(length * 4, 40)  # Length: up to 40 points
-        score += 10 if has_upper else 0
-        score += 10 if has_lower else 0
-        score += 10 if has_digit else 0
-        score += 15 if has_special else 0
-        score += min(entropy * 2, 30)  # Entropy: up to 30 points
-        
-        # Penalties
-        if is_common:
-            score -= 40
-        if has_repeated_chars:
-            score -= 15
-        if has_sequential_chars:
-            score -= 15
-        if has_keyboard_pattern:
-            score -= 10
-        if has_date_pattern:
-            score -= 10
-        if has_common_words:
-            score -= 20
+        score = self._rule_score(features)
             
         # Add ML boost if available
         if ml_prediction is not None:
@@ -141,8 +393,57 @@ class PasswordAnalyzer:
         
         # Cap score between 0-100
         score = max(0, min(100, score))
+        strength = self._strength_label(score)
         
-        # Determine strength category
+        # Estimate time to crack using zxcvbn-inspired approach
+        start = perf_counter()
+        time_to_crack = self._estimate_time_to_crack_improved(password, features)
+        markov_start = perf_counter()
+        markov_log10_prob = self._markov_log10_prob(password)
+        report_start = perf_counter()
+        # Feedback and the improved suggestion
+        report = self._build_report(password, features, score, strength, time_to_crack, max_time_to_crack,
+                                    markov_log10_prob=markov_log10_prob)
+        end = perf_counter()
+        metrics.STAGE_TIME_TO_CRACK.observe(markov_start - start)
+        if self.markov_model is not None:
+            metrics.STAGE_MARKOV.observe(report_start - markov_start)
+        metrics.STAGE_SUGGESTION.observe(end - report_start)
+        return report
+    
+    def _markov_log10_prob(self, password):
+        """Rounded log10 probability under the Markov model, or None without one"""
+        if self.markov_model is None:
+            return None
+        return round(self.markov_model.log10_prob(password), 2)
+    
+    def _rule_score(self, features):
+        """Score from character classes, entropy and pattern penalties (before the ML boost and capping)"""
+        score = 0
+        score += min(features.length * 4, 40)  # Length: up to 40 points
+        score += 10 if features.has_upper else 0
+        score += 10 if features.has_lower else 0
+        score += 10 if features.has_digit else 0
+        score += 15 if features.has_special else 0
+        score += min(features.entropy * 2, 30)  # Entropy: up to 30 points
+        
+        # Penalties
+        if features.is_common:
+            score -= 40
+        if features.has_repeated:
+            score -= 15
+        if features.has_sequential:
+            score -= 15
+        if features.has_keyboard:
+            score -= 10
+        if features.has_date:
+            score -= 10
+        if features.has_common_words:
+            score -= 20
+        return score
+    
+    def _strength_label(self, score):
+        """Determine strength category"""
         strength = "Very Weak"
         if score >= 80:
             strength = "Very Strong"
@@ -152,7 +453,127 @@ class PasswordAnalyzer:
             strength = "Moderate"
         elif score >= 25:
             strength = "Weak"
-            
+        return strength
+    
+    def analyze_live(self, state, password=None):
+        """
+        Cheap partial report for as-you-type feedback from an IncrementalAnalysis:
+        rule-based score, classes, entropy and pattern flags, with no ML model,
+        no AI and no improved suggestion. The common-password check, crack time
+        and Markov score need the whole text, so they are None unless the full
+        password (the state's current text) is passed.
+        """
+        if not state.length:
+            return {
+                "score": 0,
+                "strength": "None",
+                "feedback": ["Password is empty"],
+                "partial": True
+            }
+        features = state.features(password)
+        score = max(0, min(100, self._rule_score(features)))
+        if password is None:
+            time_to_crack = {"seconds": None, "text": None, "guesses_log10": None}
+            markov_log10_prob = None
+        else:
+            time_to_crack = self._estimate_time_to_crack_improved(password, features)
+            markov_log10_prob = self._markov_log10_prob(password)
+        report = self._build_report(None, features, score, self._strength_label(score), time_to_crack,
+                                    suggest=False, markov_log10_prob=markov_log10_prob)
+        del report["improved_suggestion"]
+        report["partial"] = True
+        return report
+    
+    def analyze_many(self, passwords, max_time_to_crack=None):
+        """
+        Analyze a batch of passwords and return one report per password.
+        Features are stacked into a single matrix so the ML model runs one
+        predict_proba call, and scores, strength buckets and crack times are
+        computed with array operations; crack times come from the guess
+        estimator per password. Reports match analyze_password except
+        that AI recommendations are never requested.
+        """
+        passwords = list(passwords)
+        results = [None] * len(passwords)
+        indices = []
+        records = []
+        for i, password in enumerate(passwords):
+            if not password:
+                results[i] = {
+                    "score": 0,
+                    "strength": "None",
+                    "feedback": ["Password is empty"]
+                }
+                continue
+            indices.append(i)
+            records.append(self._analyze_features(password))
+        
+        if not records:
+            return results
+        
+        X = np.array([self._extract_features(None, features) for features in records], dtype=float)
+        flags = np.array([[features.is_common, features.has_repeated, features.has_sequential,
+                           features.has_keyboard, features.has_date, features.has_common_words]
+                          for features in records], dtype=bool)
+        length, has_upper, has_lower, has_digit, has_special, entropy, char_classes = X.T
+        is_common, has_repeated, has_sequential, has_keyboard, has_date, has_common_words = flags.T
+        
+        # Use ML model prediction if available, one call for the whole batch
+        ml_predictions = None
+        password_model = self.password_model
+        if password_model:
+            try:
+                ml_predictions = password_model.predict_proba(X)[:, 1]
+            except Exception as e:
+                metrics.MODEL_ERRORS.inc()
+                logging.error(f"Error in ML prediction: {e}")
+        
+        # Same terms, in the same order, as the scalar scoring in analyze_password
+        scores = np.minimum(length * 4, 40) + 10 * has_upper + 10 * has_lower + 10 * has_digit + 15 * has_special
+        scores = scores + np.minimum(entropy * 2, 30)
+        scores = scores - 40 * is_common
+        scores = scores - 15 * has_repeated
+        scores = scores - 15 * has_sequential
+        scores = scores - 10 * has_keyboard
+        scores = scores - 10 * has_date
+        scores = scores - 20 * has_common_words
+        if ml_predictions is not None:
+            scores = scores + ml_predictions * 20
+        scores = np.clip(scores, 0, 100)
+        
+        strength_labels = np.array(["Very Weak", "Weak", "Moderate", "Strong", "Very Strong"])
+        strengths = strength_labels[(scores >= 25).astype(int) + (scores >= 50) + (scores >= 65) + (scores >= 80)]
+        
+        # Markov log-probabilities for the whole batch, column by column
+        markov_log10_probs = [None] * len(indices)
+        if self.markov_model is not None:
+            markov_log10_probs = [round(value, 2) for value in
+                                  self.markov_model.log10_prob_many([passwords[i] for i in indices]).tolist()]
+        
+        for i, features, score, strength, markov_log10_prob in zip(indices, records, scores.tolist(),
+                                                                   strengths.tolist(), markov_log10_probs):
+            time_to_crack = self._estimate_time_to_crack_improved(passwords[i], features)
+            results[i] = self._build_report(passwords[i], features, score, strength,
+                                            time_to_crack, max_time_to_crack, markov_log10_prob=markov_log10_prob)
+        
+        return results
+    
+    def _build_report(self, password, features, score, strength, time_to_crack, max_time_to_crack=None, suggest=True,
+                      markov_log10_prob=None):
+        """Build the analysis report (feedback, suggestion, crack time) for a scored password"""
+        length = features.length
+        has_upper = features.has_upper
+        has_lower = features.has_lower
+        has_digit = features.has_digit
+        has_special = features.has_special
+        has_repeated_chars = features.has_repeated
+        has_sequential_chars = features.has_sequential
+        has_common_words = features.has_common_words
+        has_keyboard_pattern = features.has_keyboard
+        has_date_pattern = features.has_date
+        is_common = features.is_common
+        entropy = features.entropy
+        
         # Generate feedback
         feedback = []
         weakness_reasons = []
@@ -198,16 +619,13 @@ class PasswordAnalyzer:
             feedback.append("Password looks good!")
         
         # Generate improved password suggestions
-        improved_suggestion = self._generate_improved_password(password, weakness_reasons)
-        
-        # Estimate time to crack using zxcvbn-inspired approach
-        time_to_crack = self._estimate_time_to_crack_improved(password)
+        improved_suggestion = self._generate_improved_password(password, weakness_reasons) if suggest else None
         
         # Check if the password meets the time-to-crack requirement
         if max_time_to_crack is not None and time_to_crack["seconds"] < max_time_to_crack:
             feedback.append(f"Password doesn't meet the required strength (needs to take longer than {self._format_time(max_time_to_crack)} to crack)")
         
-        result = {
+        report = {
             "score": round(score),
             "strength": strength,
             "entropy": round(entropy, 1),
@@ -227,64 +645,28 @@ class PasswordAnalyzer:
             "improved_suggestion": improved_suggestion,
             "time_to_crack": time_to_crack["text"],
             "time_to_crack_seconds": time_to_crack["seconds"],
+            "guesses_log10": time_to_crack["guesses_log10"],
+            "markov_log10_prob": markov_log10_prob,
             "password_masked": '*' * length
         }
-        
-        # Get AI-powered recommendations if API key is available
-        if GEMINI_API_KEY:
-            try:
-                ai_recommendations = self.get_genai_recommendations(result)
-                if ai_recommendations:
-                    result.update(ai_recommendations)
-            except Exception as e:
-                logging.error(f"Error retrieving AI recommendations: {e}")
-    
-        return result
+        if not features.breach_checked:
+            # The range service is failing; is_common False means unknown, not "not breached"
+            report["breach_check"] = "unavailable"
+        return report
     
     def _contains_common_words(self, password):
         """Check if password contains common words"""
-        common_words = ["password", "admin", "user", "login", "welcome", 
-                      "secret", "qwerty", "letmein", "monkey", "dragon", 
-                      "baseball", "football", "superman", "batman", "trustno",
-                      "summer", "winter", "spring", "autumn", "apple"]
-        
-        password_lower = password.lower()
-        for word in common_words:
-            if word in password_lower:
-                return True
-        return False
+        return 'dictionary' in self.pattern_matcher.kinds(password.lower())
     
     def _has_keyboard_pattern(self, password):
         """Check for keyboard patterns like 'qwerty', 'asdfgh', etc."""
-        keyboard_patterns = [
-            "qwerty", "qwertz", "azerty", "asdfgh", "zxcvbn", "qweasdzxc",
-            "1qaz2wsx", "qazwsx", "zxcvbnm", "poiuyt", "lkjhgf"
-        ]
-        
-        password_lower = password.lower()
-        for pattern in keyboard_patterns:
-            if pattern in password_lower:
-                return True
-            
-        # Check for rows on keyboard
-        for i in range(len(password) - 2):
-            segment = password_lower[i:i+3]
-            if segment in "qwertyuiop" or segment in "asdfghjkl" or segment in "zxcvbnm":
-                return True
-                
-        return False
+        return 'keyboard' in self.pattern_matcher.kinds(password.lower())
     
     def _has_date_pattern(self, password):
         """Check for date patterns"""
         # Check for MMDDYYYY, DDMMYYYY, MMDDYY, DDMMYY
-        date_patterns = [
-            r'\d{2}[/\-_.]\d{2}[/\-_.]\d{2,4}',  # MM/DD/YYYY
-            r'\d{4,8}',  # YYYYMMDD or MMDDYYYY without separators
-            r'19\d{2}|20\d{2}'  # Years (1900-2099)
-        ]
-        
-        for pattern in date_patterns:
-            if re.search(pattern, password):
+        for pattern in _DATE_RES:
+            if pattern.search(password):
                 return True
         return False
     
@@ -353,8 +735,49 @@ class PasswordAnalyzer:
         
         return improved
     
+    def _recommendation_cache_key(self, analysis_result):
+        """The prompt only depends on these fields, so cache on their fingerprint"""
+        return fingerprint({field: analysis_result.get(field) for field in RECOMMENDATION_FIELDS})
+    
     def get_genai_recommendations(self, analysis_result):
         """Get AI-powered recommendations using Google's Gemini API"""
+        cache_key = self._recommendation_cache_key(analysis_result)
+        cached = self.recommendation_cache.get(cache_key)
+        if cached is not None:
+            metrics.AI_CACHE_HITS.inc()
+            logging.debug("AI recommendations served from cache")
+            return copy.deepcopy(cached)
+        metrics.AI_CACHE_MISSES.inc()
+        
+        start = perf_counter()
+        recommendations = self._request_genai_recommendations(analysis_result)
+        metrics.STAGE_AI.observe(perf_counter() - start)
+        (metrics.AI_CALLS_OK if recommendations else metrics.AI_CALLS_FAILED).inc()
+        if recommendations:
+            self.recommendation_cache.set(cache_key, copy.deepcopy(recommendations))
+        return recommendations
+    
+    async def get_genai_recommendations_async(self, analysis_result, client):
+        """get_genai_recommendations for asyncio callers, awaiting an AsyncGeminiClient"""
+        cache_key = self._recommendation_cache_key(analysis_result)
+        cached = self.recommendation_cache.get(cache_key)
+        if cached is not None:
+            metrics.AI_CACHE_HITS.inc()
+            logging.debug("AI recommendations served from cache")
+            return copy.deepcopy(cached)
+        metrics.AI_CACHE_MISSES.inc()
+        
+        start = perf_counter()
+        response = await client.generate_content(self.build_genai_prompt(analysis_result), GEMINI_API_KEY)
+        metrics.STAGE_AI.observe(perf_counter() - start)
+        recommendations = self.parse_genai_response(response) if response is not None else None
+        (metrics.AI_CALLS_OK if recommendations else metrics.AI_CALLS_FAILED).inc()
+        if recommendations:
+            self.recommendation_cache.set(cache_key, copy.deepcopy(recommendations))
+        return recommendations
+    
+    def build_genai_prompt(self, analysis_result):
+        """Build the Gemini prompt from the analysis result (never the password itself)"""
         # Construct the prompt
         strength = analysis_result['strength']
         password_masked = analysis_result.get('password_masked', '********')  # Don't use actual password!
@@ -389,55 +812,34 @@ class PasswordAnalyzer:
         Important: Do not include speculative information about the actual password - only use the analysis data provided above.
         Format your response in a concise, user-friendly way with clearly separated sections.
         """
+        return prompt
+    
+    def _request_genai_recommendations(self, analysis_result):
+        """Call the Gemini API through the shared client and parse its response"""
+        prompt = self.build_genai_prompt(analysis_result)
+        response = get_client().generate_content(prompt, GEMINI_API_KEY)
+        if response is None:
+            return None
+        return self.parse_genai_response(response)
+    
+    def parse_genai_response(self, response):
+        """Turn a generateContent response into the ai_* result fields"""
+        # Extract the text from the response
+        genai_text = extract_text(response)
+        if genai_text is None:
+            logging.error(f"No valid candidates returned from Gemini API")
+            return None
         
-        # API request payload
-        payload = {
-            "contents": [{
-                "parts": [{
-                    "text": prompt
-                }]
-            }]
-        }
+        # Process the response to extract structured sections
+        sections = self._parse_ai_response(genai_text)
         
-        # Call Gemini API
-        try:
-            headers = {
-                "Content-Type": "application/json"
-            }
-            # Use Gemini API with your GEMINI_API_KEY
-            response = requests.post(
-                f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={GEMINI_API_KEY}",
-                headers=headers,
-                data=json.dumps(payload)
-            )
-            
-            logging.debug(f"Gemini API response code: {response.status_code}")
-            if response.status_code == 200 and 'candidates' in response.json():
-                result = response.json()
-                # Extract the text from the response
-                if 'candidates' in result and len(result['candidates']) > 0:
-                    genai_text = result['candidates'][0]['content']['parts'][0]['text']
-                    
-                    # Process the response to extract structured sections
-                    sections = self._parse_ai_response(genai_text)
-                    
-                    return {
-                        "ai_explanation": sections.get("explanation", []),
-                        "ai_vulnerabilities": sections.get("vulnerabilities", []),
-                        "ai_suggestions": sections.get("suggestions", []),
-                        "ai_example": sections.get("example", None),
-                        "ai_full_response": genai_text
-                    }
-                else:
-                    logging.error(f"No valid candidates returned from Gemini API")
-                    return None
-            else:
-                logging.error(f"API Error: {response.status_code}")
-                return None
-                
-        except Exception as e:
-            logging.error(f"Error calling Gemini API: {e}")
-            return None
+        return {
+            "ai_explanation": sections.get("explanation", []),
+            "ai_vulnerabilities": sections.get("vulnerabilities", []),
+            "ai_suggestions": sections.get("suggestions", []),
+            "ai_example": sections.get("example", None),
+            "ai_full_response": genai_text
+        }
     
     def _parse_ai_response(self, response_text):
         """Parse the AI response into structured sections"""
@@ -483,56 +885,46 @@ class PasswordAnalyzer:
         
         return sections
     
-    def _estimate_time_to_crack_improved(self, password):
+    def _estimate_time_to_crack_improved(self, password, features=None):
         """
-        Estimate time-to-crack based on password complexity
-        Returns both seconds and human-readable format
+        Estimate time-to-crack from the fewest guesses needed to cover the
+        password with dictionary words, keyboard walks, sequences, repeats,
+        dates and brute force (see guess_estimator)
+        Returns seconds, human-readable format and the log10 guess count
         """
-        # Calculate character set size
+        if features is None:
+            features = self._analyze_features(password)
+            
+        # Calculate character set size for the brute-force parts
         char_set_size = 0
-        if re.search(r'[a-z]', password):
+        if features.has_lower:
             char_set_size += 26
-        if re.search(r'[A-Z]', password):
+        if features.has_upper:
             char_set_size += 26
-        if re.search(r'\d', password):
+        if features.has_digit:
             char_set_size += 10
-        if re.search(r'[^A-Za-z0-9]', password):
+        if features.has_special:
             char_set_size += 33  # Common special characters
             
         # Default to smallest reasonable charset
         if char_set_size == 0:
             char_set_size = 26
             
-        # Assume average of 10 billion guesses per second (modern password cracker)
-        guesses_per_second = 10_000_000_000
-        
-        # Calculate total possible combinations
-        combinations = char_set_size ** len(password)
+        log10_guesses = self.guess_estimator.estimate(password, char_set_size).log10_guesses
         
-        # On average, a brute force attack finds the password after trying half the combinations
-        seconds = combinations / (2 * guesses_per_second)
-        
-        # Common password penalty - if it's a common pattern, drastically reduce the time
-        if password.lower() in self.common_passwords:
-            seconds = min(seconds, 0.1)  # Instant cracking for common passwords
-            
-        # Check for common patterns and apply penalties
-        if self._has_sequential_pattern(password) or self._has_keyboard_pattern(password):
-            seconds /= 1000  # Much faster to crack with pattern-based attacks
-            
-        if self._has_date_pattern(password):
-            seconds /= 500  # Date patterns are quickly checked in attacks
-            
-        # Apply length penalty for very short passwords
-        if len(password) < 8:
-            seconds /= 100
+        # Common password penalty - breached passwords are among the first guesses (at most 0.1 seconds)
+        if features.is_common:
+            log10_guesses = min(log10_guesses, math.log10(0.1 * 2 * GUESSES_PER_SECOND))
             
+        seconds = _guesses_to_seconds(log10_guesses)
+        
         # Format the time in a human-readable way
         readable_time = self._format_time(seconds)
         
         return {
             "seconds": seconds,
-            "text": readable_time
+            "text": readable_time,
+            "guesses_log10": round(log10_guesses, 2)
         }
     
     def _format_time(self, seconds):
@@ -569,25 +961,15 @@ class PasswordAnalyzer:
     
     def _has_sequential_pattern(self, password):
         """Check for sequential patterns like 'abc', '123', etc.""" 
-        common_sequences = [
-            "abcdefghijklmnopqrstuvwxyz",
-            "qwertyuiop", "asdfghjkl", "zxcvbnm",
-            "0123456789"
-        ]
-        
-        password_lower = password.lower()
-        for seq in common_sequences:
-            for i in range(len(seq) - 2):
-                if seq[i:i+3] in password_lower:
-                    return True
-        return False
+        return 'sequence' in self.pattern_matcher.kinds(password.lower())
     
-    def _calculate_entropy(self, password):
+    def _calculate_entropy(self, password, freq=None):
         """Calculate Shannon entropy of the password"""
         if not password:
             return 0
             
-        freq = Counter(password)
+        if freq is None:
+            freq = Counter(password)
         length = len(password)
         
         entropy = 0
@@ -597,22 +979,91 @@ class PasswordAnalyzer:
             
         return entropy * length / 3  # Scale entropy by length/3 for better scoring
     
-    def _extract_features(self, password):
-        """Extract features for ML model"""
-        length = len(password)
-        has_upper = int(bool(re.search(r'[A-Z]', password)))
-        has_lower = int(bool(re.search(r'[a-z]', password)))
-        has_digit = int(bool(re.search(r'\d', password)))
-        has_special = int(bool(re.search(r'[^A-Za-z0-9]', password)))
-        entropy = self._calculate_entropy(password)
-        char_classes = has_upper + has_lower + has_digit + has_special
+    def _analyze_features(self, password, observe_stages=False):
+        """
+        Walk the password once and fill a PasswordFeatures record. With
+        observe_stages, the pattern checks, entropy and common-password lookup
+        are each recorded in the stage metrics.
+        """
+        start = perf_counter()
+        # One counting pass gives both the entropy frequencies and the
+        # distinct characters used to derive the character classes
+        freq = Counter(password)
+        # One automaton scan finds all dictionary, keyboard and sequence matches
+        pattern_kinds = self.pattern_matcher.kinds(password.lower())
+        has_upper = has_lower = has_digit = has_special = False
+        for char in freq:
+            if 'a' <= char <= 'z':
+                has_lower = True
+            elif 'A' <= char <= 'Z':
+                has_upper = True
+            elif '0' <= char <= '9':
+                has_digit = True
+            else:
+                has_special = True
+                # Non-ASCII decimal digits also match \d
+                if char.isdecimal():
+                    has_digit = True
+        has_repeated = bool(_REPEATED_RE.search(password))
+        has_date = self._has_date_pattern(password)
+        
+        entropy_start = perf_counter()
+        entropy = self._calculate_entropy(password, freq)
+        lookup_start = perf_counter()
+        is_common, breach_checked = self._lookup_common(password)
+        if observe_stages:
+            end = perf_counter()
+            metrics.STAGE_PATTERNS.observe(entropy_start - start)
+            metrics.STAGE_ENTROPY.observe(lookup_start - entropy_start)
+            metrics.STAGE_COMMON_LOOKUP.observe(end - lookup_start)
+        
+        return PasswordFeatures(
+            length=len(password),
+            has_upper=has_upper,
+            has_lower=has_lower,
+            has_digit=has_digit,
+            has_special=has_special,
+            char_classes=has_upper + has_lower + has_digit + has_special,
+            entropy=entropy,
+            has_repeated=has_repeated,
+            has_sequential='sequence' in pattern_kinds,
+            has_keyboard='keyboard' in pattern_kinds,
+            has_date=has_date,
+            has_common_words='dictionary' in pattern_kinds,
+            is_common=is_common,
+            breach_checked=breach_checked
+        )
+    
+    def _lookup_common(self, password):
+        """
+        (is_common, checked) for a password. A store with lookup() (the range
+        store) returns None when it could not be asked; that counts as not
+        common but unchecked.
+        """
+        store = self.common_passwords
+        lookup = getattr(store, 'lookup', None)
+        if lookup is None:
+            return password.lower() in store, True
+        found = lookup(password.lower())
+        return found is True, found is not None
+    
+    def _extract_features(self, password, features=None):
+        """Extract features for ML model (from a precomputed record if given)"""
+        if features is None:
+            features = self._analyze_features(password)
         
         return [
-            length, 
-            has_upper,
-            has_lower, 
-            has_digit, 
-            has_special, 
-            entropy,
-            char_classes
-        ]
\ No newline at end of file
+            features.length, 
+            int(features.has_upper),
+            int(features.has_lower), 
+            int(features.has_digit), 
+            int(features.has_special), 
+            features.entropy,
+            features.char_classes
+        ]
+
+
+if __name__ == '__main__':
+    # python -m password_analyzer audit ...
+    from audit_cli import main
+    sys.exit(main())
@@ -0,0 +1,104 @@
+from collections import deque, namedtuple
+
+# A single pattern occurrence reported by PatternMatcher.find_all
+PatternMatch = namedtuple('PatternMatch', ['pattern', 'kind', 'start', 'length'])
+
+
+class PatternMatcher:
+    """
+    Aho-Corasick automaton over a fixed set of substrings.
+    Built once, then reports every occurrence of every pattern in a single
+    linear scan of the text, independent of how many patterns were added.
+    """
+
+    def __init__(self, patterns=None):
+        # Trie transitions, failure links and the patterns ending at each state
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        self._patterns = []
+        self._built = False
+
+        if patterns:
+            for pattern, kind in patterns:
+                self.add(pattern, kind)
+            self.build()
+
+    def add(self, pattern, kind):
+        """Add a pattern tagged with a kind (e.g. 'dictionary', 'keyboard')"""
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+
+        entry = (pattern, kind)
+        if entry not in self._output[state]:
+            self._output[state].append(entry)
+            self._patterns.append(entry)
+        self._built = False
+
+    def build(self):
+        """Compute failure links breadth-first and merge suffix outputs"""
+        queue = deque()
+        for next_state in self._goto[0].values():
+            self._fail[next_state] = 0
+            queue.append(next_state)
+
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Patterns ending at the failure state also end here
+                for entry in self._output[self._fail[next_state]]:
+                    if entry not in self._output[next_state]:
+                        self._output[next_state].append(entry)
+
+        self._built = True
+
+    def step(self, state, char):
+        """Advance the automaton by one character and return the new state"""
+        goto = self._goto
+        while state and char not in goto[state]:
+            state = self._fail[state]
+        return goto[state].get(char, 0)
+
+    def outputs(self, state):
+        """Patterns (pattern, kind) that end at the given state"""
+        return self._output[state]
+
+    def find_all(self, text):
+        """Return every PatternMatch in text, ordered by end position"""
+        if not self._built:
+            self.build()
+
+        matches = []
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for pattern, kind in output[state]:
+                matches.append(PatternMatch(pattern, kind, index - len(pattern) + 1, len(pattern)))
+        return matches
+
+    def kinds(self, text):
+        """Return the set of pattern kinds that occur anywhere in text"""
+        return {match.kind for match in self.find_all(text)}
+
+    def __len__(self):
+        return len(self._patterns)
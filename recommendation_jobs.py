@@ -0,0 +1,135 @@
+import time
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+
+class RecommendationJobs:
+    """
+    Run AI recommendation requests in a background thread pool so the
+    deterministic analysis can be returned immediately. Results are kept
+    for polling by job ID until they expire or the job store is full.
+    """
+
+    def __init__(self, fetch, max_workers=4, ttl=600, max_jobs=10000):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='ai-recommendations')
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, analysis_result):
+        """Queue a recommendation request for an analysis result and return its job ID"""
+        job_id = uuid.uuid4().hex
+        # The job works on its own snapshot of the result
+        future = self._executor.submit(self.fetch, dict(analysis_result))
+        with self._lock:
+            self._expire(time.monotonic())
+            self._jobs[job_id] = (time.monotonic(), future)
+        return job_id
+
+    def get(self, job_id, wait=0):
+        """
+        Return the job status ('pending', 'done', 'unavailable', 'failed' or
+        'not_found'), waiting up to `wait` seconds for a pending job.
+        """
+        with self._lock:
+            self._expire(time.monotonic())
+            job = self._jobs.get(job_id)
+        if job is None:
+            return {"status": "not_found"}
+
+        future = job[1]
+        if wait:
+            try:
+                future.result(timeout=wait)
+            except TimeoutError:
+                return {"status": "pending"}
+            except Exception:
+                pass  # Reported below
+        if not future.done():
+            return {"status": "pending"}
+
+        try:
+            recommendations = future.result()
+        except Exception as e:
+            logging.error(f"Error retrieving AI recommendations: {e}")
+            return {"status": "failed"}
+        if not recommendations:
+            return {"status": "unavailable"}
+        return {"status": "done", **recommendations}
+
+    def _expire(self, now):
+        """Drop jobs older than the TTL and the oldest jobs beyond max_jobs (lock held)"""
+        while self._jobs:
+            job_id, (created, _) = next(iter(self._jobs.items()))
+            if now - created < self.ttl and len(self._jobs) < self.max_jobs:
+                break
+            self._jobs.popitem(last=False)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class AsyncRecommendationJobs:
+    """
+    RecommendationJobs for an asyncio server: each job is a task awaiting
+    an async fetch, so in-flight requests cost no threads. Must be used
+    from the event loop thread.
+    """
+
+    def __init__(self, fetch, ttl=600, max_jobs=10000):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._jobs = OrderedDict()
+
+    def submit(self, analysis_result):
+        job_id = uuid.uuid4().hex
+        task = asyncio.ensure_future(self.fetch(dict(analysis_result)))
+        self._expire(time.monotonic())
+        self._jobs[job_id] = (time.monotonic(), task)
+        return job_id
+
+    async def get(self, job_id, wait=0):
+        """Same statuses as RecommendationJobs.get"""
+        self._expire(time.monotonic())
+        job = self._jobs.get(job_id)
+        if job is None:
+            return {"status": "not_found"}
+
+        task = job[1]
+        if wait and not task.done():
+            # Shield so a poll timing out does not cancel the job itself
+            await asyncio.wait([asyncio.shield(task)], timeout=wait)
+        if not task.done():
+            return {"status": "pending"}
+
+        if task.cancelled():
+            return {"status": "failed"}
+        error = task.exception()
+        if error is not None:
+            logging.error(f"Error retrieving AI recommendations: {error}")
+            return {"status": "failed"}
+        recommendations = task.result()
+        if not recommendations:
+            return {"status": "unavailable"}
+        return {"status": "done", **recommendations}
+
+    def _expire(self, now):
+        while self._jobs:
+            job_id, (created, task) = next(iter(self._jobs.items()))
+            if now - created < self.ttl and len(self._jobs) < self.max_jobs:
+                break
+            self._jobs.popitem(last=False)
+            if not task.done():
+                task.cancel()
+
+    def shutdown(self):
+        for _, task in self._jobs.values():
+            task.cancel()
+        self._jobs.clear()
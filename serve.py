@@ -0,0 +1,103 @@
+import os
+import gc
+import sys
+import time
+import logging
+import argparse
+import multiprocessing
+from gunicorn.app.base import BaseApplication
+
+from caching import SQLiteCache
+
+
+def default_workers():
+    return int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count()))
+
+
+def warm_up(flask_app_module):
+    """
+    Load everything the workers only read (model, common-password store,
+    pattern matcher) in the master so forked workers share those pages.
+    """
+    analyzer = flask_app_module.analyzer
+    start = time.perf_counter()
+    model = analyzer.password_model
+    # Run one analysis so lazily built tables and caches exist before the fork
+    analyzer.analyze_password('warm-up P4ssw0rd!', include_ai=False)
+    logging.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s "
+                 f"(model {analyzer.model_version if model is not None else 'unavailable'}, "
+                 f"{len(analyzer.common_passwords)} common passwords)")
+    # Move the loaded objects out of the collector's generations; otherwise the
+    # first collection in each worker touches them and un-shares their pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    """Give each worker its own handles to resources that must not cross a fork"""
+    import app as flask_app_module
+    from password_analyzer import make_recommendation_cache, make_result_cache
+
+    analyzer = flask_app_module.analyzer
+    # A SQLite connection opened in the master is not safe to use from several processes
+    if isinstance(analyzer.recommendation_cache, SQLiteCache):
+        analyzer.recommendation_cache = make_recommendation_cache()
+    if isinstance(analyzer.result_cache, SQLiteCache):
+        analyzer.result_cache = make_result_cache()
+
+
+class PasswordAnalyzerServer(BaseApplication):
+    """Gunicorn prefork server for the Flask app, loaded once before forking"""
+
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        import app as flask_app_module
+
+        warm_up(flask_app_module)
+        return flask_app_module.app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the password analyzer with prefork workers")
+    parser.add_argument('--bind', default=os.environ.get('BIND', '0.0.0.0:8000'))
+    parser.add_argument('--workers', type=int, default=default_workers(),
+                        help="Worker processes (WEB_WORKERS, default: CPU count)")
+    parser.add_argument('--threads', type=int, default=int(os.environ.get('WEB_THREADS', 4)),
+                        help="Threads per worker (WEB_THREADS)")
+    parser.add_argument('--keepalive', type=int, default=int(os.environ.get('WEB_KEEPALIVE', 5)),
+                        help="Seconds to hold idle keep-alive connections (WEB_KEEPALIVE)")
+    parser.add_argument('--timeout', type=int, default=int(os.environ.get('WEB_TIMEOUT', 60)),
+                        help="Seconds before a silent worker is restarted (WEB_TIMEOUT)")
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('WEB_MAX_REQUESTS', 0)),
+                        help="Restart a worker after this many requests, 0 to disable (WEB_MAX_REQUESTS)")
+    parser.add_argument('--log-level', default=os.environ.get('LOG_LEVEL', 'info'))
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('LOG_LEVEL', args.log_level)
+    options = {
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        # gthread workers serve keep-alive connections without tying up a thread each
+        'worker_class': 'gthread',
+        'keepalive': args.keepalive,
+        'timeout': args.timeout,
+        'max_requests': args.max_requests,
+        'max_requests_jitter': args.max_requests // 10,
+        'loglevel': args.log_level,
+        'preload_app': True,
+        'post_fork': post_fork,
+    }
+    PasswordAnalyzerServer(options).run()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -44,6 +44,92 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
     
+    // Live feedback while typing: edits are debounced and sent as keystroke
+    // updates to /analyze-live, which answers without the ML model or AI
+    const LIVE_DEBOUNCE_MS = 150;
+    let liveSessionId = null;
+    let liveSentValue = '';
+    let liveTimer = null;
+    let liveInFlight = false;
+    let livePending = false;
+    
+    passwordInput.addEventListener('input', function() {
+        clearTimeout(liveTimer);
+        liveTimer = setTimeout(sendLiveUpdate, LIVE_DEBOUNCE_MS);
+    });
+    
+    function liveUpdateFor(value) {
+        // Describe the change since the last update as a backspace plus appended text
+        if (liveSessionId === null) {
+            return { password: value };
+        }
+        let common = 0;
+        while (common < liveSentValue.length && common < value.length && liveSentValue[common] === value[common]) {
+            common++;
+        }
+        const update = { session_id: liveSessionId };
+        // Edits far from the end are cheaper to resend in full
+        if (liveSentValue.length - common > 32) {
+            update.password = value;
+        } else {
+            update.backspace = liveSentValue.length - common;
+            update.append = value.slice(common);
+        }
+        return update;
+    }
+    
+    function sendLiveUpdate(resync = false) {
+        if (liveInFlight) {
+            // Send again once the current request returns
+            livePending = true;
+            return;
+        }
+        const value = passwordInput.value;
+        if (!resync && value === liveSentValue && liveSessionId !== null) {
+            return;
+        }
+        const update = resync ? { password: value } : liveUpdateFor(value);
+        liveInFlight = true;
+        
+        fetch('/analyze-live', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+            },
+            body: JSON.stringify(update),
+        })
+        .then(response => response.json().then(data => ({ status: response.status, data: data })))
+        .then(({ status, data }) => {
+            liveInFlight = false;
+            if (status === 404 && data.resync) {
+                // The session expired or lives in another worker; start a new one
+                liveSessionId = null;
+                sendLiveUpdate(true);
+                return;
+            }
+            if (status !== 200) {
+                return;
+            }
+            liveSessionId = data.session_id;
+            liveSentValue = value;
+            if (passwordInput.value === value) {
+                if (value) {
+                    displayResults(data);
+                } else {
+                    resultsSection.style.display = 'none';
+                }
+            }
+            if (livePending) {
+                livePending = false;
+                sendLiveUpdate();
+            }
+        })
+        .catch(error => {
+            liveInFlight = false;
+            console.error('Error in live analysis:', error);
+        });
+    }
+    
     function analyzePassword() {
         const password = passwordInput.value;
         
@@ -68,6 +154,9 @@ document.addEventListener('DOMContentLoaded', function() {
         .then(response => response.json())
         .then(data => {
             displayResults(data);
+            if (data.ai_job_id) {
+                pollAiRecommendations(data.ai_job_id);
+            }
         })
         .catch(error => {
             console.error('Error analyzing password:', error);
@@ -112,7 +201,8 @@ document.addEventListener('DOMContentLoaded', function() {
         specialIcon.textContent = data.has_special ? '✅' : '❌';
         
         entropyValue.textContent = data.entropy;
-        timeToCrackValue.textContent = data.time_to_crack;
+        // Live updates after keystroke edits carry no crack time; only full-text requests do
+        timeToCrackValue.textContent = data.time_to_crack !== null ? data.time_to_crack : '—';
         
         feedbackList.innerHTML = '';
         data.feedback.forEach(item => {
@@ -122,6 +212,51 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Fetch AI recommendations in the background once the analysis is shown
+    function pollAiRecommendations(jobId, attempt = 0) {
+        fetch(`/ai-recommendations/${jobId}?wait=5`)
+            .then(response => response.json())
+            .then(data => {
+                if (data.status === 'pending' && attempt < 10) {
+                    pollAiRecommendations(jobId, attempt + 1);
+                } else if (data.status === 'done') {
+                    displayAiRecommendations(data);
+                }
+            })
+            .catch(error => console.error('Error fetching AI recommendations:', error));
+    }
+    
+    function displayAiRecommendations(data) {
+        const aiSection = document.getElementById('ai-recommendations');
+        if (!aiSection) {
+            return;
+        }
+        
+        const lists = {
+            'ai-vulnerabilities-list': data.ai_vulnerabilities,
+            'ai-explanation-list': data.ai_explanation,
+            'ai-suggestions-list': data.ai_suggestions
+        };
+        Object.entries(lists).forEach(([id, items]) => {
+            const list = document.getElementById(id);
+            if (!list) {
+                return;
+            }
+            list.innerHTML = '';
+            (items || []).forEach(item => {
+                const li = document.createElement('li');
+                li.textContent = item;
+                list.appendChild(li);
+            });
+        });
+        
+        const example = document.getElementById('ai-example');
+        if (example && data.ai_example) {
+            example.textContent = data.ai_example;
+        }
+        aiSection.style.display = 'block';
+    }
+
     // Settings modal functionality
     const settingsBtn = document.getElementById('settings-btn');
     const settingsModal = document.getElementById('settings-modal');
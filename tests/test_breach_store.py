@@ -0,0 +1,82 @@
+import pytest
+
+from breach_store import BloomFilter, RangeBreachStore, password_digest, password_key, RANGE_PREFIX_LENGTH
+
+
+def _keys(prefix, count):
+    return [password_key(f"{prefix}{i}") for i in range(count)]
+
+
+def test_bloom_filter_contains_every_member():
+    bloom = BloomFilter.for_capacity(5000, 0.01)
+    members = [f"member{i}" for i in range(5000)]
+    bloom.add_keys([password_key(password) for password in members])
+
+    assert all(password in bloom for password in members)
+    assert len(bloom) == 5000
+
+
+def test_bloom_filter_false_positive_rate_is_near_target():
+    bloom = BloomFilter.for_capacity(10000, 0.01)
+    bloom.add_keys(_keys("member", 10000))
+
+    false_positives = sum(bloom.might_contain_key(key) for key in _keys("absent", 20000))
+    assert false_positives / 20000 < 0.02
+
+
+def test_bloom_filter_save_and_load_round_trip(tmp_path):
+    bloom = BloomFilter.for_capacity(1000, 0.01)
+    bloom.add_keys(_keys("member", 1000))
+    path = str(tmp_path / "filter.bloom")
+    bloom.save(path)
+
+    loaded = BloomFilter.load(path)
+    assert (loaded.num_bits, loaded.num_hashes, len(loaded)) == (bloom.num_bits, bloom.num_hashes, 1000)
+    probes = _keys("member", 1000) + _keys("absent", 1000)
+    assert [loaded.might_contain_key(key) for key in probes] == [bloom.might_contain_key(key) for key in probes]
+
+
+def test_bloom_filter_rejects_invalid_rate():
+    with pytest.raises(ValueError):
+        BloomFilter.for_capacity(100, 1.5)
+
+
+class _FailingSource:
+    def __init__(self):
+        self.calls = 0
+
+    def get_range(self, prefix):
+        self.calls += 1
+        raise OSError("timed out")
+
+
+class _StaticSource:
+    def __init__(self, passwords):
+        self.suffixes = {}
+        for password in passwords:
+            digest = password_digest(password)
+            self.suffixes.setdefault(digest[:RANGE_PREFIX_LENGTH], set()).add(digest[RANGE_PREFIX_LENGTH:])
+
+    def get_range(self, prefix):
+        return self.suffixes.get(prefix, set())
+
+
+def test_range_store_distinguishes_found_missing_and_unavailable():
+    store = RangeBreachStore(_StaticSource(["password"]))
+    assert store.lookup("password") is True
+    assert store.lookup("not-breached") is False
+
+    failing = RangeBreachStore(_FailingSource())
+    assert failing.lookup("password") is None
+    assert "password" not in failing
+
+
+def test_range_store_stops_calling_a_failing_source():
+    source = _FailingSource()
+    store = RangeBreachStore(source, failure_threshold=3, reset_timeout=60)
+
+    results = [store.lookup(f"password{i}") for i in range(10)]
+    assert results == [None] * 10
+    assert source.calls == 3
+    assert store.stats()["unavailable"] == 7
+    assert store.breaker.state == 'open'
@@ -0,0 +1,47 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from forest_inference import CompiledForest, compile_model
+
+
+def _fitted_forest():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 6)) * [1, 10, 0.1, 5, 1, 100]
+    y = (X[:, 0] + X[:, 1] / 10 - X[:, 3] / 5 + rng.normal(scale=0.5, size=400) > 0).astype(int)
+    model = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0).fit(X, y)
+    return model, rng.normal(size=(200, 6)) * [1, 10, 0.1, 5, 1, 100]
+
+
+def test_batch_probabilities_equal_sklearn():
+    model, X = _fitted_forest()
+    compiled = CompiledForest.from_sklearn(model)
+
+    np.testing.assert_array_equal(compiled.predict_proba(X), model.predict_proba(X))
+    np.testing.assert_array_equal(compiled.predict(X), model.predict(X))
+
+
+def test_single_row_probabilities_equal_sklearn():
+    model, X = _fitted_forest()
+    compiled = CompiledForest.from_sklearn(model)
+
+    for row in X[:50]:
+        np.testing.assert_array_equal(compiled.predict_proba([row]), model.predict_proba([row]))
+
+
+def test_save_and_load_round_trip(tmp_path):
+    model, X = _fitted_forest()
+    compiled = CompiledForest.from_sklearn(model)
+    path = str(tmp_path / "forest.npz")
+    compiled.save(path)
+
+    loaded = CompiledForest.load(path)
+    assert len(loaded) == 25
+    np.testing.assert_array_equal(loaded.predict_proba(X), model.predict_proba(X))
+
+
+def test_compile_model_leaves_other_models_unchanged():
+    model, _ = _fitted_forest()
+    other = object()
+
+    assert isinstance(compile_model(model), CompiledForest)
+    assert compile_model(other) is other
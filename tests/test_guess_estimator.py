@@ -0,0 +1,69 @@
+import math
+import random
+
+import pytest
+
+from guess_estimator import GuessEstimator, MAX_ESTIMATE_LENGTH, charset_size
+from password_analyzer import COMMON_WORDS, KEYBOARD_PATTERNS
+
+
+@pytest.fixture(scope="module")
+def estimator():
+    return GuessEstimator(COMMON_WORDS, KEYBOARD_PATTERNS)
+
+
+def test_segments_cover_the_password(estimator):
+    password = "Password1990zxcvbn!x7"
+    estimate = estimator.estimate(password)
+
+    assert "".join(segment.token for segment in estimate.segments) == password
+    assert [segment.start for segment in estimate.segments[1:]] == [segment.end for segment in estimate.segments[:-1]]
+    assert {segment.kind for segment in estimate.segments} >= {"dictionary", "date", "keyboard"}
+
+
+def test_patterns_are_cheaper_than_random(estimator):
+    assert estimator.estimate("password").log10_guesses < 1
+    assert estimator.estimate("qwerty").log10_guesses < estimator.estimate("xkcdjq").log10_guesses
+    assert estimator.estimate("aaaaaaaaaaaa").log10_guesses < 5
+
+
+def test_appending_past_the_scan_cap_changes_the_estimate_smoothly(estimator):
+    # Completing a repeated block can make the estimate a little cheaper, as within
+    # the scanned text, but never by more than a few orders of magnitude
+    rng = random.Random(0)
+    for _ in range(20):
+        prefix = "".join(rng.choice("ab1!Qw") for _ in range(MAX_ESTIMATE_LENGTH - 10))
+        tail = "".join(rng.choice(["a", "ab", "x1!", "Qw"]) * rng.randint(1, 6) for _ in range(12))
+        password = prefix + tail
+        values = [estimator.estimate(password[:n]).log10_guesses
+                  for n in range(MAX_ESTIMATE_LENGTH - 5, len(password) + 1)]
+        assert all(abs(later - earlier) < 5 for earlier, later in zip(values, values[1:]))
+
+
+@pytest.mark.parametrize("block", ["a", "ab", "password"])
+def test_repeats_past_the_scan_cap_stay_cheap(estimator, block):
+    at_cap = block * (MAX_ESTIMATE_LENGTH // len(block))
+    past_cap = block * (2 * MAX_ESTIMATE_LENGTH // len(block))
+
+    below = estimator.estimate(at_cap).log10_guesses
+    above = estimator.estimate(past_cap).log10_guesses
+    assert below <= above < below + 1
+
+
+def test_random_tail_past_the_cap_is_brute_force(estimator):
+    rng = random.Random(1)
+    password = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(MAX_ESTIMATE_LENGTH + 40))
+    per_char = math.log10(charset_size(password))
+
+    at_cap = estimator.estimate(password[:MAX_ESTIMATE_LENGTH]).log10_guesses
+    past_cap = estimator.estimate(password)
+    assert past_cap.segments[-1].kind == "bruteforce"
+    assert past_cap.segments[-1].end == len(password)
+    assert past_cap.log10_guesses == pytest.approx(at_cap + 40 * per_char, abs=0.5)
+
+
+def test_long_inputs_stay_finite(estimator):
+    estimate = estimator.estimate("correct horse battery staple " * 1000)
+
+    assert math.isfinite(estimate.log10_guesses)
+    assert estimate.segments[-1].end == len("correct horse battery staple " * 1000)
@@ -0,0 +1,50 @@
+from pattern_matcher import PatternMatcher
+
+
+def _spans(matcher, text):
+    return sorted((match.pattern, match.start, match.length) for match in matcher.find_all(text))
+
+
+def test_reports_overlapping_and_nested_matches():
+    matcher = PatternMatcher([("he", "dictionary"), ("she", "dictionary"), ("his", "dictionary"),
+                              ("hers", "dictionary")])
+
+    assert _spans(matcher, "ushers") == [("he", 2, 2), ("hers", 2, 4), ("she", 1, 3)]
+
+
+def test_reports_every_occurrence_of_repeated_patterns():
+    matcher = PatternMatcher([("aa", "repeat"), ("aaa", "repeat")])
+
+    assert _spans(matcher, "aaaa") == [("aa", 0, 2), ("aa", 1, 2), ("aa", 2, 2), ("aaa", 0, 3), ("aaa", 1, 3)]
+
+
+def test_matches_agree_with_a_naive_scan():
+    patterns = ["abc", "bcd", "cd", "qwerty", "wert", "123", "2345", "a"]
+    matcher = PatternMatcher([(pattern, "dictionary") for pattern in patterns])
+    text = "xabcdeqwerty12345abcd"
+
+    expected = sorted((pattern, start, len(pattern)) for pattern in patterns
+                      for start in range(len(text)) if text.startswith(pattern, start))
+    assert _spans(matcher, text) == expected
+
+
+def test_kinds_and_incremental_steps():
+    matcher = PatternMatcher([("qwerty", "keyboard"), ("password", "dictionary"), ("abc", "sequence")])
+
+    assert matcher.kinds("myqwertypassword") == {"keyboard", "dictionary"}
+    assert matcher.kinds("nothing here") == set()
+
+    # Stepping one character at a time reports the same matches as a full scan
+    state = 0
+    found = []
+    for char in "xxabcqwerty":
+        state = matcher.step(state, char)
+        found.extend(pattern for pattern, _ in matcher.outputs(state))
+    assert found == ["abc", "qwerty"]
+
+
+def test_duplicate_and_empty_patterns_are_ignored():
+    matcher = PatternMatcher([("abc", "sequence"), ("abc", "sequence"), ("", "sequence")])
+
+    assert len(matcher) == 1
+    assert len(matcher.find_all("abcabc")) == 2
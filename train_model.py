@@ -1,16 +1,127 @@
 import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import argparse
+from functools import partial
+from multiprocessing import Pool
 import pandas as pd
 import numpy as np
 import re
 import pickle
 from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, confusion_matrix, precision_recall_fscore_support
 from password_analyzer import PasswordAnalyzer
+from model_store import (ARTIFACT_SUFFIX, FOREST_SUFFIX, load_model_file, model_metrics_path, save_compiled_model,
+                         save_model_artifact, save_model_metrics)
+from markov_model import (ALPHABET_SIZE, DEFAULT_ORDER, DEFAULT_SMOOTHING, count_grams, markov_log_prob_path,
+                          markov_metadata_path, save_markov_counts)
 
-def generate_dataset(size=10000, strong_passwords=None):
+# Alphabet the synthetic strong passwords are drawn from
+STRONG_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789!@#$%^&*()-_=+"
+
+# Rows per vectorized feature chunk, and the longest password handled column-wise
+FEATURE_CHUNK_ROWS = 65536
+MAX_VECTORIZED_LENGTH = 64
+
+def _class_masks(codes):
+    """Per-character uppercase/lowercase/digit/special masks for a code point matrix"""
+    upper = (codes >= ord('A')) & (codes <= ord('Z'))
+    lower = (codes >= ord('a')) & (codes <= ord('z'))
+    digit = (codes >= ord('0')) & (codes <= ord('9'))
+    special = (codes != 0) & ~(upper | lower | digit)
+    return upper, lower, digit, special
+
+def _codes_feature_matrix(codes):
+    """
+    ML features (as in PasswordAnalyzer._extract_features) for a matrix of
+    ASCII code points, one zero-padded password per row, computed column-wise.
+    """
+    n = codes.shape[0]
+    present = codes != 0
+    length = present.sum(axis=1)
+    has_upper, has_lower, has_digit, has_special = (mask.any(axis=1) for mask in _class_masks(codes))
+    
+    # Shannon entropy from per-row character counts: count each (row, char) pair once
+    rows = np.broadcast_to(np.arange(n, dtype=np.int64)[:, None], codes.shape)[present]
+    keys, counts = np.unique((rows << 21) | codes[present].astype(np.int64), return_counts=True)
+    key_rows = keys >> 21
+    probability = counts / length[key_rows]
+    entropy = np.bincount(key_rows, weights=-probability * np.log2(probability), minlength=n)
+    entropy = entropy * length / 3  # Scale entropy by length/3 for better scoring
+    
+    char_classes = has_upper.astype(int) + has_lower + has_digit + has_special
+    return np.column_stack([length, has_upper, has_lower, has_digit, has_special, entropy, char_classes]).astype(float)
+
+_fallback_analyzer = None
+
+def _scalar_analyzer():
+    """Analyzer for passwords the column-wise path can't handle (one per process)"""
+    global _fallback_analyzer
+    if _fallback_analyzer is None:
+        _fallback_analyzer = PasswordAnalyzer(model_path=None)
+    return _fallback_analyzer
+
+def feature_matrix(passwords, analyzer=None):
+    """
+    Feature matrix for a list of passwords. ASCII passwords are processed
+    column-wise in chunks; anything else goes through the analyzer.
+    """
+    passwords = np.asarray(passwords, dtype=str)
+    X = np.empty((len(passwords), 7), dtype=float)
+    for start in range(0, len(passwords), FEATURE_CHUNK_ROWS):
+        chunk = passwords[start:start + FEATURE_CHUNK_ROWS]
+        lengths = np.char.str_len(chunk)
+        vectorized = lengths <= MAX_VECTORIZED_LENGTH
+        
+        short = chunk[vectorized]
+        if len(short):
+            width = max(int(lengths[vectorized].max()), 1)
+            codes = short.astype(f'<U{width}').view(np.uint32).reshape(len(short), width)
+            ascii_rows = (codes < 128).all(axis=1)
+            vectorized[np.flatnonzero(vectorized)[~ascii_rows]] = False
+            X[start + np.flatnonzero(vectorized)] = _codes_feature_matrix(codes[ascii_rows])
+        
+        # Long or non-ASCII passwords use the exact scalar path
+        for i in np.flatnonzero(~vectorized):
+            if analyzer is None:
+                analyzer = _scalar_analyzer()
+            X[start + i] = analyzer._extract_features(str(chunk[i]))
+    return X
+
+def generate_strong_codes(count, rng, min_length=12, max_length=20):
+    """
+    Draw `count` random passwords as a zero-padded code point matrix.
+    Lengths are in [min_length, max_length) and every row has at least one
+    uppercase, lowercase, digit and special character.
+    """
+    alphabet = np.frombuffer(STRONG_CHARS.encode('ascii'), dtype=np.uint8).astype(np.uint32)
+    width = max_length - 1
+    batches = []
+    remaining = count
+    while remaining > 0:
+        # Oversample a little so one or two rounds of rejection sampling suffice
+        n = int(remaining * 1.5) + 16
+        lengths = rng.integers(min_length, max_length, size=n)
+        codes = alphabet[rng.integers(0, len(alphabet), size=(n, width))]
+        codes[np.arange(width) >= lengths[:, None]] = 0
+        
+        # Ensure at least one uppercase, lowercase, digit, and special char
+        valid = np.logical_and.reduce([mask.any(axis=1) for mask in _class_masks(codes)])
+        accepted = codes[valid][:remaining]
+        batches.append(accepted)
+        remaining -= len(accepted)
+    return np.vstack(batches) if batches else np.zeros((0, width), dtype=np.uint32)
+
+def generate_dataset(size=10000, strong_passwords=None, seed=None):
     """Generate a synthetic dataset of passwords with strong/weak labels"""
-    # Create a password analyzer instance without a model
-    analyzer = PasswordAnalyzer(model_path=None)
+    rng = np.random.default_rng(seed)
     
     # Load common passwords as weak examples
     weak_passwords = []
@@ -20,53 +131,111 @@ def generate_dataset(size=10000, strong_passwords=None):
             weak_passwords = [line.strip() for line in f][:size//2]
     
     # If we don't have enough weak passwords, generate some simple ones
-    while len(weak_passwords) < size//2:
-        simple = f"password{np.random.randint(1000)}"
-        weak_passwords.append(simple)
+    missing = size//2 - len(weak_passwords)
+    if missing > 0:
+        suffixes = rng.integers(1000, size=missing).astype(str)
+        weak_passwords = np.concatenate([np.asarray(weak_passwords, dtype=str),
+                                         np.char.add('password', suffixes)])
     
-    # Generate strong passwords
-    strong_passwords = []
-    chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789!@#$%^&*()-_=+"
-    
-    while len(strong_passwords) < size//2:
-        length = np.random.randint(12, 20)
-        password = ''.join(np.random.choice(list(chars)) for _ in range(length))
-        
-        # Ensure at least one uppercase, lowercase, digit, and special char
-        if (re.search(r'[A-Z]', password) and
-            re.search(r'[a-z]', password) and
-            re.search(r'\d', password) and
-            re.search(r'[^A-Za-z0-9]', password)):
-            strong_passwords.append(password)
-    
-    # Create labels
-    weak_labels = [0] * len(weak_passwords)
-    strong_labels = [1] * len(strong_passwords)
+    # Generate strong passwords directly as code points
+    strong_codes = generate_strong_codes(size//2, rng)
+    strong_features = np.vstack([
+        _codes_feature_matrix(strong_codes[start:start + FEATURE_CHUNK_ROWS])
+        for start in range(0, len(strong_codes), FEATURE_CHUNK_ROWS)
+    ] or [np.zeros((0, 7))])
     
     # Combine data
-    all_passwords = weak_passwords + strong_passwords
-    all_labels = weak_labels + strong_labels
-    
-    # Extract features
-    features = []
-    for password in all_passwords:
-        features.append(analyzer._extract_features(password))
+    features = np.vstack([feature_matrix(weak_passwords), strong_features])
+    labels = np.concatenate([np.zeros(len(weak_passwords), dtype=int), np.ones(len(strong_features), dtype=int)])
     
-    return features, all_labels
+    return features, labels
 
 def load_model(model_path):
     """Load the trained model from the specified path."""
     if os.path.exists(model_path):
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        return model
+        return load_model_file(model_path)
     else:
         logging.warning("Model not found.")
         return None
 
+def dataset_hash(X, y):
+    """SHA-256 of a feature matrix and labels, to identify the evaluation data"""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(X, dtype=np.float64).tobytes())
+    digest.update(np.ascontiguousarray(y, dtype=np.int64).tobytes())
+    return digest.hexdigest()
+
+def evaluate_model(model, X_train, y_train, X_test, y_test, data_hash=None):
+    """
+    Evaluation metrics saved next to the model and served by /model-accuracy.
+    Pass data_hash when the full dataset is too large to hash here.
+    """
+    y_pred = model.predict(X_test)
+    labels = [0, 1]
+    precision, recall, f1, support = precision_recall_fscore_support(y_test, y_pred, labels=labels, zero_division=0)
+    return _metrics_report(float(accuracy_score(y_test, y_pred)), float(model.score(X_train, y_train)),
+                           precision, recall, f1, support, confusion_matrix(y_test, y_pred, labels=labels),
+                           len(y_train), len(y_test),
+                           data_hash or dataset_hash(np.vstack([X_train, X_test]), np.concatenate([y_train, y_test])))
+
+def _metrics_report(accuracy, train_accuracy, precision, recall, f1, support, matrix, train_size, test_size,
+                    data_hash):
+    """The metrics sidecar layout shared by in-memory and block-wise evaluation"""
+    labels = [0, 1]
+    class_names = {0: "weak", 1: "strong"}
+    
+    return {
+        "accuracy": accuracy,
+        "train_accuracy": train_accuracy,
+        "per_class": {
+            class_names[label]: {
+                "precision": float(precision[i]),
+                "recall": float(recall[i]),
+                "f1": float(f1[i]),
+                "support": int(support[i])
+            }
+            for i, label in enumerate(labels)
+        },
+        "confusion_matrix": np.asarray(matrix).tolist(),
+        "train_size": int(train_size),
+        "test_size": int(test_size),
+        "dataset_hash": data_hash,
+        "trained_at": time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    }
+
+def evaluate_blocks(model, data, is_test, block_rows, train_sample, data_hash):
+    """
+    evaluate_model for a memory-mapped feature cache: the test rows are
+    predicted one block at a time and only a confusion matrix is kept, so the
+    test split is never loaded as a whole. train_sample is an in-memory
+    sample of training rows for the train accuracy.
+    """
+    matrix = np.zeros((2, 2), dtype=np.int64)
+    for start in range(0, len(data), block_rows):
+        block = data[start:start + block_rows][is_test[start:start + block_rows]]
+        if len(block):
+            matrix += confusion_matrix(block[:, 7].astype(int), model.predict(block[:, :7]), labels=[0, 1])
+    
+    # Same definitions as precision_recall_fscore_support(zero_division=0)
+    true_positives = np.diag(matrix).astype(float)
+    support = matrix.sum(axis=1)
+    predicted = matrix.sum(axis=0)
+    precision = np.divide(true_positives, predicted, out=np.zeros(2), where=predicted > 0)
+    recall = np.divide(true_positives, support, out=np.zeros(2), where=support > 0)
+    f1 = np.divide(2 * true_positives, support + predicted, out=np.zeros(2), where=support + predicted > 0)
+    test_size = int(matrix.sum())
+    accuracy = float(true_positives.sum() / test_size) if test_size else 0.0
+    train_accuracy = float(model.score(train_sample[:, :7], train_sample[:, 7].astype(int)))
+    return _metrics_report(accuracy, train_accuracy, precision, recall, f1, support, matrix,
+                           len(train_sample), test_size, data_hash)
+
+def save_metrics(metrics, model_path):
+    """Write the metrics sidecar for a model file, after the model itself"""
+    save_model_metrics(metrics, model_path)
+
 def train_model(model_path='static/models/password_model.pkl'):
     print("Generating dataset...")
-    X, y = generate_dataset(size=10000)
+    X, y = generate_dataset(size=10000, seed=42)
     
     # Split data
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -76,20 +245,264 @@ def train_model(model_path='static/models/password_model.pkl'):
     model.fit(X_train, y_train)
     
     # Evaluate
-    train_accuracy = model.score(X_train, y_train)
-    test_accuracy = model.score(X_test, y_test)
-    print(f"Train accuracy: {train_accuracy:.4f}")
-    print(f"Test accuracy: {test_accuracy:.4f}")
+    metrics = evaluate_model(model, X_train, y_train, X_test, y_test)
+    print(f"Train accuracy: {metrics['train_accuracy']:.4f}")
+    print(f"Test accuracy: {metrics['accuracy']:.4f}")
     
     # Save model
     model_dir = os.path.join('static', 'models')
     os.makedirs(model_dir, exist_ok=True)
     model_path = os.path.join(model_dir, 'password_model.pkl')
-    
-    with open(model_path, 'wb') as f:
-        pickle.dump(model, f)
+    save_model(model, metrics, model_path)
+
+def save_model(model, metrics, model_path):
+    """
+    Save the model and its metrics sidecar: a compiled forest for .npz paths,
+    a versioned artifact for .joblib paths and a pickle otherwise
+    """
+    # The model goes first, so a failed save never leaves metrics describing a model that is not on disk;
+    # the sidecar records the model version, and a watching server picks it up once it matches
+    if model_path.endswith(FOREST_SUFFIX):
+        save_compiled_model(model, model_path)
+    elif model_path.endswith(ARTIFACT_SUFFIX):
+        save_model_artifact(model, model_path, metadata={"metrics": metrics})
+    else:
+        tmp_path = model_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(model, f)
+        os.replace(tmp_path, model_path)
+    save_metrics(metrics, model_path)
     
     print(f"Model saved to {model_path}")
+    print(f"Metrics saved to {model_metrics_path(model_path)}")
+
+# Feature cache layout: the 7 model features followed by the label
+CACHE_COLUMNS = 8
+
+def iter_wordlist_chunks(paths, chunk_size):
+    """Stream stripped, non-empty lines from wordlist files in lists of chunk_size"""
+    chunk = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                password = line.strip()
+                if not password:
+                    continue
+                chunk.append(password)
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+    if chunk:
+        yield chunk
+
+def count_passwords(paths, chunk_size=100000):
+    """Number of passwords iter_wordlist_chunks yields, read the same way so the counts agree"""
+    return sum(len(chunk) for chunk in iter_wordlist_chunks(paths, chunk_size))
+
+def _chunk_features(chunk):
+    """Process-pool worker: features for one chunk of wordlist passwords"""
+    return feature_matrix(chunk)
+
+def _cache_manifest(paths, seed):
+    """Identifies the inputs a feature cache was built from"""
+    return {
+        "sources": [
+            {"path": os.path.abspath(path), "size": os.path.getsize(path), "mtime": os.path.getmtime(path)}
+            for path in paths
+        ],
+        "seed": seed,
+        "columns": CACHE_COLUMNS
+    }
+
+def build_feature_cache(paths, cache_path, chunk_size=100000, workers=None, seed=42):
+    """
+    Stream wordlists (weak examples) in chunks, extract their features in a
+    process pool, and write them with an equal number of synthetic strong
+    examples into a memory-mapped .npy file. Each chunk's weak rows are
+    followed by its strong rows, so every contiguous block mixes both classes.
+    Returns the memory-mapped array; an up-to-date cache is reused as is.
+    """
+    manifest_path = cache_path + '.json'
+    manifest = _cache_manifest(paths, seed)
+    if os.path.exists(cache_path) and os.path.exists(manifest_path):
+        with open(manifest_path, 'r') as f:
+            if json.load(f) == manifest:
+                print(f"Reusing feature cache {cache_path}")
+                return np.load(cache_path, mmap_mode='r')
+    
+    total_weak = count_passwords(paths, chunk_size)
+    print(f"Extracting features for {total_weak} wordlist passwords...")
+    rng = np.random.default_rng(seed)
+    tmp_path = cache_path + '.tmp.npy'
+    data = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float64, shape=(2 * total_weak, CACHE_COLUMNS))
+    
+    row = 0
+    started = time.monotonic()
+    with Pool(processes=workers) as pool:
+        for weak in pool.imap(_chunk_features, iter_wordlist_chunks(paths, chunk_size)):
+            if row + 2 * len(weak) > len(data):
+                raise ValueError("Wordlists changed while the feature cache was being built")
+            strong = _codes_feature_matrix(generate_strong_codes(len(weak), rng))
+            data[row:row + len(weak), :7] = weak
+            data[row:row + len(weak), 7] = 0
+            row += len(weak)
+            data[row:row + len(strong), :7] = strong
+            data[row:row + len(strong), 7] = 1
+            row += len(strong)
+            print(f"  {row // 2}/{total_weak} passwords ({row / 2 / (time.monotonic() - started):.0f}/s)")
+    data.flush()
+    del data
+    # A short cache would train on zero rows labelled weak, so never mark one valid
+    if row != 2 * total_weak:
+        os.remove(tmp_path)
+        raise ValueError("Wordlists changed while the feature cache was being built")
+    
+    os.replace(tmp_path, cache_path)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f)
+    return np.load(cache_path, mmap_mode='r')
+
+def _iter_blocks(n_rows, block_rows, rng):
+    """Contiguous row ranges of a dataset, in random order"""
+    starts = np.arange(0, n_rows, block_rows)
+    rng.shuffle(starts)
+    for start in starts:
+        yield start, min(start + block_rows, n_rows)
+
+def fit_incremental(data, is_test, block_rows, epochs, rng):
+    """
+    Fit a scaled logistic-regression SGD model block by block with
+    partial_fit, so the dataset never has to fit in memory.
+    """
+    scaler = StandardScaler()
+    for start, end in _iter_blocks(len(data), block_rows, rng):
+        train_rows = ~is_test[start:end]
+        scaler.partial_fit(data[start:end][train_rows, :7])
+    
+    classifier = SGDClassifier(loss='log_loss', random_state=42)
+    for epoch in range(epochs):
+        for start, end in _iter_blocks(len(data), block_rows, rng):
+            block = data[start:end][~is_test[start:end]]
+            block = block[rng.permutation(len(block))]
+            classifier.partial_fit(scaler.transform(block[:, :7]), block[:, 7].astype(int), classes=[0, 1])
+    return Pipeline([('scaler', scaler), ('classifier', classifier)])
+
+def train_from_wordlists(paths, model_path, feature_cache=None, chunk_size=100000, workers=None,
+                         incremental=False, epochs=3, n_estimators=100, test_size=0.2, seed=42):
+    """Train on full leaked-password corpora, streaming them from disk"""
+    if incremental and model_path.endswith(FOREST_SUFFIX):
+        raise ValueError(f"Incremental models are not tree forests and cannot be saved as {FOREST_SUFFIX}")
+    os.makedirs(os.path.dirname(model_path) or '.', exist_ok=True)
+    cache_path = feature_cache or os.path.splitext(model_path)[0] + '.features.npy'
+    data = build_feature_cache(paths, cache_path, chunk_size=chunk_size, workers=workers, seed=seed)
+    if not len(data):
+        raise ValueError("No passwords found in the wordlists")
+    
+    rng = np.random.default_rng(seed)
+    is_test = rng.random(len(data)) < test_size
+    
+    print("Training model...")
+    if incremental:
+        model = fit_incremental(data, is_test, 2 * chunk_size, epochs, rng)
+    else:
+        train = data[~is_test]
+        model = RandomForestClassifier(n_estimators=n_estimators, n_jobs=workers or -1, random_state=seed)
+        model.fit(train[:, :7], train[:, 7].astype(int))
+        del train
+    
+    # Train accuracy on a bounded sample of the training rows
+    train_rows = np.flatnonzero(~is_test)
+    sample = np.sort(rng.choice(train_rows, size=min(len(train_rows), 100000), replace=False))
+    sample_data = data[sample]
+    
+    with open(cache_path + '.json', 'r') as f:
+        data_hash = hashlib.sha256(f.read().encode('utf-8')).hexdigest()
+    metrics = evaluate_blocks(model, data, is_test, 2 * chunk_size, sample_data, data_hash)
+    metrics["train_size"] = int(len(train_rows))
+    metrics["model_type"] = "sgd" if incremental else "random_forest"
+    print(f"Train accuracy (sample): {metrics['train_accuracy']:.4f}")
+    print(f"Test accuracy: {metrics['accuracy']:.4f}")
+    
+    save_model(model, metrics, model_path)
+
+def _chunk_grams(chunk, order):
+    """Process-pool worker: n-gram counts for one chunk of wordlist passwords"""
+    return (len(chunk),) + count_grams(chunk, order)
+
+def train_markov(paths, output_path, order=DEFAULT_ORDER, smoothing=DEFAULT_SMOOTHING, chunk_size=100000,
+                 workers=None):
+    """
+    Count character n-grams over wordlist files, streamed in chunks through a
+    process pool, into one flat table of ALPHABET_SIZE ** order counts. The
+    table's size depends only on the order, not on the corpus.
+    """
+    os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    counts = np.zeros(ALPHABET_SIZE ** order, dtype=np.uint64)
+    lines = 0
+    started = time.monotonic()
+    print(f"Counting order-{order} n-grams...")
+    with Pool(processes=workers) as pool:
+        for chunk_lines, indices, chunk_counts in pool.imap(partial(_chunk_grams, order=order),
+                                                            iter_wordlist_chunks(paths, chunk_size)):
+            counts[indices] += chunk_counts.astype(np.uint64)
+            lines += chunk_lines
+            print(f"  {lines} passwords ({lines / (time.monotonic() - started):.0f}/s)")
+    if not lines:
+        raise ValueError("No passwords found in the wordlists")
+    
+    metadata = {
+        "order": order,
+        "smoothing": smoothing,
+        "lines": lines,
+        "grams": int(counts.sum()),
+        "sources": [os.path.basename(path) for path in paths]
+    }
+    save_markov_counts(counts, output_path, metadata)
+    print(f"Markov model saved to {output_path} ({os.path.getsize(output_path)} bytes)")
+    print(f"Log-probabilities saved to {markov_log_prob_path(output_path)}")
+    print(f"Metadata saved to {markov_metadata_path(output_path)}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the password strength model")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    train = subparsers.add_parser('train', help="Train on wordlist files streamed from disk")
+    train.add_argument('--wordlist', action='append', required=True,
+                       help="Leaked-password wordlist used as weak examples (repeatable)")
+    train.add_argument('--model-path', default=os.path.join('static', 'models', 'password_model.pkl'))
+    train.add_argument('--feature-cache', help="Memory-mapped .npy feature cache (default: next to the model)")
+    train.add_argument('--chunk-size', type=int, default=100000, help="Wordlist lines per feature-extraction chunk")
+    train.add_argument('--workers', type=int, default=None, help="Feature-extraction processes and forest jobs")
+    train.add_argument('--incremental', action='store_true',
+                       help="Fit an SGD model with partial_fit for data that doesn't fit in memory")
+    train.add_argument('--epochs', type=int, default=3, help="Passes over the data in incremental mode")
+    train.add_argument('--n-estimators', type=int, default=100)
+    train.add_argument('--seed', type=int, default=42)
+    
+    markov = subparsers.add_parser('markov', help="Build the character n-gram model from wordlist files")
+    markov.add_argument('--wordlist', action='append', required=True, help="Leaked-password wordlist (repeatable)")
+    markov.add_argument('--output', default=os.path.join('static', 'models', 'markov.npy'))
+    markov.add_argument('--order', type=int, choices=[2, 3, 4], default=DEFAULT_ORDER,
+                        help="Characters per n-gram; the table holds 97**order counts")
+    markov.add_argument('--smoothing', type=float, default=DEFAULT_SMOOTHING,
+                        help="Pseudo-count added to every n-gram when scoring")
+    markov.add_argument('--chunk-size', type=int, default=100000, help="Wordlist lines per counting chunk")
+    markov.add_argument('--workers', type=int, default=None, help="Counting processes")
+    
+    args = parser.parse_args(argv)
+    if args.command == 'markov':
+        train_markov(args.wordlist, args.output, order=args.order, smoothing=args.smoothing,
+                     chunk_size=args.chunk_size, workers=args.workers)
+    elif args.command == 'train':
+        if args.incremental and args.model_path.endswith(FOREST_SUFFIX):
+            parser.error(f"--incremental trains a linear model, which cannot be saved as {FOREST_SUFFIX}; "
+                         f"use a .pkl or {ARTIFACT_SUFFIX} --model-path")
+        train_from_wordlists(args.wordlist, args.model_path, feature_cache=args.feature_cache,
+                             chunk_size=args.chunk_size, workers=args.workers, incremental=args.incremental,
+                             epochs=args.epochs, n_estimators=args.n_estimators, seed=args.seed)
+    else:
+        train_model()
+    return 0
 
 if __name__ == "__main__":
-    train_model()
+    sys.exit(main())